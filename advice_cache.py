@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple, Union
+
+from metrics import incr
+from minhash import MinHashLSH, jaccard
+from models import SymptomInput, TriageResult
+from triage import _normalize
+
+
+# Advice is looked up by the exact intake first. Intakes that differ only in
+# ways the advice should not depend on ("fever, cough, 31 y/o" and "cough,
+# fever, 30 y/o") then get a second chance in the semantic tier: features are
+# the normalized symptoms, the top triage conditions and age/severity/duration
+# buckets, and a stored answer is reused if its features have a Jaccard
+# similarity of at least ADVICE_SEMANTIC_THRESHOLD. Candidates come from a
+# MinHash/LSH index (minhash.py), so a lookup does not scan the cache.
+# Provider, model, temperature, language, sex, risk level and the set of red
+# flags must match exactly, so an intake with an extra red-flag symptom never
+# gets advice written without it. Intakes with free-text notes are only ever
+# matched exactly. The tier is off unless ADVICE_SEMANTIC_THRESHOLD is set.
+
+SEMANTIC_CONDITIONS = 3
+AGE_BUCKETS = ((2, "0-1"), (12, "2-11"), (18, "12-17"), (40, "18-39"), (65, "40-64"))
+SEVERITY_BUCKETS = ((4, "mild"), (8, "moderate"))
+DURATION_BUCKETS = ((3, "0-2d"), (7, "3-6d"), (28, "1-4w"))
+
+
+def _bucket(value: Optional[int], buckets: Tuple[Tuple[int, str], ...], last: str) -> str:
+    if value is None:
+        return "?"
+    for upper, label in buckets:
+        if value < upper:
+            return label
+    return last
+
+
+class AdviceKey(NamedTuple):
+    exact: str
+    # (partition, features) for the semantic tier; None: exact matches only
+    similar: Optional[Tuple[str, FrozenSet[str]]] = None
+
+
+def canonical_input(data: SymptomInput) -> Dict:
+    symptoms = sorted({s.strip().lower() for s in data.symptoms if s and s.strip()})
+    return {
+        "age": data.age,
+        "sex": data.sex,
+        "symptoms": symptoms,
+        "duration_days": data.duration_days,
+        "severity_1to10": data.severity_1to10,
+        "notes": (data.notes or "").strip().lower() or None,
+    }
+
+
+def make_cache_key(data: SymptomInput, triage: TriageResult, provider: str, model: str, temperature: float, lang: str) -> str:
+    payload = {
+        "input": canonical_input(data),
+        "triage": triage.model_dump(mode="json"),
+        "provider": provider,
+        "model": model,
+        "temperature": round(float(temperature), 3),
+        "lang": lang,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def semantic_features(data: SymptomInput, triage: TriageResult) -> Optional[FrozenSet[str]]:
+    # None when the intake must not share advice with similar ones
+    if data.notes and data.notes.strip():
+        return None
+    symptoms = _normalize(data.symptoms)
+    if not symptoms:
+        return None
+    features = {"s:" + s for s in symptoms}
+    features.update("c:" + h.condition for h in triage.possible_conditions[:SEMANTIC_CONDITIONS])
+    features.add("age:" + _bucket(data.age, AGE_BUCKETS, "65+"))
+    features.add("sev:" + _bucket(data.severity_1to10, SEVERITY_BUCKETS, "severe"))
+    features.add("dur:" + _bucket(data.duration_days, DURATION_BUCKETS, "4w+"))
+    return frozenset(features)
+
+
+def make_advice_key(data: SymptomInput, triage: TriageResult, provider: str, model: str, temperature: float, lang: str) -> AdviceKey:
+    exact = make_cache_key(data, triage, provider, model, temperature, lang)
+    features = semantic_features(data, triage)
+    if features is None:
+        return AdviceKey(exact)
+    # Hypotheses carry the red flags of every matched rule, repeats included,
+    # so a symptom whose rule has red flags always changes this list
+    red_flags = sorted(triage.possible_conditions[0].red_flags) if triage.possible_conditions else []
+    partition = json.dumps([provider, model, round(float(temperature), 3), lang, data.sex, triage.risk_level, red_flags])
+    return AdviceKey(exact, (partition, features))
+
+
+class SemanticAdviceCache:
+    # In-memory LRU of advice indexed by feature set; see the top of the module
+    def __init__(self, threshold: float = 0.9, max_entries: int = 1024, ttl_s: float = 3600.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._index = MinHashLSH()
+        # Exact key -> (created_at, features, advice)
+        self._entries: "OrderedDict[str, Tuple[float, FrozenSet[str], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.candidates = 0
+
+    def get(self, similar: Tuple[str, FrozenSet[str]]) -> Optional[str]:
+        partition, features = similar
+        now = time.time()
+        with self._lock:
+            best, best_score = None, 0.0
+            expired: List[str] = []
+            for key in self._index.candidates(features, partition):
+                created_at, other, _ = self._entries[key]
+                if self.ttl_s > 0 and now - created_at > self.ttl_s:
+                    expired.append(key)
+                    continue
+                self.candidates += 1
+                score = jaccard(features, other)
+                if score >= self.threshold and score > best_score:
+                    best, best_score = key, score
+                    if score == 1.0:
+                        break
+            for key in expired:
+                self._drop(key)
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best][2]
+
+    def put(self, exact: str, similar: Tuple[str, FrozenSet[str]], value: str) -> None:
+        partition, features = similar
+        with self._lock:
+            self._entries[exact] = (time.time(), features, value)
+            self._entries.move_to_end(exact)
+            self._index.add(exact, features, partition)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        del self._entries[key]
+        self._index.remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AdviceCache:
+    # Two tiers: an in-memory LRU and an optional SQLite file shared between
+    # processes. Entries expire after ``ttl_s`` seconds in both tiers. Keys
+    # are make_cache_key strings or AdviceKeys; with ``semantic`` set, an
+    # AdviceKey that misses both tiers is looked up by similarity as well.
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_s: float = 3600.0,
+        db_path: Optional[str] = None,
+        max_db_entries: int = 10000,
+        semantic: Optional[SemanticAdviceCache] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_db_entries = max_db_entries
+        self.semantic = semantic
+        self._lru: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS advice ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS advice_accessed ON advice(accessed_at)")
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_s > 0 and now - created_at > self.ttl_s
+
+    def get(self, key: Union[str, AdviceKey]) -> Optional[str]:
+        exact = key.exact if isinstance(key, AdviceKey) else key
+        hit = self._get_exact(exact)
+        if hit is not None:
+            return hit
+        if self.semantic is not None and isinstance(key, AdviceKey) and key.similar is not None:
+            hit = self.semantic.get(key.similar)
+        with self._lock:
+            if hit is None:
+                self.misses += 1
+            else:
+                self.semantic_hits += 1
+        if hit is not None:
+            incr("llm.semantic_hit")
+        return hit
+
+    def _get_exact(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._lru.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._lru[key]
+                self.expirations += 1
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created_at FROM advice WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        self._db.execute("UPDATE advice SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._remember(key, row[1], row[0])
+                        self.disk_hits += 1
+                        return row[0]
+                    self._db.execute("DELETE FROM advice WHERE key = ?", (key,))
+                    self.expirations += 1
+            return None
+
+    def put(self, key: Union[str, AdviceKey], value: str) -> None:
+        if isinstance(key, AdviceKey):
+            if self.semantic is not None and key.similar is not None:
+                self.semantic.put(key.exact, key.similar, value)
+            key = key.exact
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO advice (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._trim_db(now)
+
+    def _remember(self, key: str, created_at: float, value: str) -> None:
+        self._lru[key] = (created_at, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def _trim_db(self, now: float) -> None:
+        if self.ttl_s > 0:
+            self._db.execute("DELETE FROM advice WHERE created_at < ?", (now - self.ttl_s,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM advice").fetchone()
+        if count > self.max_db_entries:
+            self._db.execute(
+                "DELETE FROM advice WHERE key IN (SELECT key FROM advice ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_db_entries,),
+            )
+            self.evictions += count - self.max_db_entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM advice")
+        if self.semantic is not None:
+            self.semantic.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._lru),
+                "semantic_entries": len(self.semantic) if self.semantic is not None else 0,
+            }
+
+
+_DEFAULT: Optional[AdviceCache] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_advice_cache() -> AdviceCache:
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            # Off by default; ADVICE_SEMANTIC_THRESHOLD > 0 turns the semantic tier on
+            threshold = float(os.getenv("ADVICE_SEMANTIC_THRESHOLD", "0"))
+            semantic = None
+            if threshold > 0:
+                semantic = SemanticAdviceCache(
+                    threshold=threshold,
+                    max_entries=int(os.getenv("ADVICE_SEMANTIC_SIZE", "1024")),
+                    ttl_s=float(os.getenv("ADVICE_CACHE_TTL", "3600")),
+                )
+            _DEFAULT = AdviceCache(
+                max_entries=int(os.getenv("ADVICE_CACHE_SIZE", "256")),
+                ttl_s=float(os.getenv("ADVICE_CACHE_TTL", "3600")),
+                db_path=os.getenv("ADVICE_CACHE_DB") or None,
+                max_db_entries=int(os.getenv("ADVICE_CACHE_DB_SIZE", "10000")),
+                semantic=semantic,
+            )
+        return _DEFAULT
@@ -1,15 +1,20 @@
 import os
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 import streamlit as st
 from dotenv import load_dotenv
 
-from models import SymptomInput
-from triage import triage_symptoms
-from faq import search_faq
-from llm import generate_advice
-from i18n import t, localize_triage, SYMPTOM_SUGGESTIONS
+from models import FAQItem, SymptomInput, TriageResult
+from triage import IncrementalTriage, get_compiled_rules, rules_version, triage_compact
+from faq import clear_faq_cache, faq_version, search_faq
+from llm import AdviceStream, get_llm, reset_clients, stream_advice
+from advice_cache import get_advice_cache
+from audit import audit
+from i18n import t, localize_compact, SYMPTOM_SUGGESTIONS
+from urgent import fast_path_mode, urgent_guidance
+from warmup import preload_enabled, preload_in_background
+import metrics
 
 
 load_dotenv()
@@ -17,9 +22,126 @@ load_dotenv()
 st.set_page_config(page_title="AI Medical Assistant", page_icon="🩺", layout="wide")
 
 
+# Streamlit reruns main() on every widget change. Expensive work is cached:
+# LLM clients as resources (shared, never copied), triage and FAQ results as
+# data keyed on their inputs plus the rules/FAQ file version, both bounded by
+# max_entries/ttl. The last analysis is kept in session_state, so reruns with
+# an unchanged request only re-render it. "Clear caches" drops all of them.
+# Emergency and high-risk results show precomputed guidance before anything
+# else; the LLM answer streams in below it, or is skipped (URGENT_FAST_PATH).
+# The LLM client (and its SDK import) is created on the first Analyze, not
+# for the first frame; with TRIAGE_PRELOAD=1 everything is warmed in a
+# background thread while the first page renders.
+# While symptoms are being entered, a live preview (risk level and likely
+# conditions) is updated from an IncrementalTriage kept in session_state, so a
+# rerun only applies the tags that were added or removed. Each Analyze goes to
+# the audit log when AUDIT_LOG_DIR is set (see audit.py).
+CACHE_MAX_ENTRIES = int(os.getenv("APP_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_S = int(os.getenv("APP_CACHE_TTL", "3600"))
+
+
+@st.cache_resource(show_spinner=False)
+def start_preload():
+    # Once per process
+    return preload_in_background() if preload_enabled() else None
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_S)
+def cached_faq_search(query: str, lang: str, version: Optional[int]) -> List[FAQItem]:
+    return search_faq(query, limit=10, lang=lang)
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_S)
+def cached_triage(payload: str, lang: str, version: int) -> Tuple[TriageResult, Dict]:
+    # Localized from the compact result through the rule set's string tables
+    rules = get_compiled_rules()
+    ct = triage_compact(SymptomInput.model_validate_json(payload), rules)
+    return rules.expand(ct), localize_compact(ct, lang, rules)
+
+
+def clear_caches():
+    cached_faq_search.clear()
+    cached_triage.clear()
+    clear_faq_cache()
+    reset_clients()
+    get_advice_cache().clear()
+    st.session_state.pop("analysis", None)
+
+
+def live_triage(symptoms: List[str], severity: Optional[int], duration_days: Optional[int]) -> IncrementalTriage:
+    # Per session, rebuilt when the rules are reloaded
+    version = rules_version()
+    state = st.session_state.get("live_triage")
+    if state is None or state[0] != version:
+        state = st.session_state["live_triage"] = (version, IncrementalTriage())
+    live = state[1]
+    live.set_profile(severity, duration_days)
+    live.sync(symptoms)
+    return live
+
+
+def render_preview(live: IncrementalTriage, lang: str):
+    loc = localize_compact(live.compact(), lang, live.rules)
+    conditions = ", ".join(f"{c['condition']} ({c['confidence']:.0%})" for c in loc["possible_conditions"][:3])
+    st.caption(t("live_preview", lang).format(risk=loc["risk_level"], conditions=conditions))
+
+
+def render_stream(stream: AdviceStream):
+    if hasattr(st, "write_stream"):
+        st.write_stream(stream)
+        return
+    placeholder = st.empty()
+    for _ in stream:
+        placeholder.markdown(stream.text)
+
+
+def render_trace(trace: metrics.Trace, lang: str, prompt: Optional[Dict] = None):
+    with st.expander(t("debug_breakdown", lang), expanded=True):
+        st.caption(t("debug_total", lang).format(total=(trace.total_s or 0.0) * 1000.0))
+        if prompt:
+            trimmed = ", ".join(f"{name} −{n}" for name, n in prompt["trimmed"].items()) or "—"
+            st.caption(t("debug_prompt", lang).format(tokens=prompt["tokens"], chars=prompt["chars"], budget=prompt["budget"] or "∞", trimmed=trimmed))
+        rows = [
+            {"stage": name, "calls": row["calls"], "ms": round(row["total_ms"], 3)}
+            for name, row in trace.breakdown().items()
+        ]
+        st.table(rows)
+
+
+def render_triage(loc: Dict, lang: str):
+    st.subheader(t("triage_results", lang))
+    st.caption(t("triage_desc", lang))
+    st.write(f"{t('risk_level', lang)}: **{loc['risk_level']}**")
+    st.write(t("possible_conditions", lang) + ":")
+    for h in loc["possible_conditions"][:5]:
+        st.write(f"- {h['condition']} — {h['confidence']:.2f}")
+    if loc["self_care_advice"]:
+        st.write(t("self_care", lang) + ":")
+        for a in loc["self_care_advice"]:
+            st.write(f"- {a}")
+    if loc["doctor_questions"]:
+        st.write(t("doctor_questions", lang) + ":")
+        for q in loc["doctor_questions"]:
+            st.write(f"- {q}")
+    st.subheader(t("ai_recommendations", lang))
+    st.caption(t("ai_reco_desc", lang))
+
+
+def render_advice_status(analysis: Dict, lang: str):
+    if analysis["skipped"]:
+        st.info(t("llm_skipped_urgent", lang))
+    elif analysis["offline"]:
+        st.info(t("llm_offline", lang))
+    elif analysis["from_cache"]:
+        st.caption(t("llm_cached", lang))
+    elif analysis["ttft"] is not None:
+        st.caption(t("llm_timing", lang).format(ttft=analysis["ttft"], total=analysis["total"]))
+
+
 def main():
     # English-only UI
     lang = "en"
+    start_preload()
 
     st.title(t("title", lang))
     st.caption(t("disclaimer", lang))
@@ -31,12 +153,18 @@ def main():
         openai_model = st.text_input(t("openai_model", lang), os.getenv("OPENAI_MODEL", ""), placeholder=t("openai_model_ph", lang), help=t("openai_model_help", lang), key="openai_model_input")
         ollama_model = st.text_input(t("ollama_model", lang), os.getenv("OLLAMA_MODEL", ""), placeholder=t("ollama_model_ph", lang), help=t("ollama_model_help", lang), key="ollama_model_input")
         temperature = st.slider(t("temperature", lang), 0.0, 1.0, float(os.getenv("AI_TEMPERATURE", "0.2")), 0.05, help=t("temperature_help", lang))
+        model = openai_model if provider == "OpenAI" else ollama_model
+        # Only shows or hides the panel; each analysis is traced on its own
+        debug = st.checkbox(t("debug_panel", lang), value=False, help=t("debug_panel_help", lang), key="debug_panel")
+        if st.button(t("clear_cache", lang), help=t("clear_cache_help", lang)):
+            clear_caches()
+            st.toast(t("cache_cleared", lang))
         st.divider()
         st.header(t("faq", lang))
         st.caption(t("faq_desc", lang))
         faq_q = st.text_input(t("faq_search", lang), placeholder=t("faq_placeholder", lang), help=t("faq_search_help", lang), key="faq_search_input")
         if faq_q is not None:
-            faq_items = search_faq(faq_q, limit=10, lang=lang)
+            faq_items = cached_faq_search(faq_q, lang, faq_version(lang))
             for it in faq_items:
                 with st.expander(it.question):
                     st.write(it.answer)
@@ -61,49 +189,83 @@ def main():
         symptoms_list = [s.strip() for s in symptoms.split(",") if s.strip()]
     else:
         symptoms_list = symptoms
+    if symptoms_list:
+        render_preview(live_triage(symptoms_list, severity or None, duration_days or None), lang)
 
+    data = SymptomInput(
+        age=age or None,
+        sex=sex,
+        symptoms=symptoms_list,
+        duration_days=duration_days or None,
+        severity_1to10=severity or None,
+        notes=notes or None,
+    )
+    request_key = (data.model_dump_json(), provider, model, float(temperature), lang, rules_version())
+    analysis: Optional[Dict] = st.session_state.get("analysis")
     if st.button(t("analyze", lang), type="primary", help=t("analyze_help", lang)):
-        data = SymptomInput(
-            age=age or None,
-            sex=sex,
-            symptoms=symptoms_list,
-            duration_days=duration_days or None,
-            severity_1to10=severity or None,
-            notes=notes or None,
-        )
-        triage = triage_symptoms(data)
-
-        loc = localize_triage(triage, lang)
-        st.subheader(t("triage_results", lang))
-        st.caption(t("triage_desc", lang))
-        st.write(f"{t('risk_level', lang)}: **{loc['risk_level']}**")
-        st.write(t("possible_conditions", lang) + ":")
-        for h in loc["possible_conditions"][:5]:
-            st.write(f"- {h['condition']} — {h['confidence']:.2f}")
-        if loc["self_care_advice"]:
-            st.write(t("self_care", lang) + ":")
-            for a in loc["self_care_advice"]:
-                st.write(f"- {a}")
-        if loc["doctor_questions"]:
-            st.write(t("doctor_questions", lang) + ":")
-            for q in loc["doctor_questions"]:
-                st.write(f"- {q}")
-
-        st.subheader(t("ai_recommendations", lang))
-        st.caption(t("ai_reco_desc", lang))
-        advice = generate_advice(
+        with metrics.trace() as trace:
+            triage, loc = cached_triage(request_key[0], lang, request_key[-1])
+            mode = fast_path_mode()
+            guidance = urgent_guidance(triage, lang) if mode != "off" else None
+            if guidance is not None:
+                st.error(guidance)
+            render_triage(loc, lang)
+            skipped = guidance is not None and mode == "skip"
+            stream = None
+            if not skipped:
+                # llm keeps one client per provider/model; an unavailable one is retried next time
+                llm = get_llm(provider, model, float(temperature))
+                stream = stream_advice(
+                    data,
+                    triage,
+                    provider=provider,
+                    openai_model=openai_model,
+                    ollama_model=ollama_model,
+                    temperature=float(temperature),
+                    lang=lang,
+                    llm=llm,
+                    cache=get_advice_cache(),
+                )
+            if stream is not None:
+                render_stream(stream)
+        analysis = {
+            "key": request_key,
+            "loc": loc,
+            "guidance": guidance,
+            "skipped": skipped,
+            # Failed completions are not kept, so the next Analyze retries them
+            "advice": stream.text if stream is not None and stream.error is None else None,
+            "offline": stream is None and not skipped,
+            "from_cache": stream is not None and stream.from_cache,
+            "ttft": stream.first_token_s if stream is not None else None,
+            "total": stream.total_s if stream is not None else None,
+            "trace": trace,
+            "prompt": stream.prompt_info if stream is not None else None,
+        }
+        st.session_state["analysis"] = analysis
+        audit(
+            "app",
             data,
             triage,
             provider=provider,
-            openai_model=openai_model,
-            ollama_model=ollama_model,
-            temperature=float(temperature),
+            model=model,
             lang=lang,
+            fast_path=mode if guidance is not None else None,
+            timings={"total": trace.total_s, "llm": analysis["total"]},
         )
-        if advice:
-            st.write(advice)
-        else:
-            st.info(t("llm_offline", lang))
+        render_advice_status(analysis, lang)
+    elif analysis is not None and analysis["key"] == request_key:
+        # Unchanged request on a rerun: re-render, no triage or LLM call
+        if analysis["guidance"] is not None:
+            st.error(analysis["guidance"])
+        render_triage(analysis["loc"], lang)
+        if analysis["advice"] is not None:
+            st.markdown(analysis["advice"])
+        render_advice_status(analysis, lang)
+    else:
+        analysis = None
+    if debug and analysis is not None:
+        render_trace(analysis["trace"], lang, analysis["prompt"])
 
     st.divider()
     st.subheader(t("future", lang))
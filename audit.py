@@ -0,0 +1,696 @@
+import argparse
+import atexit
+import json
+import math
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from lazy import optional_module
+from metrics import incr
+from triage import RISK_LEVELS
+
+
+# Audit log: every triage and advice request (input, result, provider/model,
+# latencies) for clinical review and capacity planning.
+#
+# record() only puts the raw objects on a bounded queue; a writer thread turns
+# batches of them into blocks and appends those to the current segment file in
+# AUDIT_LOG_DIR. A block is self-contained and columnar, in the layout of
+# compiled rule packs: MAGIC, a JSON header, then one aligned array per column
+# (strings are ids into a per-block table, lists are offset + value arrays).
+# Segments are rotated by size and age and never modified once closed; each
+# process writes its own. When the queue is full, records are dropped and
+# counted (audit.dropped) rather than slowing requests down.
+#
+# The query side maps segments read-only and aggregates column by column,
+# skipping blocks outside the time range from their header alone:
+#
+#   python audit.py summary --since 2026-10-01
+#   python audit.py symptoms --top 20 --normalize
+#   python audit.py latency --source advice
+#   python audit.py dump --risk emergency --limit 50
+
+PathLike = Union[str, Path]
+
+MAGIC = b"MDAUDIT1"
+FORMAT_VERSION = 1
+SEGMENT_SUFFIX = ".seg"
+_ALIGN = 8
+# Numeric inputs that were not given
+MISSING = -1
+_STOP = object()
+
+SOURCES = ("app", "analyze", "triage", "triage_batch", "advice")
+LATENCIES = ("total_ms", "triage_ms", "llm_ms")
+_SCALARS: Dict[str, str] = {
+    "ts": "d",
+    "age": "q",
+    "duration_days": "q",
+    "severity": "b",
+    "risk": "b",
+    "total_ms": "f",
+    "triage_ms": "f",
+    "llm_ms": "f",
+}
+# Stored as ids into the block's string table; 0 is the empty string
+_STRING_COLUMNS = ("source", "sex", "provider", "model", "lang", "fast_path", "notes")
+
+
+def _get(obj: Any, name: str) -> Any:
+    # Requests arrive as models (app, pipeline) or as plain dicts (HTTP API)
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def _int(value: Any) -> int:
+    return MISSING if value is None else int(value)
+
+
+def _ms(timings: Dict[str, Optional[float]], name: str) -> float:
+    seconds = timings.get(name)
+    return math.nan if seconds is None else seconds * 1000.0
+
+
+def _append(arrays: Dict[str, array], sid: Callable[[Optional[str]], int], record: Tuple) -> None:
+    ts, source, data, triage, provider, model, lang, fast_path, timings = record
+    arrays["ts"].append(ts)
+    arrays["age"].append(_int(_get(data, "age")))
+    arrays["duration_days"].append(_int(_get(data, "duration_days")))
+    arrays["severity"].append(_int(_get(data, "severity_1to10")))
+    risk = _get(triage, "risk_level") if triage is not None else None
+    arrays["risk"].append(RISK_LEVELS.index(risk) if risk in RISK_LEVELS else MISSING)
+    for name in LATENCIES:
+        arrays[name].append(_ms(timings, name[:-3]))
+    for name, value in (
+        ("source", source),
+        ("sex", _get(data, "sex")),
+        ("provider", provider),
+        ("model", model),
+        ("lang", lang),
+        ("fast_path", fast_path),
+        ("notes", _get(data, "notes")),
+    ):
+        arrays[name].append(sid(value))
+    arrays["symptoms"].extend(sid(s) for s in _get(data, "symptoms") or ())
+    arrays["symptoms_ptr"].append(len(arrays["symptoms"]))
+    for h in (_get(triage, "possible_conditions") or ()) if triage is not None else ():
+        arrays["conditions"].append(sid(_get(h, "condition")))
+        arrays["confidence"].append(_get(h, "confidence"))
+    arrays["conditions_ptr"].append(len(arrays["conditions"]))
+
+
+def _truncate(arrays: Dict[str, array], rows: int) -> None:
+    # Back to the first ``rows`` records, after a partly appended one
+    for name in list(_SCALARS) + list(_STRING_COLUMNS):
+        del arrays[name][rows:]
+    for name in ("symptoms", "conditions"):
+        ptr = arrays[name + "_ptr"]
+        del ptr[rows + 1:]
+        del arrays[name][ptr[rows]:]
+    del arrays["confidence"][arrays["conditions_ptr"][rows]:]
+
+
+def encode_block(records: Sequence[Tuple], on_error: Optional[Callable[[Tuple, Exception], None]] = None) -> bytes:
+    # ``records`` as queued by AuditLog.record. A record that does not fit its
+    # columns is left out and passed to ``on_error`` (raised without one), so
+    # one bad input never costs the rest of the block.
+    strings: Dict[str, int] = {"": 0}
+
+    def sid(s: Optional[str]) -> int:
+        return strings.setdefault(s or "", len(strings))
+
+    arrays: Dict[str, array] = {name: array(typecode) for name, typecode in _SCALARS.items()}
+    for name in _STRING_COLUMNS:
+        arrays[name] = array("I")
+    for name in ("symptoms", "conditions"):
+        arrays[name + "_ptr"] = array("I", [0])
+        arrays[name] = array("I")
+    arrays["confidence"] = array("f")
+
+    for record in records:
+        rows = len(arrays["ts"])
+        try:
+            _append(arrays, sid, record)
+        except Exception as e:
+            _truncate(arrays, rows)
+            if on_error is None:
+                raise
+            on_error(record, e)
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    arrays["str_off"] = offsets
+    arrays["str_blob"] = array("B", b"".join(encoded))
+
+    layout: Dict[str, List] = {}
+    chunks: List[bytes] = []
+    pos = 0
+    for name, values in arrays.items():
+        raw = values.tobytes()
+        layout[name] = [values.typecode, pos, len(values)]
+        pad = -len(raw) % _ALIGN
+        chunks.append(raw + b"\0" * pad)
+        pos += len(raw) + pad
+    stamps = arrays["ts"]
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "records": len(stamps),
+        "ts_min": min(stamps) if stamps else 0.0,
+        "ts_max": max(stamps) if stamps else 0.0,
+        "size": pos,
+        "arrays": layout,
+    }).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\0" * (-len(prefix) % _ALIGN)
+    return prefix + b"".join(chunks)
+
+
+class AuditLog:
+    # One per process (see get_audit_log); safe to call record() from any thread
+    def __init__(
+        self,
+        directory: PathLike,
+        batch_size: int = 1024,
+        flush_s: float = 2.0,
+        max_pending: int = 10000,
+        segment_bytes: int = 16 << 20,
+        segment_s: float = 3600.0,
+        retention_days: float = 0.0,
+        fsync: bool = False,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_s = flush_s
+        self.segment_bytes = segment_bytes
+        self.segment_s = segment_s
+        self.retention_days = retention_days
+        self.fsync = fsync
+        self.pid = os.getpid()
+        self.written = 0
+        self.dropped = 0
+        self.blocks = 0
+        self.segments = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._file = None
+        self._path: Optional[Path] = None
+        self._opened_at = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def record(
+        self,
+        source: str,
+        data: Any,
+        triage: Any = None,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        lang: Optional[str] = None,
+        fast_path: Optional[str] = None,
+        timings: Optional[Dict[str, Optional[float]]] = None,
+    ) -> None:
+        # ``data``/``triage``: SymptomInput/TriageResult or their JSON dicts;
+        # ``timings``: seconds for "total", "triage" and "llm". Never blocks.
+        try:
+            self._queue.put_nowait((time.time(), source, data, triage, provider, model, lang, fast_path, timings or {}))
+        except queue.Full:
+            self.dropped += 1
+            incr("audit.dropped")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # Waits until everything recorded so far is written
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        pending: List[Tuple] = []
+        deadline = 0.0
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()) if pending else None)
+            except queue.Empty:
+                item = None
+            if isinstance(item, tuple):
+                if not pending:
+                    deadline = time.monotonic() + self.flush_s
+                pending.append(item)
+                if len(pending) < self.batch_size:
+                    continue
+            self._write(pending)
+            pending = []
+            if item is _STOP:
+                self._close_segment()
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _error(self, e: Exception) -> None:
+        self.errors += 1
+        self.last_error = f"{type(e).__name__}: {e}"
+        incr("audit.write_errors")
+
+    def _write(self, records: List[Tuple]) -> None:
+        # A record that cannot be encoded counts as one error; the rest of the
+        # batch is still written
+        bad: List[Exception] = []
+        block = encode_block(records, lambda record, e: bad.append(e))
+        for e in bad:
+            self._error(e)
+        kept = len(records) - len(bad)
+        if not kept:
+            return
+        try:
+            if self._file is None or self._file.tell() >= self.segment_bytes or time.time() - self._opened_at >= self.segment_s:
+                self._rotate()
+            self._file.write(block)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.written += kept
+            self.blocks += 1
+        except Exception as e:
+            self._error(e)
+
+    def _rotate(self) -> None:
+        self._close_segment()
+        self._opened_at = time.time()
+        stamp = datetime.fromtimestamp(self._opened_at, timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self._path = self.directory / f"{stamp}-{self.pid}-{self.segments:04d}{SEGMENT_SUFFIX}"
+        self._file = open(self._path, "ab")
+        self.segments += 1
+        self._expire()
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _expire(self) -> None:
+        if self.retention_days <= 0:
+            return
+        cutoff = time.time() - self.retention_days * 86400.0
+        for path in segments(self.directory):
+            try:
+                if path != self._path and path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                # Still mapped by a reader (Windows) or removed by another process
+                pass
+
+    def stats(self) -> Dict:
+        return {
+            "dir": str(self.directory),
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+            "blocks": self.blocks,
+            "segments": self.segments,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+_DEFAULT: Optional[AuditLog] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def audit_dir() -> Optional[str]:
+    return os.getenv("AUDIT_LOG_DIR") or None
+
+
+def get_audit_log() -> Optional[AuditLog]:
+    # None unless AUDIT_LOG_DIR is set. Created per process, so forked server
+    # processes start their own writer thread and segments.
+    global _DEFAULT
+    directory = audit_dir()
+    if directory is None:
+        return None
+    log = _DEFAULT
+    if log is not None and log.pid == os.getpid():
+        return log
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None or _DEFAULT.pid != os.getpid():
+            _DEFAULT = AuditLog(
+                directory,
+                batch_size=int(os.getenv("AUDIT_BATCH", "1024")),
+                flush_s=float(os.getenv("AUDIT_FLUSH_S", "2")),
+                max_pending=int(os.getenv("AUDIT_MAX_PENDING", "10000")),
+                segment_bytes=int(float(os.getenv("AUDIT_SEGMENT_MB", "16")) * (1 << 20)),
+                segment_s=float(os.getenv("AUDIT_SEGMENT_S", "3600")),
+                retention_days=float(os.getenv("AUDIT_RETENTION_DAYS", "0")),
+                fsync=os.getenv("AUDIT_FSYNC", "").strip().lower() in ("1", "true", "yes", "on"),
+            )
+            atexit.register(_DEFAULT.close)
+        return _DEFAULT
+
+
+def audit(source: str, data: Any, triage: Any = None, **kwargs) -> None:
+    # AuditLog.record on the process log, if there is one
+    log = get_audit_log()
+    if log is not None:
+        log.record(source, data, triage, **kwargs)
+
+
+# Query side
+
+
+class Block:
+    # Columns of one block as memoryviews over the mapped segment
+    def __init__(self, header: Dict, data: memoryview):
+        self.records: int = header["records"]
+        self.ts_min: float = header["ts_min"]
+        self.ts_max: float = header["ts_max"]
+        self._layout: Dict[str, List] = header["arrays"]
+        self._data = data
+        self._strings: Optional[List[Optional[str]]] = None
+        self._offsets: Optional[memoryview] = None
+        self._blob: Optional[memoryview] = None
+
+    def column(self, name: str) -> memoryview:
+        typecode, offset, count = self._layout[name]
+        chunk = self._data[offset:offset + count * array(typecode).itemsize]
+        return chunk if typecode == "B" else chunk.cast(typecode)
+
+    def string(self, i: int) -> str:
+        # Decoded on first access
+        if self._strings is None:
+            self._offsets = self.column("str_off")
+            self._blob = self.column("str_blob")
+            self._strings = [None] * (len(self._offsets) - 1)
+        s = self._strings[i]
+        if s is None:
+            s = self._strings[i] = bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+        return s
+
+    def lists(self, name: str) -> Tuple[memoryview, memoryview]:
+        return self.column(name + "_ptr"), self.column(name)
+
+
+def segments(directory: PathLike) -> List[Path]:
+    return sorted(Path(directory).glob("*" + SEGMENT_SUFFIX))
+
+
+def read_blocks(path: PathLike) -> Iterator[Block]:
+    # A block cut short by a crash ends the segment
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    pos = 0
+    while pos + len(MAGIC) + 4 <= size:
+        if mm[pos:pos + len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: no audit block at offset {pos}")
+        (header_len,) = struct.unpack_from("<I", mm, pos + len(MAGIC))
+        start = pos + len(MAGIC) + 4
+        if start + header_len > size:
+            return
+        header = json.loads(mm[start:start + header_len].decode("utf-8"))
+        if header.get("version") != FORMAT_VERSION or header.get("byteorder") != sys.byteorder:
+            raise ValueError(f"{path}: unsupported audit block (version {header.get('version')}, {header.get('byteorder')}-endian)")
+        base = start + header_len
+        base += -base % _ALIGN
+        end = base + header["size"]
+        if end > size:
+            return
+        yield Block(header, view[base:end])
+        pos = end
+
+
+def _rows(block: Block, since: Optional[float], until: Optional[float], sources: Optional[Sequence[str]], risks: Optional[Sequence[str]]) -> Sequence[int]:
+    rows: Sequence[int] = range(block.records)
+    if since is not None or until is not None:
+        ts = block.column("ts")
+        lo = -math.inf if since is None else since
+        hi = math.inf if until is None else until
+        rows = [i for i in rows if lo <= ts[i] < hi]
+    if sources:
+        col = block.column("source")
+        rows = [i for i in rows if block.string(col[i]) in sources]
+    if risks:
+        codes = {RISK_LEVELS.index(r) for r in risks}
+        col = block.column("risk")
+        rows = [i for i in rows if col[i] in codes]
+    return rows
+
+
+def scan(
+    directory: PathLike,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    sources: Optional[Sequence[str]] = None,
+    risks: Optional[Sequence[str]] = None,
+) -> Iterator[Tuple[Block, Sequence[int]]]:
+    # (block, selected rows); blocks entirely outside [since, until) are not read
+    for path in segments(directory):
+        for block in read_blocks(path):
+            if (since is not None and block.ts_max < since) or (until is not None and block.ts_min >= until):
+                continue
+            rows = _rows(block, since, until, sources, risks)
+            if rows:
+                yield block, rows
+
+
+def count_values(blocks: Iterable[Tuple[Block, Sequence[int]]], column: str) -> Counter:
+    # String column -> records per value
+    counts: Counter = Counter()
+    for block, rows in blocks:
+        col = block.column(column)
+        ids = Counter(col[i] for i in rows)
+        for i, n in ids.items():
+            counts[block.string(i)] += n
+    return counts
+
+
+def top_symptoms(blocks: Iterable[Tuple[Block, Sequence[int]]], n: int = 20, normalize: bool = False) -> List[Tuple[str, int]]:
+    # Mentions per symptom. normalize=True maps entries through the current
+    # triage rules first (synonyms, typos), once per distinct string.
+    counts: Counter = Counter()
+    for block, rows in blocks:
+        ptr, values = block.lists("symptoms")
+        if len(rows) == block.records:
+            ids = Counter(values)
+        else:
+            ids = Counter()
+            for i in rows:
+                ids.update(values[ptr[i]:ptr[i + 1]])
+        for i, k in ids.items():
+            counts[block.string(i).strip().lower()] += k
+    if normalize:
+        from triage import get_compiled_rules
+
+        rules = get_compiled_rules()
+        merged: Counter = Counter()
+        for s, k in counts.items():
+            for name in rules.normalize([s]) or [s]:
+                merged[name] += k
+        counts = merged
+    return counts.most_common(n)
+
+
+def top_conditions(blocks: Iterable[Tuple[Block, Sequence[int]]], n: int = 20) -> List[Tuple[str, int, float]]:
+    # (condition, records where it ranked first, mean confidence there)
+    np = optional_module("numpy")
+    counts: Counter = Counter()
+    confidence: Dict[str, float] = {}
+    for block, rows in blocks:
+        ptr, values = block.lists("conditions")
+        conf = block.column("confidence")
+        if np is not None:
+            starts = np.frombuffer(ptr, dtype=np.uint32).astype(np.intp)
+            firsts = starts[:-1][starts[1:] > starts[:-1]] if len(rows) == block.records else np.array(
+                [ptr[i] for i in rows if ptr[i] < ptr[i + 1]], dtype=np.intp
+            )
+            ids = np.frombuffer(values, dtype=np.uint32)[firsts]
+            sums = np.bincount(ids, weights=np.frombuffer(conf, dtype=np.float32)[firsts])
+            for i, k in zip(*np.unique(ids, return_counts=True)):
+                name = block.string(int(i))
+                counts[name] += int(k)
+                confidence[name] = confidence.get(name, 0.0) + float(sums[i])
+            continue
+        for i in rows:
+            start = ptr[i]
+            if start == ptr[i + 1]:
+                continue
+            name = block.string(values[start])
+            counts[name] += 1
+            confidence[name] = confidence.get(name, 0.0) + conf[start]
+    return [(name, k, confidence[name] / k) for name, k in counts.most_common(n)]
+
+
+class LatencyHistogram:
+    # Log-spaced buckets (2% wide), so percentiles over any number of records
+    # take constant memory
+    RATIO = 1.02
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        if ms != ms:
+            return
+        self.counts[math.floor(math.log(max(ms, 0.001), self.RATIO))] += 1
+        self.count += 1
+        self.max = max(self.max, ms)
+
+    def add_column(self, column: memoryview, rows: Sequence[int]) -> None:
+        # Vectorized with numpy when it is installed
+        np = optional_module("numpy")
+        if np is None:
+            for i in rows:
+                self.add(column[i])
+            return
+        values = np.frombuffer(column, dtype=np.float32)
+        if len(rows) != len(values):
+            values = values[np.asarray(rows, dtype=np.intp)]
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        buckets = np.floor(np.log(np.maximum(values, 0.001).astype(np.float64)) / math.log(self.RATIO)).astype(np.int64)
+        keys, counts = np.unique(buckets, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.counts[key] += count
+        self.count += int(values.size)
+        self.max = max(self.max, float(values.max()))
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return math.nan
+        rank = p * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen > rank:
+                return min(self.max, self.RATIO ** (bucket + 0.5))
+        return self.max
+
+
+def latency_histograms(blocks: Iterable[Tuple[Block, Sequence[int]]]) -> Dict[str, LatencyHistogram]:
+    hists = {name: LatencyHistogram() for name in LATENCIES}
+    for block, rows in blocks:
+        for name, hist in hists.items():
+            hist.add_column(block.column(name), rows)
+    return hists
+
+
+def iter_records(blocks: Iterable[Tuple[Block, Sequence[int]]]) -> Iterator[Dict]:
+    # Full records as dicts, for review of a selection
+    for block, rows in blocks:
+        cols = {name: block.column(name) for name in list(_SCALARS) + list(_STRING_COLUMNS)}
+        sym_ptr, sym = block.lists("symptoms")
+        cond_ptr, cond = block.lists("conditions")
+        conf = block.column("confidence")
+        for i in rows:
+            risk = cols["risk"][i]
+            yield {
+                "ts": datetime.fromtimestamp(cols["ts"][i], timezone.utc).isoformat(),
+                "source": block.string(cols["source"][i]),
+                "input": {
+                    "age": None if cols["age"][i] == MISSING else cols["age"][i],
+                    "sex": block.string(cols["sex"][i]) or None,
+                    "symptoms": [block.string(s) for s in sym[sym_ptr[i]:sym_ptr[i + 1]]],
+                    "duration_days": None if cols["duration_days"][i] == MISSING else cols["duration_days"][i],
+                    "severity_1to10": None if cols["severity"][i] == MISSING else cols["severity"][i],
+                    "notes": block.string(cols["notes"][i]) or None,
+                },
+                "risk_level": RISK_LEVELS[risk] if risk != MISSING else None,
+                "conditions": [
+                    {"condition": block.string(cond[j]), "confidence": round(conf[j], 4)}
+                    for j in range(cond_ptr[i], cond_ptr[i + 1])
+                ],
+                "provider": block.string(cols["provider"][i]) or None,
+                "model": block.string(cols["model"][i]) or None,
+                "lang": block.string(cols["lang"][i]) or None,
+                "fast_path": block.string(cols["fast_path"][i]) or None,
+                "latency_ms": {name[:-3]: round(cols[name][i], 2) for name in LATENCIES if cols[name][i] == cols[name][i]},
+            }
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    # ISO date or datetime, UTC unless it carries an offset
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate the triage audit log without loading it into memory")
+    parser.add_argument("command", choices=["summary", "symptoms", "conditions", "latency", "dump"])
+    parser.add_argument("--dir", default=audit_dir() or "audit_log", help="segment directory (default AUDIT_LOG_DIR)")
+    parser.add_argument("--since", help="ISO date/time, UTC unless an offset is given")
+    parser.add_argument("--until", help="ISO date/time (exclusive)")
+    parser.add_argument("--source", action="append", choices=SOURCES, help="repeat to select several")
+    parser.add_argument("--risk", action="append", choices=RISK_LEVELS, help="repeat to select several")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--normalize", action="store_true", help="symptoms: merge through the triage rules (synonyms, typos)")
+    parser.add_argument("--limit", type=int, default=100, help="dump: at most this many records")
+    args = parser.parse_args()
+
+    def selected():
+        return scan(args.dir, _timestamp(args.since), _timestamp(args.until), args.source, args.risk)
+
+    if args.command == "summary":
+        files = segments(args.dir)
+        records, first, last = 0, math.inf, -math.inf
+        risks: Counter = Counter()
+        for block, rows in selected():
+            records += len(rows)
+            first, last = min(first, block.ts_min), max(last, block.ts_max)
+            col = block.column("risk")
+            risks.update(col[i] for i in rows)
+        print(f"{records} records in {len(files)} segments ({sum(p.stat().st_size for p in files) / (1 << 20):.1f} MiB)")
+        if records:
+            print(f"from {datetime.fromtimestamp(first, timezone.utc):%Y-%m-%d %H:%M} to {datetime.fromtimestamp(last, timezone.utc):%Y-%m-%d %H:%M} UTC")
+        print("risk: " + ", ".join(f"{RISK_LEVELS[c] if c != MISSING else 'none'} {n}" for c, n in sorted(risks.items())))
+        for column in ("source", "provider", "model"):
+            counts = count_values(selected(), column)
+            print(f"{column}: " + ", ".join(f"{v or '-'} {n}" for v, n in counts.most_common(args.top)))
+    elif args.command == "symptoms":
+        for name, n in top_symptoms(selected(), args.top, args.normalize):
+            print(f"{n:>8}  {name}")
+    elif args.command == "conditions":
+        for name, n, confidence in top_conditions(selected(), args.top):
+            print(f"{n:>8}  {confidence:5.2f}  {name}")
+    elif args.command == "latency":
+        print(f"{'stage':<8}{'n':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, hist in latency_histograms(selected()).items():
+            row = [hist.percentile(p) for p in (0.5, 0.9, 0.99)] + [hist.max]
+            print(f"{name[:-3]:<8}{hist.count:>10}" + "".join(f"{v:>10.1f}" for v in row))
+    else:
+        for k, record in enumerate(iter_records(selected())):
+            if k >= args.limit:
+                break
+            print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
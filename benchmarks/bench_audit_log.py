@@ -0,0 +1,79 @@
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from workloads import make_intakes  # noqa: E402
+
+# Audit log costs: time record() adds to a request, writer throughput, bytes
+# per record next to JSON lines, and how fast the query side aggregates the
+# segments (with its peak Python memory, which should not grow with the log).
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit log write and query costs")
+    parser.add_argument("-n", type=int, default=200_000, help="records to write")
+    parser.add_argument("--segment-mb", type=float, default=4.0)
+    args = parser.parse_args()
+
+    import audit
+    from lazy import optional_module
+    from triage import triage_symptoms
+
+    # Imported by the aggregations on first use; keep that out of the numbers
+    optional_module("numpy")
+
+    intakes = make_intakes(2_000, symptoms=3, seed=4)
+    pairs = [(d, triage_symptoms(d)) for d in intakes]
+    timings = {"total": 0.8, "triage": 0.002, "llm": 0.79}
+    directory = Path(tempfile.mkdtemp(prefix="audit-bench-"))
+    try:
+        log = audit.AuditLog(directory, max_pending=args.n, segment_bytes=int(args.segment_mb * (1 << 20)))
+        costs = []
+        started = time.perf_counter()
+        for i in range(args.n):
+            data, tr = pairs[i % len(pairs)]
+            t0 = time.perf_counter()
+            log.record("advice", data, tr, provider="OpenAI", model="gpt-4o-mini", lang="en", timings=timings)
+            costs.append((time.perf_counter() - t0) * 1e6)
+        queued = time.perf_counter() - started
+        log.flush()
+        written = time.perf_counter() - started
+        log.close()
+        costs.sort()
+        print(f"record(): p50 {statistics.median(costs):.2f} us, p99 {costs[int(0.99 * (len(costs) - 1))]:.2f} us "
+              f"({args.n} records queued in {queued:.2f}s, dropped {log.dropped})")
+        print(f"writer: {args.n / written:,.0f} records/s, {log.blocks} blocks in {log.segments} segments")
+
+        size = sum(p.stat().st_size for p in audit.segments(directory))
+        sample = [json.dumps({"input": d.model_dump(mode="json"), "triage": tr.model_dump(mode="json")}, ensure_ascii=False) for d, tr in pairs[:500]]
+        jsonl = statistics.mean(len(s.encode("utf-8")) + 1 for s in sample)
+        print(f"size: {size / args.n:.0f} bytes/record (JSON lines of input + triage: {jsonl:.0f})")
+
+        for label, run in (
+            ("summary scan", lambda: sum(len(rows) for _, rows in audit.scan(directory))),
+            ("top symptoms", lambda: audit.top_symptoms(audit.scan(directory), 20)),
+            ("top conditions", lambda: audit.top_conditions(audit.scan(directory), 20)),
+            ("latency percentiles", lambda: audit.latency_histograms(audit.scan(directory))),
+        ):
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            run()
+            seconds = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{label:<22}{seconds:8.2f}s  {args.n / seconds:>12,.0f} records/s  peak {peak / (1 << 20):6.2f} MiB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from workloads import make_intakes  # noqa: E402
+
+# Records/s and peak RSS of bulk_triage.py for several worker counts on a
+# synthetic JSONL export. Each run is a separate process, so peaks do not mix.
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def write_export(path: Path, n: int) -> None:
+    pool = make_intakes(5000, symptoms=3, seed=21)
+    with path.open("w", encoding="utf-8") as fh:
+        for i in range(n):
+            fh.write(json.dumps(dict(pool[i % len(pool)].model_dump(), id=f"r{i}"), ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bulk_triage.py scaling over worker counts")
+    parser.add_argument("-n", type=int, default=200_000, help="records in the synthetic export")
+    parser.add_argument("--workers", default=f"1,2,{os.cpu_count() or 1}", help="comma-separated worker counts")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "intakes.jsonl"
+        write_export(src, args.n)
+        print(f"export: {args.n} records, {src.stat().st_size / 1e6:.1f} MB")
+        print(f"{'workers':>7} {'seconds':>8} {'records/s':>11} {'speedup':>8} {'peak RSS MB':>12}")
+        base = None
+        for workers in sorted({int(w) for w in args.workers.split(",")}):
+            dest = Path(tmp) / f"out.{args.format}"
+            t0 = time.perf_counter()
+            subprocess.run(
+                [sys.executable, str(ROOT / "bulk_triage.py"), str(src), "-o", str(dest), "-w", str(workers)],
+                check=True, stderr=subprocess.DEVNULL,
+            )
+            elapsed = time.perf_counter() - t0
+            # Largest child (parent reader or one worker), KiB on Linux
+            peak_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024.0
+            rate = args.n / elapsed
+            base = base or rate
+            print(f"{workers:>7} {elapsed:>8.2f} {rate:>11,.0f} {rate / base:>7.1f}x {peak_mb:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
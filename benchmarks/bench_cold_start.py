@@ -0,0 +1,121 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Import-time profile and first-request latency, each measured in fresh
+# interpreter processes (median of --repeat runs):
+#
+#   1. ``python -X importtime -c "import <module>"`` for the entry modules,
+#      plus the packages that dominate the import of --detail;
+#   2. time to the first triage + localization + FAQ search in a new process,
+#      lazily and after warmup.preload();
+#   3. the cost each provider SDK adds once something does need it.
+
+MODULES = ["models", "triage", "faq", "llm", "pipeline", "server", "bulk_triage", "app"]
+
+FIRST_REQUEST = """
+import json, time
+t0 = time.perf_counter()
+import pipeline
+from faq import search_faq
+from i18n import localize_triage
+from models import SymptomInput
+from triage import triage_symptoms
+t1 = time.perf_counter()
+steps = {steps!r}
+if steps:
+    from warmup import preload
+    preload(steps)
+t2 = time.perf_counter()
+data = SymptomInput(symptoms=["fever", "cough"], age=30, severity_1to10=5)
+localize_triage(triage_symptoms(data), "en")
+search_faq("cough", lang="en")
+t3 = time.perf_counter()
+print(json.dumps({{"import": t1 - t0, "preload": t2 - t1, "first_request": t3 - t2}}))
+"""
+
+PROVIDER_IMPORT = """
+import json, time
+import llm
+t0 = time.perf_counter()
+ok = llm.chat_class({provider!r}) is not None
+print(json.dumps({{"seconds": time.perf_counter() - t0, "ok": ok}}))
+"""
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True)
+
+
+def import_profile(module: str) -> Tuple[float, Dict[str, float]]:
+    # (cumulative seconds for ``module``, self seconds per top-level package), or (nan, {}) if it fails
+    proc = _run(["-X", "importtime", "-c", f"import {module}"])
+    if proc.returncode != 0:
+        return float("nan"), {}
+    total = float("nan")
+    packages: Dict[str, float] = defaultdict(float)
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1e6
+        if name.strip() == module:
+            total = int(cumulative_us) / 1e6
+    return total, dict(packages)
+
+
+def run_json(code: str) -> Dict:
+    proc = _run(["-c", code])
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile and cold first-request latency")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per measurement (median is reported)")
+    parser.add_argument("--detail", default="server", help="module whose heaviest imported packages are listed")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'module':<14}{'import ms':>12}")
+    detail: Dict[str, List[float]] = defaultdict(list)
+    for module in MODULES:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        if any(total != total for total, _ in runs):
+            print(f"{module:<14}{'n/a':>12}   (import failed: missing dependency?)")
+            continue
+        print(f"{module:<14}{statistics.median(t for t, _ in runs) * 1000:>12.1f}")
+        if module == args.detail:
+            for _, packages in runs:
+                for name, seconds in packages.items():
+                    detail[name].append(seconds)
+
+    if detail:
+        print(f"\nheaviest packages imported by {args.detail} (self time, median ms)")
+        ranked = sorted(((statistics.median(v), name) for name, v in detail.items()), reverse=True)
+        for seconds, name in ranked[: args.top]:
+            print(f"  {name:<28}{seconds * 1000:>8.1f}")
+
+    print(f"\n{'first request':<22}{'import ms':>12}{'preload ms':>12}{'request ms':>12}")
+    for label, steps in (("lazy", ()), ("preloaded", ("models", "rules", "i18n", "faq"))):
+        runs = [run_json(FIRST_REQUEST.format(steps=steps)) for _ in range(args.repeat)]
+        row = [statistics.median(r[key] for r in runs) * 1000 for key in ("import", "preload", "first_request")]
+        print(f"{label:<22}" + "".join(f"{v:>12.1f}" for v in row))
+
+    print("\nprovider SDK import on first use")
+    for provider in ("OpenAI", "Ollama"):
+        runs = [run_json(PROVIDER_IMPORT.format(provider=provider)) for _ in range(args.repeat)]
+        status = "" if runs[0]["ok"] else "  (not installed)"
+        print(f"  {provider:<20}{statistics.median(r['seconds'] for r in runs) * 1000:>8.1f} ms{status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from workloads import make_retrieval_set  # noqa: E402
+
+# Lexical (BM25) vs semantic (vector) vs hybrid FAQ search on a synthetic
+# corpus with known answers: recall@k per query kind, per-query latency, and
+# the cost of building the memory-mapped vector index and mapping it again.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAQ retrieval recall and latency")
+    parser.add_argument("-n", type=int, default=100_000, help="FAQ entries")
+    parser.add_argument("--queries", type=int, default=300, help="queries per kind")
+    parser.add_argument("-k", type=int, default=10, help="recall@k")
+    parser.add_argument("--weight", type=float, default=0.5, help="vector weight in hybrid mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["FAQ_INDEX_DIR"] = tmp
+        import embeddings
+        from faq import FAQIndex, SEARCH_MODES
+
+        items, queries = make_retrieval_set(args.n, args.queries, seed=args.n)
+        t0 = time.perf_counter()
+        index = FAQIndex(items, source="bench", version=1)
+        lexical_build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        vectors = index.vectors()
+        vector_build = time.perf_counter() - t0
+        size_mb = (Path(vectors.path) / "vectors.npy").stat().st_size / 1e6
+        texts = embeddings.texts_for(items)
+        t0 = time.perf_counter()
+        embeddings.load_or_build("bench", 1, texts)
+        remap = time.perf_counter() - t0
+        print(f"corpus {args.n} entries: BM25 index {lexical_build:.2f}s, vector index {vector_build:.2f}s "
+              f"({vectors.embedder.name}, {size_mb:.0f} MB float32), re-open (mmap) {remap * 1000:.1f} ms")
+
+        print(f"{'mode':<10}" + "".join(f"{kind + f' R@{args.k}':>16}" for kind in queries) + f"{'p50 ms':>10}{'p95 ms':>10}")
+        for mode in SEARCH_MODES:
+            recalls, latencies = [], []
+            for kind, pairs in queries.items():
+                hits = 0
+                for query, doc in pairs:
+                    t0 = time.perf_counter()
+                    found = index.search(query, args.k, mode, args.weight)
+                    latencies.append(time.perf_counter() - t0)
+                    hits += items[doc] in found
+                recalls.append(hits / len(pairs))
+            ordered = sorted(latencies)
+            p95 = ordered[int(0.95 * (len(ordered) - 1))]
+            print(f"{mode:<10}" + "".join(f"{r:>16.3f}" for r in recalls) + f"{statistics.median(ordered) * 1000:>10.2f}{p95 * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
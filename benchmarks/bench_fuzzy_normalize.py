@@ -0,0 +1,103 @@
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from workloads import _name, _typo, make_rules  # noqa: E402
+
+# Typo-tolerant symptom normalization on a large synthetic rule set: cost of
+# building the symmetric-delete index, per-lookup latency without and with the
+# memo, and how often a misspelt symptom normalizes like the correct one.
+# Exact matches never reach the fuzzy path and are timed for comparison.
+# Keywords and synonyms are made-up words (workloads._name), so a typo rarely
+# lands on another known word by accident.
+
+
+def make_vocabulary(n_rules: int, n_synonyms: int, seed: int):
+    rng = random.Random(seed)
+    source, _, _ = make_rules(n_rules, seed=seed)
+
+    def phrase() -> str:
+        return " ".join(_name(rng) for _ in range(rng.randint(1, 2)))
+
+    rules = {}
+    for spec in source.values():
+        while True:
+            keyword = phrase()
+            if keyword not in rules:
+                rules[keyword] = spec
+                break
+    keywords = list(rules)
+    synonyms = {}
+    while len(synonyms) < n_synonyms:
+        synonyms[phrase()] = rng.choice(keywords)
+    return rules, synonyms, rng.sample(keywords, max(1, n_rules // 50))
+
+
+def timed(fn, values):
+    out = []
+    for v in values:
+        t0 = time.perf_counter()
+        fn(v)
+        out.append((time.perf_counter() - t0) * 1e6)
+    return out
+
+
+def describe(label: str, us) -> None:
+    ordered = sorted(us)
+    print(f"{label:<26} p50 {statistics.median(ordered):8.2f} us  p99 {ordered[int(0.99 * (len(ordered) - 1))]:8.2f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzzy symptom normalization")
+    parser.add_argument("--rules", type=int, default=5_000, help="rule keywords")
+    parser.add_argument("--synonyms", type=int, default=20_000)
+    parser.add_argument("-n", type=int, default=5_000, help="misspelt inputs")
+    args = parser.parse_args()
+
+    from triage import CompiledRules, get_compiled_rules
+
+    rules, synonyms, emergency = make_vocabulary(args.rules, args.synonyms, seed=1)
+    compiled = CompiledRules(rules, synonyms, emergency)
+    t0 = time.perf_counter()
+    index = compiled.fuzzy()
+    build = time.perf_counter() - t0
+    print(f"{len(rules)} keywords + {len(synonyms)} synonyms -> {len(index)} words, index built in {build:.2f}s")
+
+    rng = random.Random(7)
+    phrases = list(rules) + list(synonyms)
+    pairs = []
+    while len(pairs) < args.n:
+        phrase = rng.choice(phrases)
+        words = phrase.split()
+        i = rng.randrange(len(words))
+        if len(words[i]) < 5:
+            continue
+        words[i] = _typo(rng, words[i])
+        typo = " ".join(words)
+        if typo != phrase:
+            pairs.append((phrase, typo))
+
+    describe("exact match", timed(lambda s: compiled.normalize([s]), [p for p, _ in pairs]))
+    describe("index lookup (no memo)", timed(lambda s: index._correct(s), [t for _, t in pairs]))
+    describe("normalize, cold", timed(lambda s: compiled.normalize([s]), [t for _, t in pairs]))
+    describe("normalize, memoized", timed(lambda s: compiled.normalize([s]), [t for _, t in pairs]))
+
+    right = sum(compiled.normalize([t]) == compiled.normalize([p]) for p, t in pairs)
+    unmatched = sum(compiled.normalize([t]) == [t] for _, t in pairs)
+    print(f"corrected {right / len(pairs):.3f}, left as typed {unmatched / len(pairs):.3f}, "
+          f"wrong {(len(pairs) - right - unmatched) / len(pairs):.3f} (n={len(pairs)})")
+
+    builtin = get_compiled_rules()
+    # Typos, then real words next to a symptom word that must stay as typed
+    for s in ("feaver", "кашел", "температра", "shortnes of breth", "headahce", "never", "couch", "живое", "never slept"):
+        print(f"  {s!r:<22} -> {builtin.normalize([s])}")
+
+
+if __name__ == "__main__":
+    main()
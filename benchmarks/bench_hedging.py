@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_llm_server import server_url, start_stub_server  # noqa: E402
+from workloads import make_intakes  # noqa: E402
+
+# Single-target vs hedged advice against two local stub servers: a fast primary
+# with occasional latency spikes and a slower but steady secondary. A last
+# phase makes the primary fail to show the circuit breaker routing around it.
+
+
+def summarize(label: str, latencies, extra: str = "") -> None:
+    ordered = sorted(latencies)
+
+    def q(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000.0
+
+    print(f"{label:<22} n={len(ordered):<4} p50 {q(0.50):7.1f} ms  p95 {q(0.95):7.1f} ms  p99 {q(0.99):7.1f} ms  max {ordered[-1] * 1000.0:7.1f} ms {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedged LLM requests against two stub servers")
+    parser.add_argument("-n", type=int, default=200, help="requests per mode")
+    parser.add_argument("--primary-latency", type=float, default=0.05)
+    parser.add_argument("--tail-prob", type=float, default=0.08, help="share of primary requests that spike")
+    parser.add_argument("--tail-latency", type=float, default=1.5)
+    parser.add_argument("--secondary-latency", type=float, default=0.15)
+    parser.add_argument("--secondary-provider", choices=["OpenAI", "Ollama"], default="Ollama")
+    parser.add_argument("--hedge-delay-ms", type=float, default=200.0, help="hedge delay until the primary has latency samples")
+    parser.add_argument("--concurrency", type=int, default=16, help="in-flight requests for the async mode")
+    args = parser.parse_args()
+
+    primary, primary_cfg = start_stub_server(latency_s=args.primary_latency, tail_prob=args.tail_prob, tail_latency_s=args.tail_latency, seed=1)
+    secondary, _ = start_stub_server(latency_s=args.secondary_latency)
+    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY") or "stub"
+
+    import metrics
+    from hedging import HedgePolicy, LLMTarget, ahedged_advice, hedged_advice, reset_target_stats, target_stats
+    from llm import get_llm
+    from triage import triage_symptoms
+
+    metrics.enable()
+    a = LLMTarget("OpenAI", "stub-primary", timeout_s=5.0, base_url=server_url(primary) + "/v1")
+    b_url = server_url(secondary) + ("/v1" if args.secondary_provider == "OpenAI" else "")
+    b = LLMTarget(args.secondary_provider, "stub-secondary", timeout_s=5.0, base_url=b_url)
+    policy = HedgePolicy(delay_s=args.hedge_delay_ms / 1000.0, min_samples=20, failure_threshold=3, reset_after_s=60.0)
+    pairs = [(d, triage_symptoms(d)) for d in make_intakes(args.n, symptoms=3, seed=4)]
+
+    client = get_llm(a.provider, a.model, a.temperature, a.base_url)
+    single = []
+    for d, tr in pairs:
+        t0 = time.perf_counter()
+        client.invoke("ping")
+        single.append(time.perf_counter() - t0)
+    summarize("primary only", single)
+
+    reset_target_stats()
+    metrics.reset()
+    hedged = []
+    for d, tr in pairs:
+        t0 = time.perf_counter()
+        hedged_advice(d, tr, [a, b], lang="en", policy=policy)
+        hedged.append(time.perf_counter() - t0)
+    counters = metrics.snapshot()["counters"]
+    summarize("hedged (threads)", hedged, f"fired {counters.get('llm.hedge_fired', 0):.0f}, won {counters.get('llm.hedge_won', 0):.0f}")
+
+    async def run_async():
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one(d, tr):
+            async with sem:
+                t0 = time.perf_counter()
+                await ahedged_advice(d, tr, [a, b], lang="en", policy=policy)
+                return time.perf_counter() - t0
+
+        return await asyncio.gather(*(one(d, tr) for d, tr in pairs))
+
+    metrics.reset()
+    latencies = asyncio.run(run_async())
+    counters = metrics.snapshot()["counters"]
+    summarize(f"hedged (async c={args.concurrency})", latencies, f"fired {counters.get('llm.hedge_fired', 0):.0f}, won {counters.get('llm.hedge_won', 0):.0f}")
+
+    # Primary down: after failure_threshold errors the breaker opens and requests go straight to the secondary
+    primary_cfg.fail = True
+    metrics.reset()
+    failing = []
+    for d, tr in pairs[:30]:
+        t0 = time.perf_counter()
+        hedged_advice(d, tr, [a, b], lang="en", policy=policy)
+        failing.append(time.perf_counter() - t0)
+    counters = metrics.snapshot()["counters"]
+    summarize("primary failing", failing, f"breaker skips {counters.get('llm.breaker_open', 0):.0f}, failovers {counters.get('llm.failover', 0):.0f}")
+    for name, s in target_stats().items():
+        p50 = f"{s['p50_s'] * 1000:.0f} ms" if s["p50_s"] is not None else "-"
+        print(f"  {name:<60} breaker {s['breaker']:<9} ok {s['successes']:<4} failed {s['failures']:<3} timeouts {s['timeouts']:<3} p50 {p50}")
+    primary.shutdown()
+    secondary.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from workloads import _NOISE, make_rules  # noqa: E402
+
+# Live preview while symptoms are entered one tag at a time: per edit (add or
+# remove a tag, then read the top conditions and risk level), the cost of
+# recomputing with triage_compact against IncrementalTriage applying the delta.
+# Every step is checked for equality, so a speedup never hides a wrong answer.
+# Intakes grow to --tags tags, which is where recomputation is most expensive.
+
+
+def make_edits(vocab, sessions: int, tags: int, seed: int):
+    # Per session, the tag list after each edit: mostly additions until
+    # ``tags`` are present, with removals mixed in
+    rng = random.Random(seed)
+    out = []
+    for _ in range(sessions):
+        current, steps = [], []
+        while len(current) < tags:
+            if current and rng.random() < 0.25:
+                current.pop(rng.randrange(len(current)))
+            else:
+                current.append(rng.choice(vocab))
+            steps.append(list(current))
+        out.append(steps)
+    return out
+
+
+def describe(label: str, us) -> None:
+    ordered = sorted(us)
+    print(f"{label:<28} p50 {statistics.median(ordered):8.2f} us  p99 {ordered[int(0.99 * (len(ordered) - 1))]:8.2f} us")
+
+
+def run(label: str, rules, vocab, args) -> None:
+    from models import SymptomInput
+    from triage import IncrementalTriage, triage_compact
+
+    full, delta = [], []
+    edits = make_edits(vocab, args.sessions, args.tags, seed=5)
+    for steps in edits:
+        live = IncrementalTriage(rules, severity_1to10=6, duration_days=3)
+        for tags in steps:
+            data = SymptomInput(symptoms=tags, severity_1to10=6, duration_days=3)
+            t0 = time.perf_counter()
+            expected = triage_compact(data, rules)
+            t1 = time.perf_counter()
+            live.sync(tags)
+            got = live.compact()
+            t2 = time.perf_counter()
+            assert got == expected, (tags, got, expected)
+            full.append((t1 - t0) * 1e6)
+            delta.append((t2 - t1) * 1e6)
+    print(f"{label}: {sum(map(len, edits))} edits, up to {args.tags} tags")
+    describe("  triage_compact per edit", full)
+    describe("  incremental per edit", delta)
+    print(f"  speedup (p50) {statistics.median(full) / statistics.median(delta):.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental triage for live previews")
+    parser.add_argument("--rules", type=int, default=5_000, help="rules in the synthetic rule set")
+    parser.add_argument("--sessions", type=int, default=200, help="simulated intakes")
+    parser.add_argument("--tags", type=int, default=20, help="tags per intake when it is complete")
+    args = parser.parse_args()
+
+    from i18n import SYMPTOM_SUGGESTIONS
+    from triage import CompiledRules, get_compiled_rules
+
+    builtin = get_compiled_rules()
+    vocab = [s for lang in SYMPTOM_SUGGESTIONS.values() for s in lang] + _NOISE
+    run("built-in rules", builtin, vocab, args)
+
+    rules, synonyms, emergency = make_rules(args.rules, seed=2)
+    compiled = CompiledRules(rules, synonyms, emergency)
+    run(f"{args.rules} synthetic rules", compiled, list(rules) + list(synonyms) + _NOISE, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_llm_server import server_url, start_stub_server  # noqa: E402
+from workloads import make_intakes  # noqa: E402
+
+# Advice throughput for a burst of concurrent intakes against a stub Ollama
+# that serves ``--parallel`` requests at a time: sequential calls, one request
+# per intake, and coalesced batches (AdviceBatcher). ``--distinct`` controls
+# how many different intakes the burst is drawn from, so popular symptom
+# combinations repeat and show the in-flight deduplication.
+
+
+def summarize(label: str, latencies, elapsed: float, sent: int) -> None:
+    ordered = sorted(latencies)
+
+    def q(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000.0
+
+    print(f"{label:<20} {len(ordered) / elapsed:8.1f} req/s  p50 {q(0.50):7.1f} ms  p95 {q(0.95):7.1f} ms  sent {sent}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coalesced vs per-request LLM advice against a stub Ollama")
+    parser.add_argument("-n", type=int, default=400, help="intakes in the burst")
+    parser.add_argument("--distinct", type=int, default=100, help="distinct intakes the burst is drawn from")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub seconds per request")
+    parser.add_argument("--parallel", type=int, default=8, help="stub requests served at once")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    server, cfg = start_stub_server(latency_s=args.latency, parallel=args.parallel)
+    os.environ["OLLAMA_BASE_URL"] = server_url(server)
+    os.environ["LLM_BATCH_MAX"] = str(args.max_batch)
+    os.environ["LLM_BATCH_WAIT_MS"] = str(args.max_wait_ms)
+    os.environ["LLM_BATCH_THREADS"] = str(max(1, args.concurrency // args.max_batch))
+
+    from llm import agenerate_advice, batcher_stats, generate_advice
+    from triage import triage_symptoms
+
+    rng = random.Random(7)
+    pool = [(d, triage_symptoms(d)) for d in make_intakes(args.distinct, symptoms=3, seed=9)]
+    burst = [rng.choice(pool) for _ in range(args.n)]
+    settings = dict(provider="Ollama", openai_model="", ollama_model="stub", temperature=0.2, lang="en")
+    generate_advice(*pool[0], **settings)  # client + connection warm-up
+
+    def timed(d, tr, batch: bool) -> float:
+        t0 = time.perf_counter()
+        generate_advice(d, tr, batch=batch, **settings)
+        return time.perf_counter() - t0
+
+    seq = burst[: max(1, args.n // 10)]
+    cfg.requests = 0
+    t0 = time.perf_counter()
+    latencies = [timed(d, tr, False) for d, tr in seq]
+    summarize("sequential", latencies, time.perf_counter() - t0, cfg.requests)
+
+    for label, batch in (("per request", False), ("coalesced", True)):
+        cfg.requests = 0
+        with ThreadPoolExecutor(args.concurrency) as ex:
+            t0 = time.perf_counter()
+            latencies = list(ex.map(lambda p: timed(p[0], p[1], batch), burst))
+        summarize(label, latencies, time.perf_counter() - t0, cfg.requests)
+
+    async def run_async():
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one(d, tr):
+            async with sem:
+                t0 = time.perf_counter()
+                await agenerate_advice(d, tr, batch=True, **settings)
+                return time.perf_counter() - t0
+
+        return await asyncio.gather(*(one(d, tr) for d, tr in burst))
+
+    cfg.requests = 0
+    t0 = time.perf_counter()
+    latencies = asyncio.run(run_async())
+    summarize("coalesced (async)", latencies, time.perf_counter() - t0, cfg.requests)
+    stats = batcher_stats()
+    print(f"batches {stats['batches']:.0f}, mean size {stats['mean_batch']:.1f}, deduplicated {stats['deduplicated']:.0f} of {stats['requests']:.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Semantic advice cache on the built-in rules: how often near-duplicate
+# intakes (reordered symptoms, RU synonyms, age or severity within the same
+# bucket) are answered from the cache compared with exact keys, how often a
+# new random intake is, and lookup latency as the cache grows, next to a
+# linear scan over every entry. The scan also gives the LSH recall: the share
+# of queries with an entry above the threshold for which the index found one.
+# The built-in rules have few keywords, so once the cache is large a random
+# intake often does have a stored neighbour above the threshold.
+
+
+def make_intake(rng: random.Random, vocab):
+    from models import SymptomInput
+
+    return SymptomInput(
+        age=rng.randint(0, 90),
+        sex=rng.choice(["male", "female"]),
+        symptoms=rng.sample(vocab, rng.randint(2, 4)),
+        duration_days=rng.randint(0, 30),
+        severity_1to10=rng.randint(1, 10),
+    )
+
+
+def near_duplicate(rng: random.Random, data, to_ru):
+    # Same advice expected: symptom order and language, age within a year
+    symptoms = [rng.choice(to_ru.get(s, [s])) if rng.random() < 0.5 else s for s in data.symptoms]
+    rng.shuffle(symptoms)
+    age = min(90, max(0, data.age + rng.choice([-1, 0, 1])))
+    return data.model_copy(update={"symptoms": symptoms, "age": age})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic advice cache: hit rates and lookup latency")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="cache sizes (entries)")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+
+    from advice_cache import AdviceCache, SemanticAdviceCache, make_advice_key
+    from minhash import jaccard
+    from triage import SYMPTOM_RULES, SYMPTOM_SYNONYMS_RU_EN, triage_symptoms
+
+    vocab = list(SYMPTOM_RULES)
+    to_ru = {}
+    for ru, en in SYMPTOM_SYNONYMS_RU_EN.items():
+        to_ru.setdefault(en, []).append(ru)
+
+    def key(data):
+        return make_advice_key(data, triage_symptoms(data), "OpenAI", "gpt-4o-mini", 0.2, "en")
+
+    rng = random.Random(11)
+    for size in (int(s) for s in args.sizes.split(",")):
+        stored = [make_intake(rng, vocab) for _ in range(size)]
+        exact = AdviceCache(max_entries=size)
+        semantic = AdviceCache(max_entries=size, semantic=SemanticAdviceCache(args.threshold, max_entries=size, ttl_s=0))
+        t0 = time.perf_counter()
+        keys = [key(d) for d in stored]
+        for i, k in enumerate(keys):
+            exact.put(k, f"advice {i}")
+            semantic.put(k, f"advice {i}")
+        build = time.perf_counter() - t0
+        entries = [k.similar for k in keys if k.similar is not None]
+
+        for label, queries in (
+            ("near-duplicate", [near_duplicate(rng, rng.choice(stored), to_ru) for _ in range(args.queries)]),
+            ("random intake", [make_intake(rng, vocab) for _ in range(args.queries)]),
+        ):
+            qkeys = [key(d) for d in queries]
+            exact_hits = sum(exact.get(k) is not None for k in qkeys)
+            lookups, scans, found, reachable, lsh_found = [], [], 0, 0, 0
+            for k in qkeys:
+                t1 = time.perf_counter()
+                hit = semantic.get(k)
+                lookups.append((time.perf_counter() - t1) * 1e6)
+                found += hit is not None
+                if k.similar is None:
+                    continue
+                t1 = time.perf_counter()
+                partition, features = k.similar
+                best = max(
+                    (jaccard(features, f) for p, f in entries if p == partition),
+                    default=0.0,
+                )
+                scans.append((time.perf_counter() - t1) * 1e6)
+                if best >= args.threshold:
+                    reachable += 1
+                    lsh_found += hit is not None
+            n = len(qkeys)
+            print(f"{size:>7} entries, {label:<15} exact hits {exact_hits / n:6.1%}  semantic hits {found / n:6.1%}  "
+                  f"LSH recall {lsh_found / max(1, reachable):6.1%}  "
+                  f"lookup p50 {statistics.median(lookups):7.1f} us  linear scan p50 {statistics.median(scans):9.1f} us")
+        stats = semantic.semantic
+        print(f"{'':>7} built in {build:.1f}s, {stats.candidates / max(1, stats.hits + stats.misses):.1f} candidates verified per lookup")
+
+
+if __name__ == "__main__":
+    main()
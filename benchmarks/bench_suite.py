@@ -0,0 +1,255 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from workloads import make_faq, make_intakes, make_queries, make_rules  # noqa: E402
+
+# Latency suite for triage, FAQ search, localization and the LLM path.
+#
+#   python benchmarks/bench_suite.py --save baseline.json
+#   (change code)
+#   python benchmarks/bench_suite.py --compare baseline.json
+#
+# Each case reports p50/p95/p99 per call, throughput, and from a separate
+# tracemalloc pass the peak bytes allocated and bytes retained per call.
+# --compare exits with status 1 when a case's p50 or p95 regressed by more
+# than --threshold.
+
+SUITE_VERSION = 1
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class Case:
+    # ``fn`` is called with successive elements of ``inputs``; ``items`` is the
+    # number of records one call processes (for batch throughput).
+    def __init__(self, name: str, fn: Callable, inputs: Sequence, iterations: int, items: int = 1, alloc_iterations: int = 200):
+        self.name = name
+        self.fn = fn
+        self.inputs = inputs
+        self.iterations = iterations
+        self.items = items
+        self.alloc_iterations = min(alloc_iterations, iterations)
+
+
+def measure(case: Case, warmup: int = 20) -> Dict:
+    fn, inputs, n = case.fn, case.inputs, len(case.inputs)
+    for i in range(min(warmup, case.iterations)):
+        fn(inputs[i % n])
+
+    times: List[float] = []
+    clock = time.perf_counter_ns
+    started = clock()
+    for i in range(case.iterations):
+        t0 = clock()
+        fn(inputs[i % n])
+        times.append((clock() - t0) / 1e6)
+    wall_s = (clock() - started) / 1e9
+    times.sort()
+
+    # Allocation pass: tracemalloc slows calls down, so it does not share the timed loop
+    gc.collect()
+    tracemalloc.start()
+    peak_total = retained_total = 0
+    for i in range(case.alloc_iterations):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn(inputs[i % n])
+        current, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - before
+        retained_total += current - before
+    tracemalloc.stop()
+    calls = max(1, case.alloc_iterations)
+
+    return {
+        "iterations": case.iterations,
+        "items_per_call": case.items,
+        "p50_ms": round(percentile(times, 50), 6),
+        "p95_ms": round(percentile(times, 95), 6),
+        "p99_ms": round(percentile(times, 99), 6),
+        "mean_ms": round(sum(times) / len(times), 6),
+        "throughput_per_s": round(case.iterations * case.items / wall_s, 1) if wall_s else 0.0,
+        "alloc_peak_bytes_per_call": round(peak_total / calls),
+        "retained_bytes_per_call": round(retained_total / calls),
+    }
+
+
+def triage_cases(args) -> List[Case]:
+    from triage import compile_rules, get_compiled_rules, iter_triage_lite, triage_batch, triage_compact, triage_symptoms
+
+    cases = []
+    rule_sets = {"builtin": (get_compiled_rules(), None, None)}
+    for size in args.rule_sizes:
+        rules, synonyms, emergency = make_rules(size, seed=size)
+        rule_sets[str(size)] = (compile_rules(rules, synonyms, emergency), rules, synonyms)
+    for label, (compiled, rules, synonyms) in rule_sets.items():
+        for k in args.symptom_counts:
+            intakes = make_intakes(1000, symptoms=k, rules=rules, synonyms=synonyms, seed=k)
+            cases.append(Case(f"triage.symptoms/rules={label}/symptoms={k}", lambda d, r=compiled: triage_symptoms(d, r), intakes, args.iterations))
+            cases.append(Case(f"triage.compact/rules={label}/symptoms={k}", lambda d, r=compiled: triage_compact(d, r), intakes, args.iterations))
+        intakes = make_intakes(args.batch_size * 4, symptoms=3, rules=rules, synonyms=synonyms, seed=99)
+        chunks = [intakes[i:i + args.batch_size] for i in range(0, len(intakes), args.batch_size)]
+        iterations = max(5, args.iterations // 200)
+        cases.append(Case(f"triage.batch/rules={label}/n={args.batch_size}", lambda c, r=compiled: triage_batch(c, r), chunks, iterations, items=args.batch_size, alloc_iterations=5))
+        cases.append(Case(f"triage.lite/rules={label}/n={args.batch_size}", lambda c, r=compiled: list(iter_triage_lite(c, r)), chunks, iterations, items=args.batch_size, alloc_iterations=5))
+    return cases
+
+
+def faq_cases(args) -> List[Case]:
+    from faq import FAQIndex
+
+    cases = []
+    queries = make_queries(500, seed=3)
+    for size in args.faq_sizes:
+        index = FAQIndex(make_faq(size, seed=size))
+        cases.append(Case(f"faq.search/corpus={size}", lambda q, ix=index: ix.search(q, 10), queries, args.iterations))
+    return cases
+
+
+def i18n_cases(args) -> List[Case]:
+    from i18n import localize_compact, localize_triage
+    from triage import get_compiled_rules, triage_compact, triage_symptoms
+
+    rules = get_compiled_rules()
+    intakes = make_intakes(1000, symptoms=3, seed=5)
+    results = [triage_symptoms(d) for d in intakes]
+    compact = [triage_compact(d) for d in intakes]
+    cases = []
+    for lang in ("en", "ru"):
+        cases.append(Case(f"i18n.localize_triage/lang={lang}", lambda tr, lang=lang: localize_triage(tr, lang), results, args.iterations))
+        cases.append(Case(f"i18n.localize_compact/lang={lang}", lambda ct, lang=lang: localize_compact(ct, lang, rules), compact, args.iterations))
+    return cases
+
+
+def llm_cases(args) -> List[Case]:
+    from stub_llm_server import server_url, start_stub_server
+
+    server, _ = start_stub_server(latency_s=args.llm_latency)
+    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY") or "stub"
+    os.environ["OPENAI_BASE_URL"] = server_url(server) + "/v1"
+    os.environ["OLLAMA_BASE_URL"] = server_url(server)
+
+    from advice_cache import AdviceCache
+    from llm import build_prompt, generate_advice
+    from triage import triage_symptoms
+
+    intakes = make_intakes(200, symptoms=3, seed=8)
+    pairs = [(d, triage_symptoms(d)) for d in intakes]
+    iterations = args.llm_iterations
+    cases = [Case("llm.build_prompt", lambda p: build_prompt(p[0], p[1], "en"), pairs, args.iterations)]
+    for provider in ("OpenAI", "Ollama"):
+        settings = dict(provider=provider, openai_model="stub-model", ollama_model="stub-model", temperature=0.2, lang="en")
+        cases.append(Case(f"llm.generate_advice/{provider}/latency={args.llm_latency * 1000:.0f}ms",
+                          lambda p, s=settings: generate_advice(p[0], p[1], **s), pairs, iterations, alloc_iterations=5))
+    cache = AdviceCache(max_entries=1024)
+    settings = dict(provider="OpenAI", openai_model="stub-model", ollama_model="stub-model", temperature=0.2, lang="en")
+    for d, tr in pairs:
+        generate_advice(d, tr, cache=cache, **settings)
+    cases.append(Case("llm.generate_advice/cache-hit", lambda p: generate_advice(p[0], p[1], cache=cache, **settings), pairs, args.iterations))
+    return cases
+
+
+GROUPS = {"triage": triage_cases, "faq": faq_cases, "i18n": i18n_cases, "llm": llm_cases}
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parents[1]).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "suite_version": SUITE_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    regressions = []
+    print(f"\n{'case':<58} {'p50 base':>9} {'p50 now':>9} {'Δ':>7} {'p95 base':>9} {'p95 now':>9} {'Δ':>7}")
+    for name, now in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        flags = []
+        row = []
+        for key in ("p50_ms", "p95_ms"):
+            change = now[key] / base[key] - 1.0 if base[key] else 0.0
+            row.append(f"{base[key]:>9.3f} {now[key]:>9.3f} {change:>+7.0%}")
+            if change > threshold:
+                flags.append(key)
+        mark = "  REGRESSION" if flags else ""
+        print(f"{name:<58} {' '.join(row)}{mark}")
+        if flags:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite: triage, FAQ search, localization, LLM path")
+    parser.add_argument("--groups", default="triage,faq,i18n,llm", help=f"comma-separated subset of {','.join(GROUPS)}")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this string")
+    parser.add_argument("--iterations", type=int, default=2000, help="timed calls per case")
+    parser.add_argument("--symptom-counts", default="1,3,8", help="symptoms per intake")
+    parser.add_argument("--rule-sizes", default="100,1000", help="synthetic rule-set sizes (besides the built-in rules)")
+    parser.add_argument("--faq-sizes", default="1000,10000", help="synthetic FAQ corpus sizes")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM latency in seconds")
+    parser.add_argument("--llm-iterations", type=int, default=40)
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and smaller workloads")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="JSON baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative p50/p95 slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.iterations = min(args.iterations, 300)
+        args.llm_iterations = min(args.llm_iterations, 10)
+        args.batch_size = min(args.batch_size, 250)
+    args.symptom_counts = [int(x) for x in args.symptom_counts.split(",") if x]
+    args.rule_sizes = [int(x) for x in args.rule_sizes.split(",") if x]
+    args.faq_sizes = [int(x) for x in args.faq_sizes.split(",") if x]
+
+    results: Dict[str, Dict] = {}
+    print(f"{'case':<58} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'items/s':>12} {'alloc B':>10} {'kept B':>8}")
+    for group in args.groups.split(","):
+        for case in GROUPS[group](args):
+            if args.filter not in case.name:
+                continue
+            r = results[case.name] = measure(case)
+            print(f"{case.name:<58} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+                  f"{r['throughput_per_s']:>12,.0f} {r['alloc_peak_bytes_per_call']:>10,} {r['retained_bytes_per_call']:>8,}")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({"environment": environment(), "results": results}, indent=2), encoding="utf-8")
+        print(f"\nsaved {len(results)} cases to {args.save}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
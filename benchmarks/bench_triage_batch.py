@@ -0,0 +1,53 @@
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from models import SymptomInput  # noqa: E402
+from triage import SYMPTOM_RULES, SYMPTOM_SYNONYMS_RU_EN, triage_batch, triage_symptoms  # noqa: E402
+
+
+def make_inputs(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    vocab = list(SYMPTOM_RULES) + list(SYMPTOM_SYNONYMS_RU_EN) + ["fatigue", "back pain", "dizziness"]
+    return [
+        SymptomInput(
+            age=rng.randint(0, 90),
+            sex=rng.choice(["male", "female", "other"]),
+            symptoms=rng.sample(vocab, rng.randint(1, 5)),
+            duration_days=rng.randint(0, 14),
+            severity_1to10=rng.randint(1, 10),
+        )
+        for _ in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-record vs batch triage throughput")
+    parser.add_argument("-n", type=int, default=50000, help="number of intakes")
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    inputs = make_inputs(args.n)
+
+    t0 = time.perf_counter()
+    single = [triage_symptoms(d) for d in inputs]
+    t_single = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = triage_batch(inputs, chunk_size=args.chunk_size)
+    t_batch = time.perf_counter() - t0
+
+    if batch != single:
+        raise SystemExit("batch results differ from triage_symptoms")
+    print(f"records:       {args.n}")
+    print(f"per-record:    {t_single:.3f}s  ({args.n / t_single:,.0f} rec/s)")
+    print(f"triage_batch:  {t_batch:.3f}s  ({args.n / t_batch:,.0f} rec/s)")
+    print(f"speedup:       {t_single / t_batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from itertools import cycle, islice
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_triage_batch import make_inputs  # noqa: E402
+
+# Peak RSS of keeping N triage results in memory: pydantic TriageResult
+# (triage_symptoms / triage_batch) versus TriageLite (iter_triage_lite).
+# Each variant runs in its own subprocess so peaks do not mix.
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss / 1024.0 if sys.platform != "darwin" else rss / (1024.0 * 1024.0)
+
+
+def run_variant(variant: str, n: int, distinct: int) -> dict:
+    from triage import iter_triage_batch, iter_triage_lite, triage_symptoms
+
+    pool = make_inputs(distinct, seed=11)
+    baseline = peak_rss_mb()
+    inputs = islice(cycle(pool), n)
+    t0 = time.perf_counter()
+    if variant == "result":
+        results = [triage_symptoms(d) for d in inputs]
+    elif variant == "batch":
+        results = list(iter_triage_batch(inputs))
+    else:
+        results = list(iter_triage_lite(inputs))
+    elapsed = time.perf_counter() - t0
+    peak = peak_rss_mb()
+    return {
+        "variant": variant,
+        "n": len(results),
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(peak, 1),
+        "results_mb": round(peak - baseline, 1),
+        "bytes_per_result": round((peak - baseline) * 1024 * 1024 / max(1, len(results)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of bulk triage result representations")
+    parser.add_argument("-n", type=int, default=1_000_000, help="number of triages to keep in memory")
+    parser.add_argument("--distinct", type=int, default=5000, help="distinct synthetic intakes cycled through")
+    parser.add_argument("--variants", default="lite,result", help="comma-separated: lite, result, batch (result/batch need ~9 KB per triage, ~9 GB at 1M)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_variant(args.child, args.n, args.distinct)))
+        return
+
+    print(f"{'variant':<8} {'n':>9} {'seconds':>8} {'peak MB':>9} {'results MB':>11} {'B/result':>9}")
+    for variant in args.variants.split(","):
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", variant, "-n", str(args.n), "--distinct", str(args.distinct)],
+            capture_output=True, text=True, check=True,
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{r['variant']:<8} {r['n']:>9} {r['seconds']:>8} {r['peak_rss_mb']:>9} {r['results_mb']:>11} {r['bytes_per_result']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_llm_server import server_url, start_stub_server  # noqa: E402
+
+# Time to first useful answer for red-flag intakes against a deliberately slow
+# stub LLM: pipeline.analyze and POST /advice in each fast-path mode. Exits
+# with status 1 if a fast-path mode misses urgent.LATENCY_BUDGET_MS at p99, so
+# it can gate CI.
+
+EMERGENCY = ["chest pain", "shortness of breath", "боль в груди", "одышка"]
+OTHER = ["fever", "cough", "headache", "nausea", "кашель", "температура", "dizziness"]
+
+
+def make_urgent_payloads(n: int, seed: int = 0) -> List[dict]:
+    # Distinct intakes (so the advice cache never answers for the LLM): half
+    # with an emergency keyword, half high risk through severity >= 8
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        symptoms = rng.sample(OTHER, 2)
+        if i % 2 == 0:
+            symptoms.insert(0, rng.choice(EMERGENCY))
+        out.append({
+            "age": 18 + i % 80,
+            "sex": rng.choice(["male", "female", "other"]),
+            "symptoms": symptoms,
+            "duration_days": i // 80 % 14,
+            "severity_1to10": rng.randint(8, 10),
+        })
+    return out
+
+
+def summarize(label: str, latencies: List[float], budget_ms: Optional[float]) -> bool:
+    ordered = sorted(latencies)
+
+    def q(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000.0
+
+    ok = budget_ms is None or q(0.99) <= budget_ms
+    verdict = "" if budget_ms is None else ("  ok" if ok else f"  OVER BUDGET ({budget_ms:.0f} ms)")
+    print(f"{label:<26} n={len(ordered):<4} p50 {q(0.50):8.2f} ms  p99 {q(0.99):8.2f} ms  max {ordered[-1] * 1000.0:8.2f} ms{verdict}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Red-flag fast path latency against a slow stub LLM")
+    parser.add_argument("-n", type=int, default=200, help="intakes per fast-path mode")
+    parser.add_argument("--baseline", type=int, default=5, help="intakes with the fast path off")
+    parser.add_argument("--latency", type=float, default=2.0, help="stub LLM seconds per request")
+    args = parser.parse_args()
+
+    stub, cfg = start_stub_server(latency_s=args.latency)
+    os.environ["OLLAMA_BASE_URL"] = server_url(stub)
+    # Intakes differ only in age; the semantic advice cache would answer for them
+    os.environ["ADVICE_SEMANTIC_THRESHOLD"] = "0"
+
+    import server
+    from models import SymptomInput
+    from pipeline import analyze
+    from urgent import LATENCY_BUDGET_MS
+
+    settings = dict(provider="Ollama", openai_model="", ollama_model="stub", temperature=0.2, lang="en")
+    payloads = make_urgent_payloads(args.n * 2 + args.baseline * 2, seed=3)
+    chunks = [payloads[i * args.n : (i + 1) * args.n] for i in range(2)]
+    baseline = payloads[2 * args.n :]
+    ok = True
+
+    print(f"stub LLM latency {args.latency:.1f}s, budget {LATENCY_BUDGET_MS:.0f} ms at p99")
+    # pipeline.analyze on one long-lived loop
+    analyze_settings = dict(settings, cache=None)
+
+    async def run_pipeline():
+        nonlocal ok
+        await analyze(SymptomInput.model_validate(baseline[0]), fast_path="skip", **analyze_settings)  # imports, rule compile
+        for mode, chunk in zip(("skip", "background"), chunks):
+            latencies = []
+            for p in chunk:
+                data = SymptomInput.model_validate(p)
+                t0 = time.perf_counter()
+                result = await analyze(data, fast_path=mode, **analyze_settings)
+                latencies.append(time.perf_counter() - t0)
+                assert result.guidance is not None, p
+            ok &= summarize(f"analyze, {mode}", latencies, LATENCY_BUDGET_MS)
+        latencies = []
+        for p in baseline[: args.baseline]:
+            t0 = time.perf_counter()
+            await analyze(SymptomInput.model_validate(p), fast_path="off", **analyze_settings)
+            latencies.append(time.perf_counter() - t0)
+        summarize("analyze, off", latencies, None)
+
+    asyncio.run(run_pipeline())
+
+    srv = server.make_server("127.0.0.1", 0, server.ServiceConfig(workers=2))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1])
+
+    def post(payload: dict, mode: str) -> dict:
+        body = json.dumps(dict(settings, input=payload, fast_path=mode)).encode("utf-8")
+        conn.request("POST", "/advice", body, {"Content-Type": "application/json"})
+        return json.loads(conn.getresponse().read())
+
+    post(baseline[0], "skip")
+    for mode, chunk in zip(("skip", "background"), chunks):
+        latencies = []
+        for p in chunk:
+            t0 = time.perf_counter()
+            answer = post(dict(p, age=p["age"] + 1), mode)
+            latencies.append(time.perf_counter() - t0)
+            assert answer.get("guidance"), answer
+        ok &= summarize(f"POST /advice, {mode}", latencies, LATENCY_BUDGET_MS)
+    latencies = []
+    for p in baseline[args.baseline :]:
+        t0 = time.perf_counter()
+        post(p, "off")
+        latencies.append(time.perf_counter() - t0)
+    summarize("POST /advice, off", latencies, None)
+    print(f"LLM requests started by the stub: {cfg.requests}")
+
+    srv.shutdown()
+    srv.RequestHandlerClass.service.shutdown()
+    stub.shutdown()
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_triage_batch import make_inputs  # noqa: E402
+from stub_llm_server import server_url, start_stub_server  # noqa: E402
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test pipeline.analyze against a stub LLM server")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM latency in seconds")
+    parser.add_argument("--provider", choices=["OpenAI", "Ollama"], default="OpenAI")
+    parser.add_argument("--sequential", type=int, default=10, help="sessions to run sequentially as a baseline")
+    args = parser.parse_args()
+
+    server, stub = start_stub_server(latency_s=args.latency)
+    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY") or "stub"
+    os.environ["OPENAI_BASE_URL"] = server_url(server) + "/v1"
+    os.environ["OLLAMA_BASE_URL"] = server_url(server)
+
+    from llm import generate_advice
+    from pipeline import analyze_many
+    from triage import triage_symptoms
+
+    inputs = make_inputs(args.sessions, seed=7)
+    settings = dict(provider=args.provider, openai_model="stub-model", ollama_model="stub-model", temperature=0.2, lang="en")
+
+    t0 = time.perf_counter()
+    for data in inputs[: args.sequential]:
+        generate_advice(data, triage_symptoms(data), **settings)
+    seq_rate = args.sequential / (time.perf_counter() - t0) if args.sequential else 0.0
+
+    # Every session waits for the LLM; see bench_urgent_fast_path.py for the red-flag fast path
+    requests = [dict(data=d, faq_query=" ".join(d.symptoms[:2]), fast_path="off", **settings) for d in inputs]
+    t0 = time.perf_counter()
+    results = asyncio.run(analyze_many(requests, concurrency=args.concurrency))
+    elapsed = time.perf_counter() - t0
+    server.shutdown()
+
+    errors = sum(1 for r in results if not r.advice or r.advice.startswith("LLM error"))
+    totals = [r.timings["total"] for r in results]
+    print(f"stub latency:     {args.latency * 1000:.0f} ms, provider {args.provider}, {stub.requests} LLM requests")
+    print(f"sequential:       {seq_rate:.1f} sessions/s")
+    print(f"async (c={args.concurrency}):   {len(results) / elapsed:.1f} sessions/s over {len(results)} sessions, {errors} errors")
+    print(f"session latency:  p50 {percentile(totals, 50) * 1000:.0f} ms, p95 {percentile(totals, 95) * 1000:.0f} ms, "
+          f"mean {statistics.mean(totals) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+# Minimal OpenAI- and Ollama-compatible chat endpoint with configurable latency.
+# Point OPENAI_BASE_URL at http://host:port/v1 or OLLAMA_BASE_URL at http://host:port.
+
+DEFAULT_TEXT = "Rest, drink fluids and monitor your temperature. This is not medical advice; see a doctor if symptoms worsen."
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency_s: float = 0.2,
+        token_delay_s: float = 0.0,
+        text: str = DEFAULT_TEXT,
+        fail: bool = False,
+        tail_prob: float = 0.0,
+        tail_latency_s: float = 2.0,
+        seed: int = 0,
+        parallel: int = 0,
+    ):
+        self.latency_s = latency_s
+        self.token_delay_s = token_delay_s
+        self.text = text
+        self.fail = fail
+        # With probability ``tail_prob`` a request waits ``tail_latency_s`` instead (latency spikes)
+        self.tail_prob = tail_prob
+        self.tail_latency_s = tail_latency_s
+        self.rng = random.Random(seed)
+        # Like OLLAMA_NUM_PARALLEL: at most ``parallel`` requests are served at once, the rest queue (0 = unlimited)
+        self.slots = threading.BoundedSemaphore(parallel) if parallel > 0 else None
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def next_latency(self) -> float:
+        with self.lock:
+            spike = self.tail_prob and self.rng.random() < self.tail_prob
+        return self.tail_latency_s if spike else self.latency_s
+
+
+def _tokens(text: str):
+    words = text.split(" ")
+    return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY the body
+    # waits for the client's delayed ACK (~40 ms) on keep-alive connections.
+    disable_nagle_algorithm = True
+    config: StubConfig = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def do_POST(self):
+        cfg = self.config
+        with cfg.lock:
+            cfg.requests += 1
+        body = self._read_json()
+        model = body.get("model", "stub")
+        if cfg.slots is not None:
+            with cfg.slots:
+                time.sleep(cfg.next_latency())
+        else:
+            time.sleep(cfg.next_latency())
+        if cfg.fail:
+            self._send_json(500, {"error": {"message": "stub failure"}})
+            return
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            self._openai(body, model)
+        elif self.path.rstrip("/") == "/api/chat":
+            self._ollama(body, model)
+        else:
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def _openai(self, body: dict, model: str) -> None:
+        cfg = self.config
+        created = int(time.time())
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": cfg.text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(_tokens(cfg.text)), "total_tokens": len(_tokens(cfg.text))},
+            })
+            return
+        self._start_stream("text/event-stream")
+        for tok in _tokens(cfg.text) + [None]:
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": tok} if tok else {}, "finish_reason": None if tok else "stop"}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if tok and cfg.token_delay_s:
+                time.sleep(cfg.token_delay_s)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _ollama(self, body: dict, model: str) -> None:
+        cfg = self.config
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        final = {"model": model, "created_at": now, "message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "stop"}
+        if body.get("stream") is False:
+            final["message"]["content"] = cfg.text
+            self._send_json(200, final)
+            return
+        self._start_stream("application/x-ndjson")
+        for tok in _tokens(cfg.text):
+            line = {"model": model, "created_at": now, "message": {"role": "assistant", "content": tok}, "done": False}
+            self.wfile.write((json.dumps(line) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if cfg.token_delay_s:
+                time.sleep(cfg.token_delay_s)
+        self.wfile.write((json.dumps(final) + "\n").encode("utf-8"))
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def handle_error(self, request, client_address):
+        # Clients cancelling a request (e.g. the losing side of a hedge) are expected
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, **config) -> Tuple[ThreadingHTTPServer, StubConfig]:
+    cfg = StubConfig(**config)
+    handler = type("BoundStubHandler", (StubHandler,), {"config": cfg})
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, cfg
+
+
+def server_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI/Ollama chat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--fail", action="store_true", help="answer every request with HTTP 500")
+    parser.add_argument("--tail-prob", type=float, default=0.0, help="share of requests delayed by --tail-latency instead")
+    parser.add_argument("--tail-latency", type=float, default=2.0)
+    parser.add_argument("--parallel", type=int, default=0, help="requests served at once, the rest queue (0 = unlimited)")
+    args = parser.parse_args()
+    server, _ = start_stub_server(
+        args.host, args.port, latency_s=args.latency, token_delay_s=args.token_delay, fail=args.fail,
+        tail_prob=args.tail_prob, tail_latency_s=args.tail_latency, parallel=args.parallel,
+    )
+    print(f"stub LLM listening on {server_url(server)} (OpenAI: {server_url(server)}/v1)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
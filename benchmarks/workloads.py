@@ -0,0 +1,146 @@
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from models import FAQItem, SymptomInput  # noqa: E402
+from triage import SYMPTOM_RULES, SYMPTOM_SYNONYMS_RU_EN  # noqa: E402
+
+# Synthetic, seeded workloads for the benchmark suite: intakes with a fixed
+# number of symptoms, rule sets and FAQ corpora of arbitrary size. Same seed,
+# same data, so runs on different commits are comparable.
+
+_SYLLABLES = "ba ko ri mu te sa no vi la de po gu fe zi ka lo".split()
+_NOISE = ["fatigue", "back pain", "dizziness", "ache", "чувствую слабость", "x"]
+_FAQ_WORDS = (
+    "fever cough headache rash pain chest breath throat stomach nausea vomiting diarrhea temperature doctor "
+    "days week child adult medicine rest fluids sleep symptoms infection virus allergy pressure heart "
+    "dizziness fatigue appointment emergency antibiotics vaccine test results treatment"
+).split()
+
+
+def _word(rng: random.Random, syllables: int) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(syllables))
+
+
+def make_rules(n_rules: int, n_conditions: int = 200, seed: int = 0) -> Tuple[Dict[str, Dict], Dict[str, str], List[str]]:
+    # Rule set in the SYMPTOM_RULES shape, plus RU-style synonyms and emergency keywords
+    rng = random.Random(seed)
+    conditions = [f"Condition {i}" for i in range(n_conditions)]
+    phrases = [f"Advice {i}" for i in range(n_conditions)]
+    rules: Dict[str, Dict] = {}
+    while len(rules) < n_rules:
+        keyword = " ".join(_word(rng, rng.randint(2, 3)) for _ in range(rng.randint(1, 2)))
+        rules[keyword] = {
+            "conditions": {c: rng.randint(1, 3) for c in rng.sample(conditions, rng.randint(1, 6))},
+            "actions": rng.sample(phrases, rng.randint(1, 4)),
+            "questions": [f"Question {rng.randrange(n_conditions)}?" for _ in range(rng.randint(0, 3))],
+            "red_flags": [f"Red flag {rng.randrange(n_conditions)}" for _ in range(rng.randint(0, 2))],
+        }
+    keywords = list(rules)
+    synonyms = {f"син {_word(rng, 3)}": rng.choice(keywords) for _ in range(max(1, n_rules // 2))}
+    emergency = rng.sample(keywords, min(len(keywords), max(1, n_rules // 50)))
+    return rules, synonyms, emergency
+
+
+def make_intakes(
+    n: int,
+    symptoms: int = 3,
+    rules: Optional[Dict[str, Dict]] = None,
+    synonyms: Optional[Dict[str, str]] = None,
+    seed: int = 0,
+) -> List[SymptomInput]:
+    # ``symptoms`` entries per intake, drawn from the rule keywords, their
+    # synonyms and a few strings that match nothing
+    rng = random.Random(seed)
+    rules = SYMPTOM_RULES if rules is None else rules
+    synonyms = SYMPTOM_SYNONYMS_RU_EN if synonyms is None else synonyms
+    vocab = list(rules) + list(synonyms) + _NOISE
+    return [
+        SymptomInput(
+            age=rng.randint(0, 90),
+            sex=rng.choice(["male", "female", "other"]),
+            symptoms=[rng.choice(vocab) for _ in range(symptoms)],
+            duration_days=rng.randint(0, 14),
+            severity_1to10=rng.randint(1, 10),
+        )
+        for _ in range(n)
+    ]
+
+
+def make_faq(n: int, seed: int = 0) -> List[FAQItem]:
+    rng = random.Random(seed)
+    items = []
+    for i in range(n):
+        topic = rng.sample(_FAQ_WORDS, 3)
+        items.append(
+            FAQItem(
+                question=f"What to do about {topic[0]} and {topic[1]} (case {i})?",
+                answer=" ".join(rng.choice(_FAQ_WORDS) for _ in range(rng.randint(15, 40))),
+                tags=topic,
+            )
+        )
+    return items
+
+
+def make_queries(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(_FAQ_WORDS, rng.randint(1, 4))) for _ in range(n)]
+
+
+def _name(rng: random.Random) -> str:
+    # Pronounceable made-up word with a realistic spread of letter trigrams
+    letters = []
+    for i in range(rng.randint(6, 9)):
+        letters.append(rng.choice("bcdfghjklmnprstvwxz" if i % 2 == 0 else "aeiouy"))
+        if rng.random() < 0.2:
+            letters.append(rng.choice("lrnst"))
+    return "".join(letters)
+
+
+def _typo(rng: random.Random, word: str) -> str:
+    # One deleted, doubled or swapped letter (not the first)
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return word[:i] + word[i + 1 :]
+    if kind == 1:
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+
+
+def make_retrieval_set(n: int, n_queries: int, seed: int = 0) -> Tuple[List[FAQItem], Dict[str, List[Tuple[str, int]]]]:
+    # FAQ entries about a concept phrase (see embeddings.CONCEPT_GROUPS) and two
+    # made-up names, plus queries with a known target entry:
+    #   exact      - the entry's two names
+    #   typo       - the same with a typo in each name
+    #   paraphrase - another phrase for the same concept and one misspelt name
+    from embeddings import CONCEPT_GROUPS
+
+    rng = random.Random(seed)
+    groups = [phrases for phrases in CONCEPT_GROUPS.values() if len(phrases) > 2]
+    items: List[FAQItem] = []
+    facts = []
+    for i in range(n):
+        phrases = rng.choice(groups)
+        phrase = rng.choice(phrases[:2])
+        a, b = _name(rng), _name(rng)
+        items.append(
+            FAQItem(
+                question=f"How is {phrase} treated in {a} {b}?",
+                answer=" ".join(rng.choice(_FAQ_WORDS) for _ in range(rng.randint(15, 30))),
+                tags=[a, phrase],
+            )
+        )
+        facts.append((phrases, phrase, a, b))
+    queries: Dict[str, List[Tuple[str, int]]] = {"exact": [], "typo": [], "paraphrase": []}
+    for _ in range(n_queries):
+        doc = rng.randrange(n)
+        phrases, phrase, a, b = facts[doc]
+        queries["exact"].append((f"{a} {b}", doc))
+        queries["typo"].append((f"{_typo(rng, a)} {_typo(rng, b)}", doc))
+        other = rng.choice([p for p in phrases if p != phrase and p.isascii()])
+        queries["paraphrase"].append((f"{other} {_typo(rng, a)} {b}", doc))
+    return items, queries
@@ -0,0 +1,274 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import IO, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from lazy import optional_module
+from models import SymptomInput, TriageResult
+from triage import iter_triage_batch
+from warmup import WORKER_STEPS, preload
+
+
+# Offline re-scoring of intake exports:
+#
+#   python bulk_triage.py intakes.csv -o scored.jsonl --workers 8
+#   python bulk_triage.py intakes.jsonl -o scored.parquet
+#
+# Input is read lazily in chunks; each chunk is validated and triaged in a
+# worker process; at most ``2 x workers`` chunks are in flight, so memory does
+# not grow with the file. Output keeps input order. Records that fail
+# validation are counted and, with --errors, written there with the reason.
+#
+# CSV columns follow SymptomInput (age, sex, symptoms, duration_days,
+# severity_1to10, notes); symptoms are split on --symptom-sep. An ``id``
+# field/column is passed through, otherwise the 1-based record number is used.
+
+CSV_INT_FIELDS = ("age", "duration_days", "severity_1to10")
+
+PARQUET_COLUMNS = (
+    "id",
+    "risk_level",
+    "top_condition",
+    "top_confidence",
+    "conditions",
+    "confidences",
+    "red_flags",
+    "self_care_advice",
+    "doctor_questions",
+)
+
+
+def parquet_schema():
+    # pyarrow is imported only when Parquet is written, and only in the parent process
+    pa = optional_module("pyarrow")
+    if pa is None or optional_module("pyarrow.parquet") is None:
+        return None
+    text, number = pa.string(), pa.float64()
+    types = (text, text, text, number, pa.list_(text), pa.list_(number), pa.list_(text), pa.list_(text), pa.list_(text))
+    return pa.schema(list(zip(PARQUET_COLUMNS, types)))
+
+
+def _open_text(path: str, mode: str) -> IO[str]:
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer if "r" in mode else sys.stdout.buffer, encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def _detect_format(path: str, explicit: Optional[str], default: str) -> str:
+    if explicit:
+        return explicit
+    ext = os.path.splitext(path)[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}.get(ext, default)
+
+
+def read_records(fh: IO[str], fmt: str, symptom_sep: str = ";") -> Iterator[Tuple[str, object]]:
+    # Yields (record id, raw record); JSONL lines stay unparsed so the workers parse them
+    if fmt == "jsonl":
+        for n, line in enumerate(fh, 1):
+            if line.strip():
+                yield str(n), line
+        return
+    for n, row in enumerate(csv.DictReader(fh), 1):
+        record: Dict[str, object] = {k: (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+        for field in CSV_INT_FIELDS:
+            if record.get(field) == "":
+                record[field] = None
+        if record.get("sex") == "":
+            record["sex"] = None
+        if record.get("notes") == "":
+            record["notes"] = None
+        raw = record.get("symptoms") or ""
+        record["symptoms"] = [s.strip() for s in str(raw).split(symptom_sep) if s.strip()]
+        yield str(record.pop("id", None) or n), record
+
+
+def _chunks(records: Iterable[Tuple[str, object]], size: int) -> Iterator[List[Tuple[str, object]]]:
+    chunk: List[Tuple[str, object]] = []
+    for rec in records:
+        chunk.append(rec)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _result_row(rid: str, tr: TriageResult) -> Dict:
+    top = tr.possible_conditions[0] if tr.possible_conditions else None
+    return {
+        "id": rid,
+        "risk_level": tr.risk_level,
+        "top_condition": top.condition if top else None,
+        "top_confidence": top.confidence if top else None,
+        "conditions": [h.condition for h in tr.possible_conditions],
+        "confidences": [h.confidence for h in tr.possible_conditions],
+        "red_flags": top.red_flags if top else [],
+        "self_care_advice": tr.self_care_advice,
+        "doctor_questions": tr.doctor_questions,
+    }
+
+
+def _process_chunk(chunk: List[Tuple[str, object]], output: str) -> Tuple[object, List[str], int]:
+    # Runs in a worker. Returns (output payload, error lines, records scored):
+    # JSONL text for "jsonl", a column dict for "parquet".
+    ids: List[str] = []
+    inputs: List[SymptomInput] = []
+    errors: List[str] = []
+    for rid, raw in chunk:
+        try:
+            if isinstance(raw, str):
+                payload = json.loads(raw)
+                if isinstance(payload, dict) and "id" in payload:
+                    rid = str(payload.pop("id"))
+                inputs.append(SymptomInput.model_validate(payload))
+            else:
+                inputs.append(SymptomInput.model_validate(raw))
+            ids.append(rid)
+        except (ValidationError, ValueError) as e:
+            errors.append(json.dumps({"id": rid, "error": str(e).splitlines()[0], "details": str(e)}, ensure_ascii=False))
+
+    rows = (_result_row(rid, tr) for rid, tr in zip(ids, iter_triage_batch(inputs)))
+    if output == "parquet":
+        columns: Dict[str, List] = {name: [] for name in PARQUET_COLUMNS}
+        for row in rows:
+            for name, values in columns.items():
+                values.append(row[name])
+        return columns, errors, len(ids)
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows), errors, len(ids)
+
+
+def _init_worker() -> None:
+    # Compile (or map) the rule set and build validators once per worker, not per chunk
+    preload(WORKER_STEPS)
+
+
+class _JsonlSink:
+    def __init__(self, path: str):
+        self.fh = _open_text(path, "w")
+        self.to_stdout = path == "-"
+
+    def write(self, payload) -> None:
+        self.fh.write(payload)
+
+    def close(self) -> None:
+        if self.to_stdout:
+            self.fh.flush()
+            self.fh.detach()
+        else:
+            self.fh.close()
+
+
+class _ParquetSink:
+    # One row group per chunk
+    def __init__(self, path: str):
+        self.schema = parquet_schema()
+        if self.schema is None:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow (or write .jsonl)")
+        self.pa = optional_module("pyarrow")
+        self.writer = optional_module("pyarrow.parquet").ParquetWriter(path, self.schema)
+
+    def write(self, payload) -> None:
+        if payload["id"]:
+            self.writer.write_table(self.pa.Table.from_pydict(payload, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def run(
+    source: str,
+    dest: str,
+    input_format: Optional[str] = None,
+    output_format: Optional[str] = None,
+    workers: int = os.cpu_count() or 1,
+    chunk_size: int = 2000,
+    symptom_sep: str = ";",
+    errors_path: Optional[str] = None,
+) -> Dict[str, float]:
+    in_fmt = _detect_format(source, input_format, "jsonl")
+    out_fmt = _detect_format(dest, output_format, "jsonl")
+    if out_fmt not in ("jsonl", "parquet"):
+        raise SystemExit(f"unsupported output format: {out_fmt}")
+    if out_fmt == "parquet" and parquet_schema() is None:
+        raise SystemExit("Parquet output needs pyarrow: pip install pyarrow (or write .jsonl)")
+    sink = _ParquetSink(dest) if out_fmt == "parquet" else _JsonlSink(dest)
+    err_fh = _open_text(errors_path, "w") if errors_path else None
+    stats = {"records": 0, "errors": 0, "seconds": 0.0}
+
+    def consume(result: Tuple[object, List[str], int]) -> None:
+        payload, errors, scored = result
+        sink.write(payload)
+        stats["records"] += scored
+        stats["errors"] += len(errors)
+        if err_fh is not None and errors:
+            err_fh.write("\n".join(errors) + "\n")
+
+    started = time.perf_counter()
+    with _open_text(source, "r") as fh:
+        chunks = _chunks(read_records(fh, in_fmt, symptom_sep), chunk_size)
+        try:
+            if workers <= 1:
+                _init_worker()
+                for chunk in chunks:
+                    consume(_process_chunk(chunk, out_fmt))
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                    inflight: Deque[Future] = deque()
+                    for chunk in chunks:
+                        inflight.append(pool.submit(_process_chunk, chunk, out_fmt))
+                        # Bounded window: keeps memory flat and output in input order
+                        while len(inflight) >= 2 * workers:
+                            consume(inflight.popleft().result())
+                    while inflight:
+                        consume(inflight.popleft().result())
+        finally:
+            sink.close()
+            if err_fh is not None:
+                err_fh.close()
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Triage CSV/JSONL intake exports offline")
+    parser.add_argument("input", help="CSV or JSONL file ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL or .parquet file ('-' for stdout)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["jsonl", "parquet"])
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes (1 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="records per task")
+    parser.add_argument("--symptom-sep", default=";", help="separator inside the CSV symptoms column")
+    parser.add_argument("--errors", help="write rejected records (JSONL with the validation error) here")
+    parser.add_argument("--rules", help="rule pack to score with (sets TRIAGE_RULES_PATH)")
+    args = parser.parse_args()
+
+    if args.rules:
+        os.environ["TRIAGE_RULES_PATH"] = args.rules
+    stats = run(
+        args.input,
+        args.output,
+        input_format=args.input_format,
+        output_format=args.output_format,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        symptom_sep=args.symptom_sep,
+        errors_path=args.errors,
+    )
+    rate = stats["records"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(
+        f"{stats['records']:.0f} records scored, {stats['errors']:.0f} rejected in {stats['seconds']:.2f}s "
+        f"({rate:,.0f} records/s, {args.workers} worker(s))",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
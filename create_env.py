@@ -8,6 +8,8 @@ LLM_PROVIDER=OpenAI
 # OpenAI
 OPENAI_API_KEY=
 OPENAI_MODEL=gpt-4o-mini
+# Optional: OpenAI-compatible endpoint (proxy, gateway, local stub)
+OPENAI_BASE_URL=
 
 # Ollama
 OLLAMA_BASE_URL=http://localhost:11434
@@ -15,6 +17,81 @@ OLLAMA_MODEL=llama3:8b-instruct
 
 # Model behavior
 AI_TEMPERATURE=0.2
+
+# Advice cache (in-memory LRU; set ADVICE_CACHE_DB to also keep a SQLite file)
+ADVICE_CACHE_SIZE=256
+ADVICE_CACHE_TTL=3600
+ADVICE_CACHE_DB=
+ADVICE_CACHE_DB_SIZE=10000
+# Reuse advice for similar intakes (same risk level and red flags, similar
+# symptoms, top conditions, age/severity/duration bucket) at or above this
+# Jaccard similarity, e.g. 0.9; 0 = exact matches only (default)
+ADVICE_SEMANTIC_THRESHOLD=0
+ADVICE_SEMANTIC_SIZE=1024
+
+# Streamlit result caches (entries per cache, seconds)
+APP_CACHE_MAX_ENTRIES=512
+APP_CACHE_TTL=3600
+
+# Hedged requests: after the delay (then the primary's p90 latency) also ask
+# LLM_HEDGE_PROVIDER/LLM_HEDGE_MODEL (default: the other provider) and use the first answer
+LLM_HEDGE=0
+LLM_HEDGE_PROVIDER=
+LLM_HEDGE_MODEL=
+LLM_HEDGE_DELAY_MS=1500
+LLM_TIMEOUT_S=60
+LLM_BREAKER_FAILURES=3
+LLM_BREAKER_RESET_S=30
+
+# Coalesce concurrent advice requests into LLM batches (up to LLM_BATCH_MAX
+# prompts, waiting at most LLM_BATCH_WAIT_MS); identical prompts in flight are sent once.
+# A batched request gives up after LLM_TIMEOUT_S plus the wait (server: 504)
+LLM_BATCH=0
+LLM_BATCH_MAX=8
+LLM_BATCH_WAIT_MS=20
+LLM_BATCH_THREADS=4
+
+# Estimated prompt size limit; questions, advice, conditions and symptoms are
+# trimmed in that order to fit (0 = no limit). Patient notes are never sent.
+LLM_PROMPT_BUDGET_TOKENS=600
+
+# FAQ search: lexical (BM25, default), semantic (vector index) or hybrid;
+# the last two build the vector index on the first query (at startup with
+# TRIAGE_PRELOAD=1) and cost more per query. The index is cached under
+# FAQ_INDEX_DIR (default .faq_index/) as a memory-mapped float32 matrix.
+# FAQ_EMBED_MODEL selects a sentence-transformers model if that package is
+# installed; otherwise hashed TF-IDF vectors with FAQ_EMBED_DIM buckets are used
+FAQ_SEARCH_MODE=lexical
+FAQ_VECTOR_WEIGHT=0.5
+FAQ_EMBED_MODEL=
+FAQ_EMBED_DIM=512
+FAQ_INDEX_DIR=
+
+# Emergency/high-risk intakes: show precomputed guidance at once, then run the
+# LLM in the background (background), not at all (skip), or wait for it (off);
+# at most URGENT_MAX_BACKGROUND background calls run at once
+URGENT_FAST_PATH=background
+URGENT_MAX_BACKGROUND=32
+
+# Per-stage timing spans/counters (server: GET /metrics; app: debug panel)
+METRICS_ENABLED=0
+
+# Load rules, FAQ indexes, validators and the LLM client at startup instead of
+# on first use (server and its workers; the app warms up in the background)
+TRIAGE_PRELOAD=0
+
+# Audit log of every triage/advice request: a directory such as audit_log
+# turns it on (empty = off); segments rotate at AUDIT_SEGMENT_MB or
+# AUDIT_SEGMENT_S, older than AUDIT_RETENTION_DAYS are deleted (0 = keep).
+# Holds patient input: keep it out of version control.
+AUDIT_LOG_DIR=
+AUDIT_BATCH=1024
+AUDIT_FLUSH_S=2
+AUDIT_MAX_PENDING=10000
+AUDIT_SEGMENT_MB=16
+AUDIT_SEGMENT_S=3600
+AUDIT_RETENTION_DAYS=0
+AUDIT_FSYNC=0
 """
 
 
@@ -0,0 +1,316 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from lazy import optional_module
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# Local text embeddings and a brute-force vector index for FAQ retrieval.
+#
+# HashingEmbedder is the dependency-free default: word unigrams, character
+# trigrams (typos, inflections) and concept ids from CONCEPT_GROUPS (so
+# "stomach ache" and "abdominal pain" share a feature) are hashed into a
+# fixed number of signed buckets and weighted by per-bucket IDF. With
+# FAQ_EMBED_MODEL set and sentence-transformers installed, that model is used
+# instead.
+#
+# VectorIndex keeps L2-normalized float32 rows in a .npy file that is
+# memory-mapped on load, so worker processes share the pages; search is one
+# matrix-vector product plus a partial sort (about 100k x 512 floats per
+# query), which is fast enough at FAQ sizes that an ANN index is not needed.
+
+HASH_DIM = int(os.getenv("FAQ_EMBED_DIM", "512"))
+INDEX_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Phrases with the same meaning, matched on lowercased word sequences
+CONCEPT_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "abdominal_pain": ("abdominal pain", "stomach ache", "stomachache", "stomach pain", "belly pain", "tummy ache", "боль в животе", "болит живот", "живот болит"),
+    "dyspnea": ("shortness of breath", "short of breath", "breathlessness", "difficulty breathing", "dyspnea", "одышка", "трудно дышать", "тяжело дышать"),
+    "fever": ("fever", "high temperature", "temperature", "pyrexia", "температура", "жар", "лихорадка"),
+    "headache": ("headache", "head pain", "migraine", "головная боль", "болит голова", "мигрень"),
+    "sore_throat": ("sore throat", "throat pain", "pharyngitis", "боль в горле", "болит горло"),
+    "nausea": ("nausea", "feeling sick", "queasy", "тошнота", "тошнит"),
+    "vomiting": ("vomiting", "throwing up", "рвота", "рвет"),
+    "diarrhea": ("diarrhea", "diarrhoea", "loose stools", "диарея", "понос"),
+    "chest_pain": ("chest pain", "chest tightness", "боль в груди", "давит в груди"),
+    "rash": ("rash", "skin rash", "hives", "сыпь", "высыпания"),
+    "cough": ("cough", "coughing", "кашель", "кашляю"),
+    "runny_nose": ("runny nose", "rhinorrhea", "stuffy nose", "nasal congestion", "насморк", "заложен нос"),
+    "fatigue": ("fatigue", "tiredness", "exhaustion", "weakness", "усталость", "слабость"),
+    "dizziness": ("dizziness", "dizzy", "vertigo", "lightheaded", "головокружение", "кружится голова"),
+    "influenza": ("flu", "influenza", "грипп"),
+    "paracetamol": ("paracetamol", "acetaminophen", "tylenol", "парацетамол"),
+    "doctor": ("doctor", "physician", "gp", "врач", "доктор"),
+    "antipyretic": ("fever reducer", "antipyretic", "жаропонижающее"),
+}
+
+# Trigrams carry most of a word's weight so a typo only loses part of it;
+# tuned on benchmarks/bench_faq_retrieval.py
+WORD_WEIGHT = 0.3
+TRIGRAM_WEIGHT = 3.0  # per word, spread over its trigrams
+CONCEPT_WEIGHT = 1.0
+_FEATURE_CACHE_MAX = 200_000
+
+
+def _concept_table() -> Tuple[Dict[Tuple[str, ...], str], int]:
+    table: Dict[Tuple[str, ...], str] = {}
+    longest = 1
+    for concept, phrases in CONCEPT_GROUPS.items():
+        for phrase in phrases:
+            words = tuple(_TOKEN_RE.findall(phrase.lower()))
+            table[words] = concept
+            longest = max(longest, len(words))
+    return table, longest
+
+
+_CONCEPTS, _CONCEPT_MAX_WORDS = _concept_table()
+
+
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    # Stable across processes (unlike hash()); the sign halves collision bias
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+class HashingEmbedder:
+    uses_idf = True
+
+    def __init__(self, dim: int = HASH_DIM):
+        self.dim = dim
+        self.name = f"hash{dim}-v{INDEX_VERSION}"
+        self._features: Dict[str, Tuple["np.ndarray", "np.ndarray"]] = {}
+        self._lock = threading.Lock()
+
+    def _word_features(self, word: str):
+        cached = self._features.get(word)
+        if cached is not None:
+            return cached
+        np = optional_module("numpy")
+        feats = [_bucket("w:" + word, self.dim) + (WORD_WEIGHT,)]
+        padded = f"<{word}>"
+        grams = [padded[i : i + 3] for i in range(len(padded) - 2)]
+        for gram in grams:
+            feats.append(_bucket("t:" + gram, self.dim) + (TRIGRAM_WEIGHT / len(grams),))
+        idx = np.fromiter((b for b, _, _ in feats), dtype=np.int64, count=len(feats))
+        val = np.fromiter((s * w for _, s, w in feats), dtype=np.float64, count=len(feats))
+        with self._lock:
+            if len(self._features) >= _FEATURE_CACHE_MAX:
+                self._features.clear()
+            self._features[word] = (idx, val)
+        return idx, val
+
+    def _text_features(self, text: str) -> Tuple["np.ndarray", "np.ndarray"]:
+        np = optional_module("numpy")
+        words = _TOKEN_RE.findall(text.lower())
+        parts = [self._word_features(w) for w in words]
+        # Concept phrases, longest match first
+        i = 0
+        while i < len(words):
+            for n in range(min(_CONCEPT_MAX_WORDS, len(words) - i), 0, -1):
+                concept = _CONCEPTS.get(tuple(words[i : i + n]))
+                if concept is not None:
+                    b, s = _bucket("c:" + concept, self.dim)
+                    parts.append((np.array([b], dtype=np.int64), np.array([s * CONCEPT_WEIGHT])))
+                    i += n
+                    break
+            else:
+                i += 1
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        # Raw (un-weighted, un-normalized) hashed term vectors, one row per text
+        np = optional_module("numpy")
+        idx_parts, val_parts = [], []
+        for row, text in enumerate(texts):
+            idx, val = self._text_features(text)
+            idx_parts.append(idx + row * self.dim)
+            val_parts.append(val)
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        flat = np.bincount(np.concatenate(idx_parts), weights=np.concatenate(val_parts), minlength=len(texts) * self.dim)
+        return flat.reshape(len(texts), self.dim).astype(np.float32)
+
+
+class SentenceEmbedder:
+    uses_idf = False
+
+    def __init__(self, model_name: str):
+        self.model = optional_module("sentence_transformers").SentenceTransformer(model_name)
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+        self.name = "st-" + re.sub(r"[^\w.-]", "_", model_name)
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        np = optional_module("numpy")
+        return np.asarray(self.model.encode(list(texts), batch_size=64, normalize_embeddings=True), dtype=np.float32)
+
+
+_EMBEDDERS: Dict[str, object] = {}
+_EMBEDDERS_LOCK = threading.Lock()
+
+
+def available() -> bool:
+    # numpy is imported here, on first use
+    return optional_module("numpy") is not None
+
+
+def get_embedder():
+    model_name = os.getenv("FAQ_EMBED_MODEL", "").strip()
+    # sentence-transformers (and torch) are only imported when a model is configured
+    if not model_name or optional_module("sentence_transformers") is None:
+        model_name = ""
+    with _EMBEDDERS_LOCK:
+        embedder = _EMBEDDERS.get(model_name)
+        if embedder is None:
+            embedder = _EMBEDDERS[model_name] = SentenceEmbedder(model_name) if model_name else HashingEmbedder()
+        return embedder
+
+
+def _normalize_rows(matrix: "np.ndarray") -> None:
+    np = optional_module("numpy")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+
+class VectorIndex:
+    def __init__(self, embedder, matrix: "np.ndarray", idf: Optional["np.ndarray"] = None, path: Optional[Path] = None):
+        self.embedder = embedder
+        self.matrix = matrix
+        self.idf = idf
+        self.path = path
+
+    def __len__(self) -> int:
+        return int(self.matrix.shape[0])
+
+    def query_vector(self, text: str) -> "np.ndarray":
+        np = optional_module("numpy")
+        vec = self.embedder.embed([text])[0]
+        if self.idf is not None:
+            vec = vec * self.idf
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def similarities(self, vector: "np.ndarray", rows: Sequence[int]) -> "np.ndarray":
+        np = optional_module("numpy")
+        return self.matrix[np.asarray(rows, dtype=np.int64)] @ vector.astype(np.float32)
+
+    def nearest(self, vector: "np.ndarray", limit: int = 10) -> Tuple["np.ndarray", "np.ndarray"]:
+        # (row ids, cosine scores), best first
+        np = optional_module("numpy")
+        n = len(self)
+        if n == 0 or limit <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = self.matrix @ vector.astype(np.float32)
+        k = min(limit, n)
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.lexsort((top, -scores[top]))]
+        return top, scores[top]
+
+    def search(self, text: str, limit: int = 10) -> Tuple["np.ndarray", "np.ndarray"]:
+        return self.nearest(self.query_vector(text), limit)
+
+
+def _build_rows(embedder, texts: Sequence[str], out: "np.ndarray", block: int = 8192) -> Optional["np.ndarray"]:
+    # Fills ``out`` block by block; returns the IDF vector for hashing embedders
+    np = optional_module("numpy")
+    df = np.zeros(out.shape[1], dtype=np.int64) if embedder.uses_idf else None
+    for start in range(0, len(texts), block):
+        rows = embedder.embed(texts[start : start + block])
+        out[start : start + len(rows)] = rows
+        if df is not None:
+            df += np.count_nonzero(rows, axis=0)
+    if df is None:
+        return None
+    n = len(texts)
+    idf = (np.log((n + 1.0) / (df + 1.0)) + 1.0).astype(np.float32)
+    for start in range(0, n, block):
+        chunk = out[start : start + block] * idf
+        _normalize_rows(chunk)
+        out[start : start + block] = chunk
+    return idf
+
+
+def build_index(texts: Sequence[str], embedder=None) -> VectorIndex:
+    np = optional_module("numpy")
+    embedder = embedder or get_embedder()
+    matrix = np.zeros((len(texts), embedder.dim), dtype=np.float32)
+    idf = _build_rows(embedder, texts, matrix)
+    return VectorIndex(embedder, matrix, idf)
+
+
+def index_dir() -> Path:
+    return Path(os.getenv("FAQ_INDEX_DIR") or Path(__file__).resolve().parent / ".faq_index")
+
+
+def _load(target: Path, embedder) -> VectorIndex:
+    np = optional_module("numpy")
+    idf_path = target / "idf.npy"
+    idf = np.load(idf_path) if idf_path.exists() else None
+    return VectorIndex(embedder, np.load(target / "vectors.npy", mmap_mode="r"), idf, target)
+
+
+def _remove_dir(path: Path) -> None:
+    try:
+        for f in path.iterdir():
+            f.unlink()
+        path.rmdir()
+    except OSError:
+        pass
+
+
+def load_or_build(name: str, source_version: int, texts: Sequence[str], embedder=None) -> VectorIndex:
+    # One immutable directory per (source, embedder, source version): reused
+    # when present, otherwise built in a temp dir and renamed into place, so
+    # readers never see a half-written index and concurrent builders do not
+    # clash. Older versions are removed. Falls back to memory if the
+    # directory is not writable.
+    np = optional_module("numpy")
+    embedder = embedder or get_embedder()
+    root = index_dir()
+    prefix = f"{name}.{embedder.name}."
+    target = root / f"{prefix}{source_version}-{len(texts)}"
+    if (target / "meta.json").exists():
+        try:
+            return _load(target, embedder)
+        except (OSError, ValueError):
+            pass
+
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=f".{prefix}", dir=root))
+    except OSError:
+        return build_index(texts, embedder)
+    matrix = np.lib.format.open_memmap(tmp / "vectors.npy", mode="w+", dtype=np.float32, shape=(len(texts), embedder.dim))
+    idf = _build_rows(embedder, texts, matrix)
+    matrix.flush()
+    del matrix
+    if idf is not None:
+        np.save(tmp / "idf.npy", idf)
+    meta = {"version": INDEX_VERSION, "embedder": embedder.name, "dim": embedder.dim, "rows": len(texts), "source_version": source_version}
+    (tmp / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # Another process got there first
+        _remove_dir(tmp)
+    for stale in root.glob(prefix + "*"):
+        if stale != target and stale.is_dir():
+            _remove_dir(stale)
+    return _load(target, embedder)
+
+
+def texts_for(items: Iterable) -> List[str]:
+    # What gets embedded for an FAQ entry
+    return [f"{it.question}\n{' '.join(it.tags)}\n{it.answer}" for it in items]
@@ -1,35 +1,198 @@
-from typing import List
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from pathlib import Path
+from bisect import bisect_left
+import heapq
 import json
+import math
+import os
+import re
+import threading
+from metrics import span
 from models import FAQItem
 
+if TYPE_CHECKING:
+    from embeddings import VectorIndex
+
 
 DATA_PATH_RU = Path(__file__).resolve().parent / "faq_data.json"
 DATA_PATH_EN = Path(__file__).resolve().parent / "faq_en.json"
 
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_EXPANSIONS = 16
+# Search modes: "lexical" (BM25), "semantic" (vector index) or "hybrid" (both,
+# BM25 scaled to [0, 1] and mixed with cosine similarity by FAQ_VECTOR_WEIGHT)
+SEARCH_MODES = ("lexical", "semantic", "hybrid")
+VECTOR_CANDIDATES = 50
+# Cosine similarities below this are hash collisions / shared trigrams, not relevance
+MIN_VECTOR_SCORE = 0.1
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it my of on or should the to what when with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [tok for tok in _TOKEN_RE.findall(text.lower()) if tok not in _STOPWORDS]
+
+
+class FAQIndex:
+    # Inverted index over question, answer and tags. Each posting stores its
+    # precomputed BM25 contribution, so a query only sums postings of its terms.
+    # The vector index is built (or mapped from FAQ_INDEX_DIR when ``source``
+    # and ``version`` are given) on the first non-lexical search.
+    def __init__(self, items: List[FAQItem], k1: float = BM25_K1, b: float = BM25_B, source: Optional[str] = None, version: Optional[int] = None):
+        self.items = items
+        self.source = source
+        self.version = version
+        self._vectors: Optional["VectorIndex"] = None
+        self._vectors_lock = threading.Lock()
+        term_freqs: Dict[str, Dict[int, int]] = {}
+        doc_lens: List[int] = []
+        for doc, it in enumerate(items):
+            tokens = tokenize(f"{it.question}\n{it.answer}\n{' '.join(it.tags)}")
+            doc_lens.append(len(tokens))
+            for tok in tokens:
+                tf = term_freqs.setdefault(tok, {})
+                tf[doc] = tf.get(doc, 0) + 1
+
+        n_docs = len(items)
+        avgdl = (sum(doc_lens) / n_docs) if n_docs else 1.0
+        self.postings: Dict[str, Tuple[Tuple[int, float], ...]] = {}
+        for term, tf in term_freqs.items():
+            idf = math.log(1.0 + (n_docs - len(tf) + 0.5) / (len(tf) + 0.5))
+            self.postings[term] = tuple(
+                (doc, idf * f * (k1 + 1) / (f + k1 * (1 - b + b * doc_lens[doc] / avgdl)))
+                for doc, f in tf.items()
+            )
+        self.vocabulary: List[str] = sorted(self.postings)
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        terms: List[str] = []
+        i = bisect_left(self.vocabulary, prefix)
+        while i < len(self.vocabulary) and len(terms) < MAX_PREFIX_EXPANSIONS and self.vocabulary[i].startswith(prefix):
+            terms.append(self.vocabulary[i])
+            i += 1
+        return terms
+
+    def scores(self, query: str) -> Dict[int, float]:
+        tokens = tokenize(query)
+        terms = set(tokens)
+        # The last token may still be being typed: match it as a prefix too
+        if tokens and not query[-1:].isspace():
+            terms.update(self._expand_prefix(tokens[-1]))
+        scores: Dict[int, float] = {}
+        for term in terms:
+            for doc, w in self.postings.get(term, ()):
+                scores[doc] = scores.get(doc, 0.0) + w
+        return scores
+
+    def vectors(self) -> Optional["VectorIndex"]:
+        # None without numpy. embeddings (and numpy) are imported here, on first use
+        import embeddings
+
+        if self._vectors is None and embeddings.available():
+            with self._vectors_lock:
+                if self._vectors is None:
+                    with span("faq.vector_build"):
+                        texts = embeddings.texts_for(self.items)
+                        if self.source is not None and self.version is not None:
+                            self._vectors = embeddings.load_or_build(self.source, self.version, texts)
+                        else:
+                            self._vectors = embeddings.build_index(texts)
+        return self._vectors
+
+    def hybrid_scores(self, query: str, limit: int = 10, vector_weight: float = 0.5) -> Dict[int, float]:
+        # Candidates are the best lexical and the nearest vector hits; each
+        # gets both scores, so a strong lexical match is not outranked just
+        # because it missed the vector shortlist
+        n_candidates = max(limit, VECTOR_CANDIDATES)
+        scores: Dict[int, float] = {}
+        if vector_weight < 1.0:
+            lexical = self.scores(query)
+            if lexical:
+                scale = (1.0 - vector_weight) / max(lexical.values())
+                scores = {doc: s * scale for doc, s in heapq.nlargest(n_candidates, lexical.items(), key=lambda kv: kv[1])}
+        vectors = self.vectors() if vector_weight > 0.0 else None
+        if vectors is None:
+            return scores
+        qvec = vectors.query_vector(query)
+        docs, sims = vectors.nearest(qvec, n_candidates)
+        nearest = dict(zip(docs.tolist(), sims.tolist()))
+        missing = [doc for doc in scores if doc not in nearest]
+        if missing:
+            nearest.update(zip(missing, vectors.similarities(qvec, missing).tolist()))
+        for doc, sim in nearest.items():
+            if sim >= MIN_VECTOR_SCORE:
+                scores[doc] = scores.get(doc, 0.0) + vector_weight * sim
+        return scores
+
+    def search(self, query: str, limit: int = 10, mode: str = "lexical", vector_weight: float = 0.5) -> List[FAQItem]:
+        if not query:
+            return self.items[:limit]
+        if mode == "lexical":
+            scores = self.scores(query)
+        else:
+            scores = self.hybrid_scores(query, limit, 1.0 if mode == "semantic" else vector_weight)
+        top = heapq.nlargest(limit, scores.items(), key=lambda kv: (kv[1], -kv[0]))
+        return [self.items[doc] for doc, _ in top]
+
+
+_INDEXES: Dict[Path, Tuple[int, FAQIndex]] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def _data_path(lang: str) -> Path:
+    return DATA_PATH_RU if lang == "ru" else DATA_PATH_EN
+
+
+def get_faq_index(lang: str = "ru") -> Optional[FAQIndex]:
+    path = _data_path(lang)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    cached = _INDEXES.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _INDEX_LOCK:
+        cached = _INDEXES.get(path)
+        if cached is None or cached[0] != mtime:
+            with span("faq.index_build"):
+                data = json.loads(path.read_text(encoding="utf-8"))
+                cached = _INDEXES[path] = (mtime, FAQIndex([FAQItem(**x) for x in data], source=path.stem, version=mtime))
+        return cached[1]
+
+
+def faq_version(lang: str = "ru") -> Optional[int]:
+    # Changes whenever the FAQ file does; usable as part of a cache key
+    try:
+        return _data_path(lang).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def clear_faq_cache() -> None:
+    with _INDEX_LOCK:
+        _INDEXES.clear()
+
 
 def load_faq(lang: str = "ru") -> List[FAQItem]:
-    path = DATA_PATH_RU if lang == "ru" else DATA_PATH_EN
-    if not path.exists():
-        return []
-    data = json.loads(path.read_text(encoding="utf-8"))
-    return [FAQItem(**x) for x in data]
-
-
-def search_faq(query: str, limit: int = 10, lang: str = "ru") -> List[FAQItem]:
-    items = load_faq(lang)
-    if not query:
-        return items[:limit]
-    q = query.lower()
-    scored = []
-    for it in items:
-        text = f"{it.question}\n{it.answer}\n{' '.join(it.tags)}".lower()
-        # Naive score: count of query tokens present
-        tokens = [t for t in q.split() if t]
-        score = sum(1 for t in tokens if t in text)
-        if score > 0:
-            scored.append((score, it))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [it for _, it in scored[:limit]]
+    index = get_faq_index(lang)
+    return list(index.items) if index is not None else []
 
 
+def search_mode() -> str:
+    mode = os.getenv("FAQ_SEARCH_MODE", "lexical").strip().lower()
+    return mode if mode in SEARCH_MODES else "lexical"
+
+
+def search_faq(query: str, limit: int = 10, lang: str = "ru", mode: Optional[str] = None) -> List[FAQItem]:
+    # ``mode`` defaults to FAQ_SEARCH_MODE (lexical). semantic and hybrid build
+    # the vector index on their first query unless warmup.preload() did
+    index = get_faq_index(lang)
+    if index is None:
+        return []
+    with span("faq.search"):
+        return index.search(query, limit, mode or search_mode(), float(os.getenv("FAQ_VECTOR_WEIGHT", "0.5")))
@@ -0,0 +1,126 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+
+# Typo-tolerant word lookup (symmetric delete). Every known word is indexed
+# under each string reachable by deleting up to max_distance(len(word))
+# characters; a query generates its own deletes, looks them up, and the few
+# candidates found are verified with the optimal-string-alignment distance
+# (Levenshtein plus adjacent transpositions). A lookup is a handful of dict
+# probes whatever the vocabulary size; correct() is memoized per raw string.
+#
+# Corrections are deliberately conservative, since a wrong one invents a
+# symptom: at most one edit in five characters, none for words shorter than
+# MIN_LENGTH, the first letter must match (typos rarely hit it, while real
+# words next to a known one usually differ there: never/fever, cash/rash), and
+# ``protected`` words are never corrected.
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+CACHE_SIZE = 8192
+MIN_LENGTH = 5
+
+
+def max_distance(length: int) -> int:
+    # Short words have too many neighbours to correct safely
+    if length < MIN_LENGTH:
+        return 0
+    return 1 if length < 10 else 2
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    out = {word}
+    frontier = [word]
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1 :] for w in frontier for i in range(len(w))}
+        out.update(frontier)
+    return out
+
+
+def osa_distance(a: str, b: str, limit: int) -> int:
+    # Returns limit + 1 as soon as the distance is known to exceed ``limit``
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        ca = a[i - 1]
+        for j in range(1, len(b) + 1):
+            cb = b[j - 1]
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+            if d < row_min:
+                row_min = d
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class FuzzyIndex:
+    def __init__(self, words: Iterable[str], cache_size: int = CACHE_SIZE, protected: Iterable[str] = ()):
+        # ``words`` may repeat; frequency breaks ties between equally close candidates
+        self.protected = frozenset(protected)
+        self.words: Dict[str, int] = {}
+        for w in words:
+            self.words[w] = self.words.get(w, 0) + 1
+        # Almost every delete variant belongs to a single word: store the word
+        # itself and switch to a tuple only on collision
+        table: Dict[str, Union[str, Tuple[str, ...]]] = {}
+        get = table.get
+        for w in self.words:
+            for variant in _deletes(w, max_distance(len(w))):
+                cur = get(variant)
+                if cur is None:
+                    table[variant] = w
+                elif isinstance(cur, str):
+                    table[variant] = (cur, w)
+                else:
+                    table[variant] = cur + (w,)
+        self._table = table
+        self.correct = lru_cache(maxsize=cache_size)(self._correct)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def lookup(self, word: str) -> Optional[str]:
+        # Closest known word within the allowed distance, or None
+        if word in self.words:
+            return word
+        limit = max_distance(len(word))
+        if not limit or word in self.protected:
+            return None
+        best: Optional[Tuple[int, int, str]] = None
+        seen: Set[str] = set()
+        for variant in _deletes(word, limit):
+            found = self._table.get(variant)
+            if found is None:
+                continue
+            for cand in (found,) if isinstance(found, str) else found:
+                if cand in seen or cand[0] != word[0]:
+                    continue
+                seen.add(cand)
+                dist = osa_distance(word, cand, limit)
+                if dist <= limit and dist <= max_distance(len(cand)):
+                    key = (dist, -self.words[cand], cand)
+                    if best is None or key < best:
+                        best = key
+        return best[2] if best is not None else None
+
+    def _correct(self, text: str) -> Optional[str]:
+        # ``text`` with unknown words replaced by their closest known word
+        # (words joined by single spaces); None if no word was corrected
+        words = WORD_RE.findall(text)
+        changed = False
+        for i, w in enumerate(words):
+            if w in self.words:
+                continue
+            fixed = self.lookup(w)
+            if fixed is not None:
+                words[i] = fixed
+                changed = True
+        return " ".join(words) if changed else None
@@ -0,0 +1,482 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Deque, Dict, List, Optional, Tuple
+
+from advice_cache import AdviceCache, AdviceKey, make_advice_key
+from llm import aget_llm, get_llm, llm_timeout_s, prepare_prompt
+from metrics import incr, observe
+from models import SymptomInput, TriageResult
+
+
+# Hedged LLM requests: send the prompt to the first healthy target; if it has
+# not answered after the hedge delay, send it to the next target as well and
+# take whichever finishes first. The hedge delay follows the primary's recent
+# p90 latency (clamped to [min_delay_s, max_delay_s]), each target has its own
+# timeout, and a circuit breaker skips targets that keep failing.
+#
+# The async variant cancels the losing request. The sync variant runs requests
+# on a thread pool; a losing request cannot be interrupted there, so its result
+# is discarded (but still counted in the latency stats). A request abandoned
+# at its timeout is counted as that timeout only, whenever its thread ends.
+
+
+class LLMTarget:
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        temperature: float = 0.2,
+        timeout_s: float = 60.0,
+        base_url: Optional[str] = None,
+    ):
+        self.provider = provider
+        self.model = model
+        self.temperature = float(temperature)
+        self.timeout_s = timeout_s
+        self.base_url = base_url
+
+    @property
+    def key(self) -> Tuple[str, str, Optional[str], float]:
+        return (self.provider, self.model, self.base_url, round(self.temperature, 3))
+
+    def __repr__(self) -> str:
+        return f"LLMTarget({self.provider}:{self.model}{'@' + self.base_url if self.base_url else ''})"
+
+
+class CircuitBreaker:
+    # closed -> open after ``failure_threshold`` consecutive failures; after
+    # ``reset_after_s`` one trial request is let through (half-open), whose
+    # outcome closes or re-opens the breaker.
+    def __init__(self, failure_threshold: int = 3, reset_after_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after_s = reset_after_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after_s:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_after_s or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+    def release_trial(self) -> None:
+        # A request that was cancelled before it finished says nothing about
+        # the target; let the next request be the trial instead
+        with self._lock:
+            self._trial = False
+
+
+class LatencyStats:
+    # Latencies (seconds) of the last ``window`` successful requests
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+            self.successes += 1
+
+    def add_failure(self, timeout: bool = False) -> None:
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.failures += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict:
+        return {
+            "samples": len(self.samples),
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "p50_s": self.quantile(0.5),
+            "p95_s": self.quantile(0.95),
+        }
+
+
+class HedgePolicy:
+    def __init__(
+        self,
+        delay_s: float = 1.5,
+        min_delay_s: float = 0.05,
+        max_delay_s: float = 5.0,
+        quantile: float = 0.9,
+        min_samples: int = 20,
+        max_parallel: int = 2,
+        failure_threshold: int = 3,
+        reset_after_s: float = 30.0,
+    ):
+        self.delay_s = delay_s
+        self.min_delay_s = min_delay_s
+        self.max_delay_s = max_delay_s
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.max_parallel = max_parallel
+        self.failure_threshold = failure_threshold
+        self.reset_after_s = reset_after_s
+
+    def hedge_delay(self, stats: LatencyStats) -> float:
+        # Fixed delay until there are enough samples, then the primary's tail latency
+        if len(stats.samples) < self.min_samples:
+            return self.delay_s
+        q = stats.quantile(self.quantile)
+        return min(self.max_delay_s, max(self.min_delay_s, q if q is not None else self.delay_s))
+
+
+class _Health:
+    def __init__(self, policy: HedgePolicy):
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_after_s)
+        self.stats = LatencyStats()
+
+
+_HEALTH: Dict[Tuple, _Health] = {}
+_HEALTH_LOCK = threading.Lock()
+_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def _health(target: LLMTarget, policy: HedgePolicy) -> _Health:
+    with _HEALTH_LOCK:
+        h = _HEALTH.get(target.key)
+        if h is None:
+            h = _HEALTH[target.key] = _Health(policy)
+        return h
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    with _HEALTH_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_HEDGE_THREADS", "32")), thread_name_prefix="llm-hedge")
+        return _POOL
+
+
+def target_stats() -> Dict[str, Dict]:
+    with _HEALTH_LOCK:
+        items = list(_HEALTH.items())
+    return {
+        ":".join(str(x) for x in key if x is not None): dict(h.stats.snapshot(), breaker=h.breaker.state)
+        for key, h in items
+    }
+
+
+def reset_target_stats() -> None:
+    with _HEALTH_LOCK:
+        _HEALTH.clear()
+
+
+def targets_from_env(provider: str, openai_model: str, ollama_model: str, temperature: float) -> List[LLMTarget]:
+    # Primary from the usual settings, hedge target from LLM_HEDGE_PROVIDER /
+    # LLM_HEDGE_MODEL (defaults: the other provider with its configured model)
+    timeout_s = llm_timeout_s()
+    primary_model = openai_model if provider == "OpenAI" else ollama_model
+    targets = [LLMTarget(provider, primary_model, temperature, timeout_s)]
+    hedge_provider = os.getenv("LLM_HEDGE_PROVIDER") or ("Ollama" if provider == "OpenAI" else "OpenAI")
+    hedge_model = os.getenv("LLM_HEDGE_MODEL") or (ollama_model if hedge_provider == "Ollama" else openai_model)
+    if hedge_model and (hedge_provider, hedge_model) != (provider, primary_model):
+        targets.append(LLMTarget(hedge_provider, hedge_model, temperature, float(os.getenv("LLM_HEDGE_TIMEOUT_S", str(timeout_s)))))
+    return targets
+
+
+def policy_from_env() -> HedgePolicy:
+    return HedgePolicy(
+        delay_s=float(os.getenv("LLM_HEDGE_DELAY_MS", "1500")) / 1000.0,
+        max_parallel=int(os.getenv("LLM_HEDGE_MAX_PARALLEL", "2")),
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "3")),
+        reset_after_s=float(os.getenv("LLM_BREAKER_RESET_S", "30")),
+    )
+
+
+def _candidates(targets: List[LLMTarget], policy: HedgePolicy) -> List[Tuple[LLMTarget, object, _Health]]:
+    out = []
+    for target in targets:
+        h = _health(target, policy)
+        if h.breaker.state == "open":
+            incr("llm.breaker_open")
+            continue
+        client = get_llm(target.provider, target.model, target.temperature, target.base_url)
+        if client is not None:
+            out.append((target, client, h))
+    return out
+
+
+async def _acandidates(targets: List[LLMTarget], policy: HedgePolicy) -> List[Tuple[LLMTarget, object, _Health]]:
+    out = []
+    for target in targets:
+        h = _health(target, policy)
+        if h.breaker.state == "open":
+            incr("llm.breaker_open")
+            continue
+        client = await aget_llm(target.provider, target.model, target.temperature, target.base_url)
+        if client is not None:
+            out.append((target, client, h))
+    return out
+
+
+def _cached(cache: Optional[AdviceCache], keys: List[AdviceKey]) -> Optional[str]:
+    for key in keys:
+        hit = cache.get(key)
+        if hit is not None:
+            incr("llm.cache_hit")
+            return hit
+    return None
+
+
+def _content(resp) -> str:
+    return getattr(resp, "content", str(resp))
+
+
+class _Outcome:
+    # Whoever claims it first records the request's outcome: the worker when
+    # the call returns, or hedged_advice when it gives up at the timeout
+    def __init__(self):
+        self._claimed = False
+        self._lock = threading.Lock()
+
+    def claim(self) -> bool:
+        with self._lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            return True
+
+
+def _invoke(client, prompt: str, h: _Health, outcome: _Outcome) -> str:
+    started = time.perf_counter()
+    try:
+        advice = _content(client.invoke(prompt))
+    except Exception:
+        if outcome.claim():
+            h.stats.add_failure()
+            h.breaker.record_failure()
+        raise
+    if outcome.claim():
+        h.stats.add(time.perf_counter() - started)
+        h.breaker.record_success()
+    return advice
+
+
+def hedged_advice(
+    data: SymptomInput,
+    triage: TriageResult,
+    targets: List[LLMTarget],
+    lang: str = "ru",
+    cache: Optional[AdviceCache] = None,
+    policy: Optional[HedgePolicy] = None,
+    report: Optional[Dict] = None,
+) -> Optional[str]:
+    policy = policy or policy_from_env()
+    keys = [make_advice_key(data, triage, t.provider, t.model, t.temperature, lang) for t in targets] if cache is not None else []
+    if keys:
+        hit = _cached(cache, keys)
+        if hit is not None:
+            return hit
+    candidates = _candidates(targets, policy)
+    if not candidates:
+        return None
+
+    rendered = prepare_prompt(data, triage, lang)
+    if report is not None:
+        report.update(rendered.info())
+    prompt = rendered.text
+    pool = _pool()
+    started = time.monotonic()
+    primary_stats = candidates[0][2].stats
+    pending: Dict[Future, Tuple[LLMTarget, _Health, float, _Outcome]] = {}
+    next_idx = 0
+    last_error: Optional[str] = None
+
+    def launch() -> None:
+        # Half-open breakers admit a single trial request; skip targets that refuse
+        nonlocal next_idx
+        while next_idx < len(candidates):
+            target, client, h = candidates[next_idx]
+            next_idx += 1
+            if not h.breaker.allow():
+                continue
+            if pending:
+                incr("llm.hedge_fired")
+            elif next_idx > 1:
+                incr("llm.failover")
+            outcome = _Outcome()
+            pending[pool.submit(_invoke, client, prompt, h, outcome)] = (target, h, time.monotonic() + target.timeout_s, outcome)
+            return
+
+    launch()
+    next_hedge = started + policy.hedge_delay(primary_stats)
+    while pending:
+        now = time.monotonic()
+        can_hedge = next_idx < len(candidates) and len(pending) < policy.max_parallel
+        wake = min(d for _, _, d, _ in pending.values())
+        if can_hedge:
+            wake = min(wake, next_hedge)
+        done, _ = wait(list(pending), timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+        for fut in done:
+            target, h, _, _ = pending.pop(fut)
+            try:
+                advice = fut.result()
+            except Exception as e:
+                last_error = f"LLM error: {str(e)}"
+                continue
+            for loser, (_, loser_h, _, loser_outcome) in pending.items():
+                # A loser that never started would otherwise hold a half-open trial
+                if loser.cancel() and loser_outcome.claim():
+                    loser_h.breaker.release_trial()
+            observe("llm.hedged", time.monotonic() - started)
+            if target is not candidates[0][0]:
+                incr("llm.hedge_won")
+            if keys and advice:
+                cache.put(keys[targets.index(target)], advice)
+            return advice
+        now = time.monotonic()
+        for fut, (target, h, deadline, outcome) in list(pending.items()):
+            # A request that claimed its outcome first has just finished and
+            # is picked up by the next wait()
+            if now >= deadline and outcome.claim():
+                # Abandoned; the thread finishes on its own without recording anything
+                pending.pop(fut)
+                fut.cancel()
+                h.stats.add_failure(timeout=True)
+                h.breaker.record_failure()
+                last_error = f"LLM error: {target.provider} timed out after {target.timeout_s:.1f}s"
+        if next_idx < len(candidates) and len(pending) < policy.max_parallel and (now >= next_hedge or not pending):
+            launch()
+            next_hedge = now + policy.hedge_delay(primary_stats)
+    incr("llm.error")
+    return last_error
+
+
+async def _ainvoke(client, prompt: str, h: _Health, timeout_s: float) -> str:
+    started = time.perf_counter()
+    try:
+        advice = _content(await asyncio.wait_for(client.ainvoke(prompt), timeout_s))
+    except asyncio.CancelledError:
+        # Lost the hedge (or the caller gave up); nothing to record
+        h.breaker.release_trial()
+        raise
+    except asyncio.TimeoutError:
+        h.stats.add_failure(timeout=True)
+        h.breaker.record_failure()
+        raise
+    except Exception:
+        h.stats.add_failure()
+        h.breaker.record_failure()
+        raise
+    h.stats.add(time.perf_counter() - started)
+    h.breaker.record_success()
+    return advice
+
+
+async def ahedged_advice(
+    data: SymptomInput,
+    triage: TriageResult,
+    targets: List[LLMTarget],
+    lang: str = "ru",
+    cache: Optional[AdviceCache] = None,
+    policy: Optional[HedgePolicy] = None,
+    report: Optional[Dict] = None,
+) -> Optional[str]:
+    policy = policy or policy_from_env()
+    keys = [make_advice_key(data, triage, t.provider, t.model, t.temperature, lang) for t in targets] if cache is not None else []
+    if keys:
+        hit = _cached(cache, keys)
+        if hit is not None:
+            return hit
+    candidates = await _acandidates(targets, policy)
+    if not candidates:
+        return None
+
+    rendered = prepare_prompt(data, triage, lang)
+    if report is not None:
+        report.update(rendered.info())
+    prompt = rendered.text
+    started = time.monotonic()
+    primary_stats = candidates[0][2].stats
+    pending: Dict[asyncio.Task, LLMTarget] = {}
+    next_idx = 0
+    last_error: Optional[str] = None
+
+    def launch() -> None:
+        nonlocal next_idx
+        while next_idx < len(candidates):
+            target, client, h = candidates[next_idx]
+            next_idx += 1
+            if not h.breaker.allow():
+                continue
+            if pending:
+                incr("llm.hedge_fired")
+            elif next_idx > 1:
+                incr("llm.failover")
+            pending[asyncio.ensure_future(_ainvoke(client, prompt, h, target.timeout_s))] = target
+            return
+
+    launch()
+    try:
+        while pending:
+            can_hedge = next_idx < len(candidates) and len(pending) < policy.max_parallel
+            timeout = policy.hedge_delay(primary_stats) if can_hedge else None
+            done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                target = pending.pop(task)
+                try:
+                    advice = task.result()
+                except asyncio.TimeoutError:
+                    last_error = f"LLM error: {target.provider} timed out after {target.timeout_s:.1f}s"
+                    continue
+                except Exception as e:
+                    last_error = f"LLM error: {str(e)}"
+                    continue
+                observe("llm.hedged", time.monotonic() - started)
+                if target is not candidates[0][0]:
+                    incr("llm.hedge_won")
+                if keys and advice:
+                    cache.put(keys[targets.index(target)], advice)
+                return advice
+            # Hedge delay elapsed, or a request failed: start the next target
+            if next_idx < len(candidates) and len(pending) < policy.max_parallel:
+                launch()
+    finally:
+        for task in pending:
+            task.cancel()
+    incr("llm.error")
+    return last_error
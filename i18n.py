@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from models import TriageResult, ConditionHypothesis
+from metrics import span
+from triage import FALLBACK_CONFIDENCE, RISK_LEVELS, CompactTriage, CompiledRules, get_compiled_rules
 
 
 UI_TEXT: Dict[str, Dict[str, str]] = {
@@ -66,6 +68,24 @@ UI_TEXT: Dict[str, Dict[str, str]] = {
     "analyze_help": {"ru": "Запустить анализ и сгенерировать рекомендации", "en": "Run analysis and generate recommendations"},
     "triage_desc": {"ru": "Эвристический триаж: предварительная оценка по правилам", "en": "Heuristic triage: preliminary rule-based assessment"},
     "ai_reco_desc": {"ru": "Пояснения и советы, сформированные языковой моделью", "en": "Explanations and advice generated by the language model"},
+    "live_preview": {
+        "ru": "Предварительно: риск — {risk}; вероятно: {conditions}",
+        "en": "Preview: {risk} risk; likely {conditions}",
+    },
+    "llm_skipped_urgent": {
+        "ru": "Рекомендации ИИ не запрашивались: при тревожных симптомах важнее сразу обратиться за помощью.",
+        "en": "AI recommendations were not requested: with red-flag symptoms, getting help comes first.",
+    },
+    "llm_cached": {"ru": "Ответ взят из кэша рекомендаций", "en": "Served from the advice cache"},
+    "llm_timing": {"ru": "Первый токен: {ttft:.2f} с · всего: {total:.2f} с", "en": "First token: {ttft:.2f}s · total: {total:.2f}s"},
+    "debug_panel": {"ru": "Показывать тайминги по этапам", "en": "Show per-stage timings"},
+    "debug_panel_help": {"ru": "Показывает, на что ушло время запроса", "en": "Shows where the request time went"},
+    "debug_breakdown": {"ru": "Тайминги запроса", "en": "Request timings"},
+    "debug_total": {"ru": "Всего: {total:.1f} мс", "en": "Total: {total:.1f} ms"},
+    "debug_prompt": {"ru": "Промпт: ~{tokens} токенов ({chars} символов), бюджет {budget}, сокращено: {trimmed}", "en": "Prompt: ~{tokens} tokens ({chars} chars), budget {budget}, trimmed: {trimmed}"},
+    "clear_cache": {"ru": "Очистить кэши", "en": "Clear caches"},
+    "clear_cache_help": {"ru": "Сбрасывает кэш триажа, FAQ, рекомендаций и клиентов LLM", "en": "Drops cached triage, FAQ and advice results and LLM clients"},
+    "cache_cleared": {"ru": "Кэши очищены", "en": "Caches cleared"},
 }
 
 # Placeholders
@@ -242,6 +262,14 @@ PHRASE_RU_EN = {
 }
 
 
+# Risk labels per language, indexed by the risk code used in CompactTriage
+RISK_TABLES: Dict[str, Tuple[str, ...]] = {
+    lang: tuple(names.get(level, level) for level in RISK_LEVELS) for lang, names in RISK_MAP.items()
+}
+# Condition names take precedence over phrases if a string appears in both
+_DISPLAY_RU_EN: Dict[str, str] = {**PHRASE_RU_EN, **CONDITION_RU_EN}
+
+
 def t(key: str, lang: str) -> str:
     return UI_TEXT.get(key, {}).get(lang, UI_TEXT.get(key, {}).get("en", key))
 
@@ -258,18 +286,44 @@ def translate_list(items: List[str], lang: str) -> List[str]:
     return [PHRASE_RU_EN.get(x, x) for x in items]
 
 
+def string_table(rules: CompiledRules, lang: str) -> Tuple[str, ...]:
+    # Display strings for every id in rules.vocab, built once per language
+    table = rules.string_tables.get(lang)
+    if table is None:
+        table = tuple(rules.vocab) if lang == "ru" else tuple(_DISPLAY_RU_EN.get(x, x) for x in rules.vocab)
+        rules.string_tables[lang] = table
+    return table
+
+
+def localize_compact(ct: CompactTriage, lang: str, rules: Optional[CompiledRules] = None) -> Dict:
+    # Same shape as localize_triage, computed with index lookups only
+    with span("i18n.localize"):
+        rules = rules or get_compiled_rules()
+        table = string_table(rules, lang)
+        conditions = [
+            {"condition": table[c], "confidence": p} for c, p in zip(ct.conditions, ct.confidences)
+        ] or [{"condition": table[rules.fallback_condition], "confidence": FALLBACK_CONFIDENCE}]
+        return {
+            "risk_level": RISK_TABLES.get(lang, RISK_TABLES["en"])[ct.risk],
+            "possible_conditions": conditions,
+            "self_care_advice": [table[i] for i in rules.self_care(ct.risk)],
+            "doctor_questions": [table[i] for i in ct.questions],
+        }
+
+
 def localize_triage(tr: TriageResult, lang: str) -> Dict:
-    return {
-        "risk_level": RISK_MAP.get(lang, RISK_MAP["en"]).get(tr.risk_level, tr.risk_level),
-        "possible_conditions": [
-            {
-                "condition": translate_condition(h.condition, lang),
-                "confidence": h.confidence,
-            }
-            for h in tr.possible_conditions
-        ],
-        "self_care_advice": translate_list(tr.self_care_advice, lang),
-        "doctor_questions": translate_list(tr.doctor_questions, lang),
-    }
+    with span("i18n.localize"):
+        return {
+            "risk_level": RISK_MAP.get(lang, RISK_MAP["en"]).get(tr.risk_level, tr.risk_level),
+            "possible_conditions": [
+                {
+                    "condition": translate_condition(h.condition, lang),
+                    "confidence": h.confidence,
+                }
+                for h in tr.possible_conditions
+            ],
+            "self_care_advice": translate_list(tr.self_care_advice, lang),
+            "doctor_questions": translate_list(tr.doctor_questions, lang),
+        }
 
 
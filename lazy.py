@@ -0,0 +1,33 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import Dict, Optional
+
+
+# Heavy optional dependencies (provider SDKs, numpy, sentence-transformers)
+# are imported on first use rather than at module load, so a process only pays
+# for what it actually calls. warmup.preload() imports them up front where a
+# fast first request matters more than a fast start.
+
+_MODULES: Dict[str, Optional[ModuleType]] = {}
+_LOCK = threading.Lock()
+
+
+def optional_module(name: str) -> Optional[ModuleType]:
+    # The imported module, or None if it (or a dependency) is not installed
+    try:
+        return _MODULES[name]
+    except KeyError:
+        pass
+    with _LOCK:
+        if name not in _MODULES:
+            try:
+                _MODULES[name] = importlib.import_module(name)
+            except Exception:
+                _MODULES[name] = None
+        return _MODULES[name]
+
+
+def loaded() -> Dict[str, bool]:
+    # Which optional modules were requested so far, and whether they imported
+    return {name: mod is not None for name, mod in _MODULES.items()}
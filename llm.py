@@ -1,61 +1,405 @@
+import asyncio
 import os
-from typing import Optional
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
-try:
-    from langchain_openai import ChatOpenAI
-except Exception:
-    ChatOpenAI = None  # type: ignore
+from advice_cache import AdviceCache, AdviceKey, make_advice_key
+from lazy import optional_module
+from metrics import incr, observe, span
+from models import SymptomInput, TriageResult
+from prompts import RenderedPrompt, render_prompt
 
-try:
-    from langchain_ollama import ChatOllama
-except Exception:
-    ChatOllama = None  # type: ignore
 
-from models import SymptomInput, TriageResult
+def _base_url(provider: str) -> Optional[str]:
+    if provider == "OpenAI":
+        return os.getenv("OPENAI_BASE_URL") or None
+    return os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+
+# Provider SDK per provider name. They are imported on first use: importing
+# langchain_openai alone takes over a second, and a process usually talks to
+# one provider at most.
+PROVIDER_MODULES = {"OpenAI": ("langchain_openai", "ChatOpenAI"), "Ollama": ("langchain_ollama", "ChatOllama")}
 
 
-def make_llm(provider: str, model: str, temperature: float):
-    if provider == "OpenAI" and ChatOpenAI is not None and os.getenv("OPENAI_API_KEY"):
-        return ChatOpenAI(model=model, temperature=temperature, api_key=os.getenv("OPENAI_API_KEY"))
-    if provider == "Ollama" and ChatOllama is not None:
-        base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-        return ChatOllama(model=model, base_url=base_url, temperature=temperature)
+def chat_class(provider: str):
+    # The LangChain chat model class for ``provider``, or None if its SDK is not installed
+    module_name, class_name = PROVIDER_MODULES.get(provider, ("", ""))
+    module = optional_module(module_name) if module_name else None
+    return getattr(module, class_name, None) if module is not None else None
+
+
+def make_llm(provider: str, model: str, temperature: float, base_url: Optional[str] = None):
+    # ``base_url`` overrides the provider's endpoint from the environment
+    base_url = base_url or _base_url(provider)
+    if provider == "OpenAI" and os.getenv("OPENAI_API_KEY"):
+        ChatOpenAI = chat_class(provider)
+        if ChatOpenAI is not None:
+            extra = {"base_url": base_url} if base_url else {}
+            return ChatOpenAI(model=model, temperature=temperature, api_key=os.getenv("OPENAI_API_KEY"), **extra)
+    if provider == "Ollama":
+        ChatOllama = chat_class(provider)
+        if ChatOllama is not None:
+            return ChatOllama(model=model, base_url=base_url, temperature=temperature)
     return None
 
 
-def generate_advice(data: SymptomInput, triage: TriageResult, provider: str, openai_model: str, ollama_model: str, temperature: float, lang: str = "ru") -> Optional[str]:
-    llm = make_llm(provider, openai_model if provider == "OpenAI" else ollama_model, temperature)
+# Process-wide registry of chat clients so their HTTP connection pools
+# (keep-alive, TLS sessions) are reused across requests.
+_CLIENTS: Dict[Tuple[str, str, Optional[str], float], object] = {}
+_CLIENTS_LOCK = threading.Lock()
+# One lock per client key: building a client (and importing its SDK) only
+# holds up callers asking for that same client
+_CREATE_LOCKS: Dict[Tuple[str, str, Optional[str], float], threading.Lock] = {}
+_CLIENT_STATS = {"created": 0, "reused": 0, "unavailable": 0}
+
+
+def _client_key(provider: str, model: str, temperature: float, base_url: Optional[str] = None) -> Tuple[str, str, Optional[str], float]:
+    return (provider, model, base_url or _base_url(provider), round(float(temperature), 3))
+
+
+def get_llm(provider: str, model: str, temperature: float, base_url: Optional[str] = None):
+    key = _client_key(provider, model, temperature, base_url)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is not None:
+            _CLIENT_STATS["reused"] += 1
+            return client
+        create_lock = _CREATE_LOCKS.setdefault(key, threading.Lock())
+    with create_lock:
+        with _CLIENTS_LOCK:
+            # Built by another caller while this one waited
+            client = _CLIENTS.get(key)
+            if client is not None:
+                _CLIENT_STATS["reused"] += 1
+                return client
+        with span("llm.client_create"):
+            client = make_llm(provider, model, temperature, base_url)
+        with _CLIENTS_LOCK:
+            if client is None:
+                _CLIENT_STATS["unavailable"] += 1
+                return None
+            _CLIENTS[key] = client
+            _CLIENT_STATS["created"] += 1
+        return client
+
+
+# Its own threads keep callers waiting on a first SDK import from filling
+# the default executor
+_CLIENT_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm-client")
+
+
+async def aget_llm(provider: str, model: str, temperature: float, base_url: Optional[str] = None):
+    # A new client may import its provider SDK first (about a second), which
+    # must not stall the event loop; existing clients are returned inline.
+    if _client_key(provider, model, temperature, base_url) in _CLIENTS:
+        return get_llm(provider, model, temperature, base_url)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_CLIENT_EXECUTOR, get_llm, provider, model, temperature, base_url)
+
+
+def warm_up(provider: str, model: str, temperature: float, ping: bool = False) -> bool:
+    # Creates (or reuses) the client up front; ``ping`` also sends a tiny
+    # request so the connection pool holds an open keep-alive connection.
+    client = get_llm(provider, model, temperature)
+    if client is None:
+        return False
+    if ping:
+        try:
+            client.invoke("ping")
+        except Exception:
+            return False
+    return True
+
+
+def client_stats() -> Dict[str, int]:
+    with _CLIENTS_LOCK:
+        return dict(_CLIENT_STATS, clients=len(_CLIENTS))
+
+
+def reset_clients() -> None:
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
+
+
+# Request coalescing: completions for the same client that arrive within
+# ``max_wait_s`` of each other (or until ``max_batch`` are queued) go out
+# together through the model's batch() with all prompts in parallel, which
+# lets a self-hosted Ollama (OLLAMA_NUM_PARALLEL) decode them in one batch
+# instead of one after another. An identical prompt that is already queued or
+# in flight shares its future instead of being sent again. One dispatcher
+# thread serves both thread and asyncio callers (asubmit wraps the future).
+class AdviceBatcher:
+    def __init__(self, max_batch: int = 8, max_wait_s: float = 0.02, threads: int = 4):
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max_wait_s
+        self._cond = threading.Condition()
+        self._queues: Dict[Tuple, List[Tuple[str, float]]] = {}
+        self._clients: Dict[Tuple, object] = {}
+        self._pending: Dict[Tuple[Tuple, str], Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="llm-batch")
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"requests": 0, "deduplicated": 0, "batches": 0, "batched_prompts": 0}
+
+    def submit(self, key: Tuple, llm, prompt: str) -> Future:
+        # ``key`` identifies the client (see _client_key); resolves to the response text
+        with self._cond:
+            self._stats["requests"] += 1
+            fut = self._pending.get((key, prompt))
+            if fut is not None:
+                self._stats["deduplicated"] += 1
+                incr("llm.batch_dedup")
+                return fut
+            fut = Future()
+            self._pending[(key, prompt)] = fut
+            self._clients[key] = llm
+            self._queues.setdefault(key, []).append((prompt, time.monotonic()))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return fut
+
+    async def asubmit(self, key: Tuple, llm, prompt: str) -> str:
+        return await asyncio.wrap_future(self.submit(key, llm, prompt))
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                ready: List[Tuple[Tuple, object, List[str]]] = []
+                wake: Optional[float] = None
+                for key, queue in list(self._queues.items()):
+                    deadline = queue[0][1] + self.max_wait_s
+                    if len(queue) >= self.max_batch or now >= deadline:
+                        ready.append((key, self._clients[key], [p for p, _ in queue[: self.max_batch]]))
+                        del queue[: self.max_batch]
+                        if not queue:
+                            del self._queues[key]
+                    else:
+                        wake = deadline if wake is None else min(wake, deadline)
+                if not ready:
+                    self._cond.wait(None if wake is None else wake - now)
+                    continue
+            for key, llm, prompts in ready:
+                self._executor.submit(self._dispatch, key, llm, prompts)
+
+    def _dispatch(self, key: Tuple, llm, prompts: List[str]) -> None:
+        try:
+            with span("llm.batch"):
+                results = llm.batch(prompts, config={"max_concurrency": len(prompts)}, return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(prompts)
+        incr("llm.batches")
+        incr("llm.batched_prompts", len(prompts))
+        with self._cond:
+            self._stats["batches"] += 1
+            self._stats["batched_prompts"] += len(prompts)
+            futures = [self._pending.pop((key, p)) for p in prompts]
+        for fut, res in zip(futures, results):
+            if isinstance(res, BaseException):
+                fut.set_exception(res)
+            else:
+                fut.set_result(getattr(res, "content", str(res)))
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            out = dict(self._stats, queued=sum(len(q) for q in self._queues.values()), in_flight=len(self._pending))
+        out["mean_batch"] = out["batched_prompts"] / out["batches"] if out["batches"] else 0.0
+        return out
+
+
+_BATCHER: Optional[AdviceBatcher] = None
+_BATCHER_PID: Optional[int] = None
+_BATCHER_LOCK = threading.Lock()
+
+
+def batching_enabled() -> bool:
+    return os.getenv("LLM_BATCH", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_batcher() -> AdviceBatcher:
+    # One per process (a forked worker does not inherit the dispatcher thread)
+    global _BATCHER, _BATCHER_PID
+    with _BATCHER_LOCK:
+        if _BATCHER is None or _BATCHER_PID != os.getpid():
+            _BATCHER = AdviceBatcher(
+                max_batch=int(os.getenv("LLM_BATCH_MAX", "8")),
+                max_wait_s=float(os.getenv("LLM_BATCH_WAIT_MS", "20")) / 1000.0,
+                threads=int(os.getenv("LLM_BATCH_THREADS", "4")),
+            )
+            _BATCHER_PID = os.getpid()
+        return _BATCHER
+
+
+def llm_timeout_s() -> float:
+    return float(os.getenv("LLM_TIMEOUT_S", "60"))
+
+
+def _batch_timeout_s(batcher: AdviceBatcher) -> float:
+    # A batched prompt waits for the batch window, then for the provider
+    return llm_timeout_s() + batcher.max_wait_s
+
+
+def batcher_stats() -> Optional[Dict[str, float]]:
+    with _BATCHER_LOCK:
+        batcher = _BATCHER if _BATCHER_PID == os.getpid() else None
+    return batcher.stats() if batcher is not None else None
+
+
+def prepare_prompt(data: SymptomInput, triage: TriageResult, lang: str = "ru", budget_tokens: Optional[int] = None) -> RenderedPrompt:
+    # ``budget_tokens`` defaults to LLM_PROMPT_BUDGET_TOKENS (0 = no trimming)
+    rendered = render_prompt(data, triage, lang, budget_tokens)
+    incr("llm.prompts")
+    incr("llm.prompt_tokens", rendered.tokens)
+    if rendered.trimmed:
+        incr("llm.prompt_trimmed")
+    return rendered
+
+
+def build_prompt(data: SymptomInput, triage: TriageResult, lang: str = "ru", budget_tokens: Optional[int] = None) -> str:
+    return prepare_prompt(data, triage, lang, budget_tokens).text
+
+
+def generate_advice(data: SymptomInput, triage: TriageResult, provider: str, openai_model: str, ollama_model: str, temperature: float, lang: str = "ru", cache: Optional[AdviceCache] = None, batch: bool = False, report: Optional[Dict] = None) -> Optional[str]:
+    # ``batch`` routes the completion through the process-wide AdviceBatcher;
+    # ``report`` (a dict) receives the prompt size (see RenderedPrompt.info)
+    model = openai_model if provider == "OpenAI" else ollama_model
+    key = make_advice_key(data, triage, provider, model, temperature, lang) if cache is not None else None
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            incr("llm.cache_hit")
+            return hit
+
+    llm = get_llm(provider, model, temperature)
     if llm is None:
         return None
 
-    symptoms_str = ", ".join(data.symptoms)
-    conds = "; ".join([f"{h.condition} ({h.confidence:.2f})" for h in triage.possible_conditions[:5]])
-    if lang == "ru":
-        prompt = (
-            "Вы — медицинский помощник. На основе введённых симптомов и эвристического триажа сформулируй вежливые и понятные рекомендации на русском. "
-            "Добавь список вопросов врачу. Избегай категоричных диагнозов и укажи, что информация не заменяет визит к врачу.\n\n"
-            f"Симптомы: {symptoms_str}\n"
-            f"Возраст: {data.age or 'не указан'}, Пол: {data.sex or 'не указан'}, Дней: {data.duration_days or 'н/д'}, Тяжесть (1-10): {data.severity_1to10 or 'н/д'}\n"
-            f"Вероятные состояния: {conds}\n"
-            f"Базовые советы: {'; '.join(triage.self_care_advice)}\n"
-            f"Вопросы врачу: {'; '.join(triage.doctor_questions)}\n"
-            "Сформируй ответ в 2-4 абзацах и маркированном списке вопросов."
-        )
-    else:
-        prompt = (
-            "You are a medical assistant. Based on the entered symptoms and heuristic triage, provide polite and clear recommendations in English. "
-            "Add questions to ask a doctor. Avoid definitive diagnoses and state that this is not a substitute for medical care.\n\n"
-            f"Symptoms: {symptoms_str}\n"
-            f"Age: {data.age or 'n/a'}, Sex: {data.sex or 'n/a'}, Days: {data.duration_days or 'n/a'}, Severity (1-10): {data.severity_1to10 or 'n/a'}\n"
-            f"Likely conditions: {conds}\n"
-            f"Baseline self-care: {'; '.join(triage.self_care_advice)}\n"
-            f"Doctor questions: {'; '.join(triage.doctor_questions)}\n"
-            "Respond in 2–4 short paragraphs and a bulleted list of questions."
-        )
+    rendered = prepare_prompt(data, triage, lang)
+    if report is not None:
+        report.update(rendered.info())
+    prompt = rendered.text
     try:
-        resp = llm.invoke(prompt)
-        return getattr(resp, "content", str(resp))
+        with span("llm.completion"):
+            if batch:
+                batcher = get_batcher()
+                advice = batcher.submit(_client_key(provider, model, temperature), llm, prompt).result(timeout=_batch_timeout_s(batcher))
+            else:
+                resp = llm.invoke(prompt)
+                advice = getattr(resp, "content", str(resp))
+    except TimeoutError:
+        # A stalled batch must not hold the caller forever (the server answers 504)
+        incr("llm.timeout")
+        raise
     except Exception as e:
+        incr("llm.error")
         return f"LLM error: {str(e)}"
+    if key is not None and advice:
+        cache.put(key, advice)
+    return advice
+
 
+async def agenerate_advice(data: SymptomInput, triage: TriageResult, provider: str, openai_model: str, ollama_model: str, temperature: float, lang: str = "ru", cache: Optional[AdviceCache] = None, batch: bool = False, report: Optional[Dict] = None) -> Optional[str]:
+    model = openai_model if provider == "OpenAI" else ollama_model
+    key = make_advice_key(data, triage, provider, model, temperature, lang) if cache is not None else None
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            incr("llm.cache_hit")
+            return hit
 
+    llm = await aget_llm(provider, model, temperature)
+    if llm is None:
+        return None
+
+    rendered = prepare_prompt(data, triage, lang)
+    if report is not None:
+        report.update(rendered.info())
+    prompt = rendered.text
+    try:
+        with span("llm.completion"):
+            if batch:
+                batcher = get_batcher()
+                # Shielded: the batch future may be shared with identical prompts
+                submitted = batcher.asubmit(_client_key(provider, model, temperature), llm, prompt)
+                advice = await asyncio.wait_for(asyncio.shield(submitted), _batch_timeout_s(batcher))
+            else:
+                resp = await llm.ainvoke(prompt)
+                advice = getattr(resp, "content", str(resp))
+    except TimeoutError:
+        incr("llm.timeout")
+        raise
+    except Exception as e:
+        incr("llm.error")
+        return f"LLM error: {str(e)}"
+    if key is not None and advice:
+        cache.put(key, advice)
+    return advice
+
+
+class AdviceStream:
+    # Iterates over text chunks as the chat model produces them and records
+    # time-to-first-token / total time (seconds) once the chunks arrive.
+    # A stream built from a cache hit yields the stored text as one chunk.
+    def __init__(self, llm, prompt: str, cache: Optional[AdviceCache] = None, cache_key: Optional[AdviceKey] = None, cached: Optional[str] = None, prompt_info: Optional[Dict] = None):
+        self.llm = llm
+        self.prompt = prompt
+        self.prompt_info = prompt_info
+        self.cache = cache
+        self.cache_key = cache_key
+        self.from_cache = cached is not None
+        self.chunks: List[str] = [cached] if cached is not None else []
+        self.first_token_s: Optional[float] = 0.0 if cached is not None else None
+        self.total_s: Optional[float] = 0.0 if cached is not None else None
+        self.error: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def __iter__(self) -> Iterator[str]:
+        if self.from_cache:
+            yield from self.chunks
+            return
+        started = time.perf_counter()
+        try:
+            for chunk in self.llm.stream(self.prompt):
+                piece = getattr(chunk, "content", chunk)
+                if not isinstance(piece, str) or not piece:
+                    continue
+                if self.first_token_s is None:
+                    self.first_token_s = time.perf_counter() - started
+                    observe("llm.ttft", self.first_token_s)
+                self.chunks.append(piece)
+                yield piece
+        except Exception as e:
+            incr("llm.error")
+            self.error = f"LLM error: {str(e)}"
+            self.chunks.append(self.error)
+            yield self.error
+        finally:
+            self.total_s = time.perf_counter() - started
+            observe("llm.completion", self.total_s)
+        if self.cache is not None and self.cache_key is not None and self.error is None and self.chunks:
+            self.cache.put(self.cache_key, self.text)
+
+
+def stream_advice(data: SymptomInput, triage: TriageResult, provider: str, openai_model: str, ollama_model: str, temperature: float, lang: str = "ru", llm=None, cache: Optional[AdviceCache] = None) -> Optional[AdviceStream]:
+    # ``llm`` lets callers pass any LangChain chat model (e.g. a fake one in tests)
+    model = openai_model if provider == "OpenAI" else ollama_model
+    rendered = prepare_prompt(data, triage, lang)
+    prompt = rendered.text
+    key = make_advice_key(data, triage, provider, model, temperature, lang) if cache is not None else None
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            incr("llm.cache_hit")
+            return AdviceStream(llm, prompt, cached=hit, prompt_info=rendered.info())
+    if llm is None:
+        llm = get_llm(provider, model, temperature)
+    if llm is None:
+        return None
+    return AdviceStream(llm, prompt, cache=cache, cache_key=key, prompt_info=rendered.info())
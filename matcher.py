@@ -0,0 +1,204 @@
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+
+# Multi-pattern substring matcher (Aho–Corasick automaton).
+# Patterns get integer ids in insertion order; scanning a text costs
+# O(len(text) + matches) regardless of how many patterns were added.
+class AhoCorasick:
+    def __init__(self, patterns: Iterable[str] = ()):
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._own: List[Tuple[int, ...]] = [()]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._built = False
+        for p in patterns:
+            self.add(p)
+        self.build()
+
+    def add(self, pattern: str) -> int:
+        pid = len(self.patterns)
+        self.patterns.append(pattern)
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append(())
+            state = nxt
+        self._own[state] += (pid,)
+        self._built = False
+        return pid
+
+    def build(self) -> None:
+        goto, fail = self._goto, self._fail
+        out = self._out = list(self._own)
+        queue = deque()
+        for nxt in goto[0].values():
+            fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] += out[fail[nxt]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        for pid in out[0]:
+            yield 0, pid
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pid in out[state]:
+                yield i + 1, pid
+
+    def find(self, text: str) -> Set[int]:
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[int] = set(out[0])
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def exact(self, text: str) -> Optional[int]:
+        # Id of a pattern equal to ``text`` (first one added), or None
+        state = 0
+        for ch in text:
+            state = self._goto[state].get(ch)
+            if state is None:
+                return None
+        own = self._own[state]
+        return own[0] if own else None
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def to_arrays(self) -> Dict[str, array]:
+        # Flat uint32 arrays (CSR per state, edges sorted by code point) that
+        # FrozenAhoCorasick can run on directly, e.g. from an mmap-ed file.
+        if not self._built:
+            self.build()
+        out: Dict[str, array] = {name: array("I") for name in ("edge_ptr", "edge_chr", "edge_nxt", "fail", "out_ptr", "out", "own_ptr", "own")}
+        for name in ("edge_ptr", "out_ptr", "own_ptr"):
+            out[name].append(0)
+        for state, edges in enumerate(self._goto):
+            for ch, nxt in sorted(edges.items()):
+                out["edge_chr"].append(ord(ch))
+                out["edge_nxt"].append(nxt)
+            out["edge_ptr"].append(len(out["edge_chr"]))
+            out["fail"].append(self._fail[state])
+            out["out"].extend(self._out[state])
+            out["out_ptr"].append(len(out["out"]))
+            out["own"].extend(self._own[state])
+            out["own_ptr"].append(len(out["own"]))
+        return out
+
+
+class FrozenAhoCorasick:
+    # Read-only automaton over the arrays produced by AhoCorasick.to_arrays.
+    # Works on any uint32 sequences (array, memoryview over mmap), so worker
+    # processes can share the pages of a compiled rule pack.
+    def __init__(self, arrays: Dict[str, Sequence[int]]):
+        self._edge_ptr = arrays["edge_ptr"]
+        self._edge_chr = arrays["edge_chr"]
+        self._edge_nxt = arrays["edge_nxt"]
+        self._fail = arrays["fail"]
+        self._out_ptr = arrays["out_ptr"]
+        self._out = arrays["out"]
+        self._own_ptr = arrays["own_ptr"]
+        self._own = arrays["own"]
+        # Transitions and outputs resolved while scanning, keyed by character.
+        # Private to the process and bounded by states x alphabet.
+        self._delta: Dict[Tuple[int, str], int] = {}
+        self._goto: Dict[Tuple[int, str], int] = {}
+        self._outputs: Dict[int, Tuple[int, ...]] = {}
+
+    def _next(self, state: int, ch: str) -> int:
+        key = (state, ch)
+        nxt = self._goto.get(key)
+        if nxt is None:
+            code = ord(ch)
+            lo, hi = self._edge_ptr[state], self._edge_ptr[state + 1]
+            i = bisect_left(self._edge_chr, code, lo, hi)
+            nxt = self._edge_nxt[i] if i < hi and self._edge_chr[i] == code else -1
+            self._goto[key] = nxt
+        return nxt
+
+    def _step(self, state: int, ch: str) -> int:
+        key = (state, ch)
+        nxt = self._delta.get(key)
+        if nxt is None:
+            s = state
+            while True:
+                nxt = self._next(s, ch)
+                if nxt >= 0:
+                    break
+                if s == 0:
+                    nxt = 0
+                    break
+                s = self._fail[s]
+            self._delta[key] = nxt
+        return nxt
+
+    def _out_of(self, state: int) -> Tuple[int, ...]:
+        out = self._outputs.get(state)
+        if out is None:
+            out = self._outputs[state] = tuple(self._out[self._out_ptr[state]:self._out_ptr[state + 1]])
+        return out
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        for pid in self._out_of(0):
+            yield 0, pid
+        state = 0
+        for i, ch in enumerate(text):
+            state = self._step(state, ch)
+            for pid in self._out_of(state):
+                yield i + 1, pid
+
+    def find(self, text: str) -> Set[int]:
+        delta, outputs = self._delta, self._outputs
+        found: Set[int] = set(self._out_of(0))
+        state = 0
+        for ch in text:
+            nxt = delta.get((state, ch))
+            state = self._step(state, ch) if nxt is None else nxt
+            out = outputs.get(state)
+            if out is None:
+                out = self._out_of(state)
+            if out:
+                found.update(out)
+        return found
+
+    def exact(self, text: str) -> Optional[int]:
+        state = 0
+        for ch in text:
+            state = self._next(state, ch)
+            if state < 0:
+                return None
+        lo, hi = self._own_ptr[state], self._own_ptr[state + 1]
+        return self._own[lo] if lo != hi else None
+
+    def __len__(self) -> int:
+        return len(self._own)
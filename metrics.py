@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Lightweight in-process instrumentation: timed spans feed per-stage
+# histograms, counters count events. Both are exported as Prometheus text or
+# JSON. Disabled by default (METRICS_ENABLED=1 or enable() turns it on); when
+# disabled span() returns a shared no-op and observe()/incr() return at once.
+#
+# trace() additionally collects the stages of the current request (per
+# contextvar, so concurrent requests and asyncio tasks do not mix). A trace
+# records its stages whether or not the process-wide metrics are enabled.
+
+PROMETHEUS_PREFIX = "medassist"
+BUCKETS_S: Tuple[float, ...] = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = os.getenv("METRICS_ENABLED", "").strip().lower() in ("1", "true", "yes", "on")
+_LOCK = threading.Lock()
+_TRACE: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("metrics_trace", default=None)
+
+
+class _Histogram:
+    __slots__ = ("count", "total", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS_S) + 1)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.buckets[bisect_left(BUCKETS_S, seconds)] += 1
+
+
+_HISTOGRAMS: Dict[str, _Histogram] = {}
+_COUNTERS: Dict[str, float] = {}
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = on
+
+
+def reset() -> None:
+    with _LOCK:
+        _HISTOGRAMS.clear()
+        _COUNTERS.clear()
+
+
+def observe(name: str, seconds: float) -> None:
+    stages = _TRACE.get()
+    if stages is not None:
+        stages.append((name, seconds))
+    if not _enabled:
+        return
+    with _LOCK:
+        hist = _HISTOGRAMS.get(name)
+        if hist is None:
+            hist = _HISTOGRAMS[name] = _Histogram()
+        hist.add(seconds)
+
+
+def incr(name: str, value: float = 1.0) -> None:
+    if not _enabled:
+        return
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0.0) + value
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str):
+    return _Span(name) if _enabled or _TRACE.get() is not None else _NOOP
+
+
+class Trace:
+    # Stages observed while the trace was active, in order
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+        self.started = time.perf_counter()
+        self.total_s: Optional[float] = None
+
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        out: Dict[str, Dict[str, float]] = {}
+        for name, seconds in self.stages:
+            row = out.setdefault(name, {"calls": 0, "total_ms": 0.0})
+            row["calls"] += 1
+            row["total_ms"] += seconds * 1000.0
+        return out
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    t = Trace()
+    token = _TRACE.set(t.stages)
+    try:
+        yield t
+    finally:
+        _TRACE.reset(token)
+        t.total_s = time.perf_counter() - t.started
+
+
+def snapshot() -> Dict:
+    with _LOCK:
+        stages = {
+            name: {
+                "count": h.count,
+                "sum_s": h.total,
+                "mean_ms": h.total / h.count * 1000.0 if h.count else 0.0,
+                "buckets": dict(zip([str(b) for b in BUCKETS_S] + ["+Inf"], h.buckets)),
+            }
+            for name, h in sorted(_HISTOGRAMS.items())
+        }
+        counters = dict(sorted(_COUNTERS.items()))
+    return {"enabled": _enabled, "stages": stages, "counters": counters}
+
+
+def to_json() -> str:
+    return json.dumps(snapshot())
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus() -> str:
+    # Prometheus text exposition format (version 0.0.4)
+    with _LOCK:
+        hists = [(name, h.count, h.total, list(h.buckets)) for name, h in sorted(_HISTOGRAMS.items())]
+        counters = sorted(_COUNTERS.items())
+    metric = f"{PROMETHEUS_PREFIX}_stage_seconds"
+    lines = [f"# HELP {metric} Time spent in instrumented stages.", f"# TYPE {metric} histogram"]
+    for name, count, total, buckets in hists:
+        stage = _label(name)
+        cumulative = 0
+        for le, n in zip([repr(b) for b in BUCKETS_S] + ["+Inf"], buckets):
+            cumulative += n
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{stage="{stage}"}} {total!r}')
+        lines.append(f'{metric}_count{{stage="{stage}"}} {count}')
+    metric = f"{PROMETHEUS_PREFIX}_events_total"
+    lines += [f"# HELP {metric} Instrumented event counts.", f"# TYPE {metric} counter"]
+    for name, value in counters:
+        lines.append(f'{metric}{{event="{_label(name)}"}} {value!r}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,92 @@
+import hashlib
+import random
+from functools import lru_cache
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Set, Tuple
+
+
+# Near-duplicate lookup over token sets (MinHash + banded LSH). A set's
+# signature keeps, for each of ``num_perm`` random hash functions, the smallest
+# hash of its tokens; two sets agree on a signature position with probability
+# equal to their Jaccard similarity. Signatures are cut into ``bands`` of
+# ``num_perm // bands`` rows and each band is a dict key, so a lookup is
+# ``bands`` dict probes whatever the number of indexed sets, and sets sharing
+# any whole band become candidates. The defaults (16 bands of 8 rows) suit
+# thresholds of 0.85 and above: a pair at similarity 0.9 is found with
+# probability 0.9999, at 0.85 with 0.994, while one at 0.5 becomes a candidate
+# with probability 0.06; callers verify candidates with jaccard(). The permuted
+# hashes of each token are memoized, so signing a set of known tokens is an
+# element-wise min over cached vectors.
+
+NUM_PERM = 128
+BANDS = 16
+TOKEN_CACHE_SIZE = 65536
+_PRIME = (1 << 61) - 1
+
+
+def token_hash(token: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little") % _PRIME
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+class MinHashLSH:
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(num_perm)]
+        self._vector = lru_cache(maxsize=TOKEN_CACHE_SIZE)(self._token_vector)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: Dict[Tuple[Hashable, int, int], Set[Hashable]] = {}
+        # Item -> its bucket keys, for remove()
+        self._items: Dict[Hashable, List[Tuple[Hashable, int, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _token_vector(self, token: str) -> Tuple[int, ...]:
+        h = token_hash(token)
+        return tuple((a * h + b) % _PRIME for a, b in self._perms)
+
+    def signature(self, tokens: Iterable[str]) -> Tuple[int, ...]:
+        vectors = [self._vector(t) for t in tokens]
+        if not vectors:
+            raise ValueError("cannot sign an empty token set")
+        return tuple(map(min, zip(*vectors)))
+
+    def _keys(self, tokens: Iterable[str], partition: Hashable) -> List[Tuple[Hashable, int, int]]:
+        # ``partition`` keeps unrelated sets (other model, language...) apart
+        sig, r = self.signature(tokens), self.rows
+        return [(partition, band, hash(sig[band * r:(band + 1) * r])) for band in range(self.bands)]
+
+    def add(self, item: Hashable, tokens: Iterable[str], partition: Hashable = None) -> None:
+        self.remove(item)
+        keys = self._items[item] = self._keys(tokens, partition)
+        for key in keys:
+            self._buckets.setdefault(key, set()).add(item)
+
+    def remove(self, item: Hashable) -> None:
+        for key in self._items.pop(item, ()):
+            bucket = self._buckets[key]
+            bucket.discard(item)
+            if not bucket:
+                del self._buckets[key]
+
+    def candidates(self, tokens: Iterable[str], partition: Hashable = None) -> Set[Hashable]:
+        out: Set[Hashable] = set()
+        for key in self._keys(tokens, partition):
+            bucket = self._buckets.get(key)
+            if bucket:
+                out.update(bucket)
+        return out
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._items.clear()
@@ -1,8 +1,16 @@
-from typing import List, Optional, Literal
-from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Literal
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# Validators are built on first use rather than at import (defer_build), which
+# keeps module load cheap for processes that never validate some of these;
+# warmup.preload() builds them up front.
+LAZY = ConfigDict(defer_build=True)
 
 
 class SymptomInput(BaseModel):
+    model_config = LAZY
+
     age: Optional[int] = Field(None, ge=0, le=120)
     sex: Optional[Literal["male", "female", "other"]] = None
     symptoms: List[str] = Field(default_factory=list)
@@ -12,6 +20,8 @@ class SymptomInput(BaseModel):
 
 
 class ConditionHypothesis(BaseModel):
+    model_config = LAZY
+
     condition: str
     confidence: float = Field(..., ge=0.0, le=1.0)
     rationale: str
@@ -20,6 +30,8 @@ class ConditionHypothesis(BaseModel):
 
 
 class TriageResult(BaseModel):
+    model_config = LAZY
+
     risk_level: Literal["low", "moderate", "high", "emergency"]
     possible_conditions: List[ConditionHypothesis] = Field(default_factory=list)
     self_care_advice: List[str] = Field(default_factory=list)
@@ -27,8 +39,25 @@ class TriageResult(BaseModel):
 
 
 class FAQItem(BaseModel):
+    model_config = LAZY
+
     question: str
     answer: str
     tags: List[str] = Field(default_factory=list)
 
 
+class AnalysisResult(BaseModel):
+    model_config = LAZY
+
+    triage: TriageResult
+    localized: Dict[str, Any] = Field(default_factory=dict)
+    advice: Optional[str] = None
+    faq: List[FAQItem] = Field(default_factory=list)
+    timings: Dict[str, float] = Field(default_factory=dict)
+    # Prompt size as sent to the LLM (chars, estimated tokens, trimmed items); empty on a cache hit
+    prompt: Dict[str, Any] = Field(default_factory=dict)
+    # Precomputed guidance for emergency/high-risk results and the fast-path mode used (see urgent.py)
+    guidance: Optional[str] = None
+    fast_path: Optional[str] = None
+
+
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+from advice_cache import AdviceCache
+from audit import audit
+from faq import search_faq
+from hedging import ahedged_advice, targets_from_env
+from i18n import localize_compact
+from llm import agenerate_advice
+from models import AnalysisResult, FAQItem, SymptomInput, TriageResult
+from triage import CompactTriage, CompiledRules, get_compiled_rules, triage_compact, triage_symptoms
+from metrics import incr, span
+from urgent import fast_path_mode, is_urgent, max_background, urgent_guidance
+
+
+# Async orchestration of one intake: FAQ lookup overlaps with triage and the
+# LLM call, and localization runs while the LLM request is in flight. CPU-bound
+# steps go to the default thread pool, so many sessions can share one event
+# loop without blocking each other. Keep a single long-lived loop per process:
+# async HTTP clients held by llm.get_llm are bound to the loop that first used them.
+#
+# Emergency and high-risk intakes return as soon as triage is done, with the
+# precomputed guidance from urgent.py; in "background" mode the LLM call keeps
+# running on the loop and its answer goes to the advice cache.
+
+# Strong references to background LLM calls until they finish
+_BACKGROUND: Set[asyncio.Task] = set()
+
+
+def _background_done(task: asyncio.Task) -> None:
+    _BACKGROUND.discard(task)
+    # Nobody awaits a background call; a timeout is counted, not raised
+    if not task.cancelled() and task.exception() is not None:
+        incr("urgent.background_error")
+
+
+async def atriage(data: SymptomInput) -> TriageResult:
+    return await asyncio.to_thread(triage_symptoms, data)
+
+
+def _triage(data: SymptomInput) -> Tuple[CompiledRules, CompactTriage, TriageResult]:
+    # The compact result is localized through the string tables of the rule
+    # set that produced it, even if the rules are reloaded in between
+    rules = get_compiled_rules()
+    ct = triage_compact(data, rules)
+    with span("triage.build_result"):
+        return rules, ct, rules.expand(ct)
+
+
+async def asearch_faq(query: str, limit: int = 10, lang: str = "ru") -> List[FAQItem]:
+    return await asyncio.to_thread(search_faq, query, limit, lang)
+
+
+async def _timed(coro, timings: dict, name: str):
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[name] = time.perf_counter() - started
+
+
+def _audit(data: SymptomInput, triage: TriageResult, provider: str, openai_model: str, ollama_model: str, lang: str, fast_path: Optional[str], timings: dict) -> None:
+    model = openai_model if provider == "OpenAI" else ollama_model
+    audit("analyze", data, triage, provider=provider, model=model, lang=lang, fast_path=fast_path, timings=timings)
+
+
+async def analyze(
+    data: SymptomInput,
+    provider: str,
+    openai_model: str,
+    ollama_model: str,
+    temperature: float,
+    lang: str = "en",
+    faq_query: Optional[str] = None,
+    faq_limit: int = 10,
+    cache: Optional[AdviceCache] = None,
+    hedge: bool = False,
+    batch: bool = False,
+    fast_path: Optional[str] = None,
+) -> AnalysisResult:
+    # ``fast_path`` defaults to URGENT_FAST_PATH (background)
+    started = time.perf_counter()
+    timings: dict = {}
+    faq_task = None
+    if faq_query is not None:
+        faq_task = asyncio.create_task(_timed(asearch_faq(faq_query, faq_limit, lang), timings, "faq"))
+
+    rules, compact, triage = await _timed(asyncio.to_thread(_triage, data), timings, "triage")
+    mode = fast_path or fast_path_mode()
+    urgent = mode != "off" and is_urgent(triage)
+    prompt: dict = {}
+    advice_coro = None
+    call_llm = not urgent or (mode == "background" and len(_BACKGROUND) < max_background())
+    if urgent and mode == "background" and not call_llm:
+        incr("urgent.background_dropped")
+    if call_llm:
+        if hedge:
+            targets = targets_from_env(provider, openai_model, ollama_model, temperature)
+            advice_coro = ahedged_advice(data, triage, targets, lang, cache, report=prompt)
+        else:
+            advice_coro = agenerate_advice(data, triage, provider, openai_model, ollama_model, temperature, lang, cache, batch=batch, report=prompt)
+    if urgent:
+        if advice_coro is not None:
+            background = asyncio.create_task(advice_coro)
+            _BACKGROUND.add(background)
+            background.add_done_callback(_background_done)
+        localized = localize_compact(compact, lang, rules)
+        guidance = urgent_guidance(triage, lang)
+        faq_items = await faq_task if faq_task is not None else []
+        timings["total"] = time.perf_counter() - started
+        _audit(data, triage, provider, openai_model, ollama_model, lang, mode, timings)
+        return AnalysisResult(triage=triage, localized=localized, faq=faq_items, timings=timings, guidance=guidance, fast_path=mode)
+    advice_task = asyncio.create_task(_timed(advice_coro, timings, "llm"))
+    # Index lookups only; not worth a thread hop
+    localize_started = time.perf_counter()
+    localized = localize_compact(compact, lang, rules)
+    timings["localize"] = time.perf_counter() - localize_started
+    advice = await advice_task
+    faq_items = await faq_task if faq_task is not None else []
+
+    timings["total"] = time.perf_counter() - started
+    _audit(data, triage, provider, openai_model, ollama_model, lang, None, timings)
+    return AnalysisResult(triage=triage, localized=localized, advice=advice, faq=faq_items, timings=timings, prompt=prompt)
+
+
+async def analyze_many(requests: Iterable[dict], concurrency: int = 32) -> List[AnalysisResult]:
+    # ``requests`` are keyword arguments for analyze(); at most ``concurrency``
+    # sessions are in flight at once.
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(kwargs: dict) -> AnalysisResult:
+        async with sem:
+            return await analyze(**kwargs)
+
+    return await asyncio.gather(*(one(kw) for kw in requests))
+
+
+def run_analysis(data: SymptomInput, **kwargs) -> AnalysisResult:
+    # Blocking entry point for scripts; long-running services should await analyze()
+    return asyncio.run(analyze(data, **kwargs))
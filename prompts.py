@@ -0,0 +1,171 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from models import SymptomInput, TriageResult
+
+
+# Advice prompt templates, compiled once per language. Every prompt starts
+# with the language's static instruction block, so providers that cache
+# prompt prefixes (Ollama's per-slot KV cache, OpenAI prompt caching) reuse
+# it across requests; everything request-specific comes after it.
+#
+# The patient's free-text notes are never sent to the provider. With a token
+# budget, items are dropped from the end of the least important sections
+# (doctor questions, self-care advice, conditions, symptoms) until the
+# estimate fits; each section keeps a minimum. Token counts are estimates
+# (see estimate_tokens), not a provider's tokenizer.
+
+TEMPLATES: Dict[str, Dict[str, str]] = {
+    "ru": {
+        "prefix": (
+            "Вы — медицинский помощник. На основе введённых симптомов и эвристического триажа сформулируй вежливые и понятные рекомендации на русском. "
+            "Добавь список вопросов врачу. Избегай категоричных диагнозов и укажи, что информация не заменяет визит к врачу.\n\n"
+        ),
+        "symptoms": "Симптомы: ",
+        "profile": "Возраст: {age}, Пол: {sex}, Дней: {days}, Тяжесть (1-10): {severity}\n",
+        "unknown": "не указан",
+        "na": "н/д",
+        "conditions": "Вероятные состояния: ",
+        "advice": "Базовые советы: ",
+        "questions": "Вопросы врачу: ",
+        "suffix": "Сформируй ответ в 2-4 абзацах и маркированном списке вопросов.",
+    },
+    "en": {
+        "prefix": (
+            "You are a medical assistant. Based on the entered symptoms and heuristic triage, provide polite and clear recommendations in English. "
+            "Add questions to ask a doctor. Avoid definitive diagnoses and state that this is not a substitute for medical care.\n\n"
+        ),
+        "symptoms": "Symptoms: ",
+        "profile": "Age: {age}, Sex: {sex}, Days: {days}, Severity (1-10): {severity}\n",
+        "unknown": "n/a",
+        "na": "n/a",
+        "conditions": "Likely conditions: ",
+        "advice": "Baseline self-care: ",
+        "questions": "Doctor questions: ",
+        "suffix": "Respond in 2–4 short paragraphs and a bulleted list of questions.",
+    },
+}
+
+# (section, items always kept), trimmed in this order
+TRIM_ORDER: Tuple[Tuple[str, int], ...] = (("questions", 0), ("advice", 1), ("conditions", 1), ("symptoms", 1))
+SEP = "; "
+
+
+def _cost(text: str) -> float:
+    # ~4 characters per token for Latin text, ~2.5 for Cyrillic and other
+    # non-ASCII scripts (BPE vocabularies split them into shorter pieces)
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ascii_chars / 4.0 + (len(text) - ascii_chars) / 2.5
+
+
+def estimate_tokens(text: str) -> int:
+    return int(_cost(text)) + 1
+
+
+def prompt_budget() -> int:
+    # 0 disables trimming
+    return int(os.getenv("LLM_PROMPT_BUDGET_TOKENS", "600"))
+
+
+def _clip(text: str, limit: int) -> str:
+    # One line, at most ``limit`` characters
+    if len(text) <= limit and "\n" not in text:
+        return text
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+class RenderedPrompt:
+    __slots__ = ("text", "prefix_chars", "tokens", "prefix_tokens", "budget", "trimmed")
+
+    def __init__(self, text: str, prefix_chars: int, tokens: int, prefix_tokens: int, budget: int, trimmed: Dict[str, int]):
+        self.text = text
+        self.prefix_chars = prefix_chars
+        self.tokens = tokens
+        self.prefix_tokens = prefix_tokens
+        self.budget = budget
+        self.trimmed = trimmed
+
+    def info(self) -> Dict:
+        return {
+            "chars": len(self.text),
+            "tokens": self.tokens,
+            "prefix_tokens": self.prefix_tokens,
+            "budget": self.budget,
+            "trimmed": dict(self.trimmed),
+        }
+
+
+class PromptTemplate:
+    def __init__(self, spec: Dict[str, str], max_conditions: int = 5, max_item_chars: int = 160):
+        self.prefix = spec["prefix"]
+        self.labels = {name: spec[name] for name in ("symptoms", "conditions", "advice", "questions")}
+        self.suffix = spec["suffix"]
+        self.unknown = spec["unknown"]
+        self.na = spec["na"]
+        self._profile = spec["profile"].format
+        self.max_conditions = max_conditions
+        self.max_item_chars = max_item_chars
+        self.prefix_tokens = estimate_tokens(self.prefix)
+        # Prefix, suffix, labels and line breaks
+        self._static_cost = _cost(self.prefix + self.suffix + "".join(self.labels.values()) + "\n" * 4)
+        self._sep_cost = _cost(SEP)
+
+    def _sections(self, data: SymptomInput, triage: TriageResult) -> Dict[str, List[str]]:
+        limit = self.max_item_chars
+        return {
+            "symptoms": [_clip(s, limit) for s in data.symptoms],
+            "conditions": [f"{h.condition} ({h.confidence:.2f})" for h in triage.possible_conditions[: self.max_conditions]],
+            "advice": [_clip(a, limit) for a in triage.self_care_advice],
+            "questions": [_clip(q, limit) for q in triage.doctor_questions],
+        }
+
+    def render(self, data: SymptomInput, triage: TriageResult, budget_tokens: int = 0) -> RenderedPrompt:
+        sections = self._sections(data, triage)
+        profile = self._profile(
+            age=data.age or self.unknown,
+            sex=data.sex or self.unknown,
+            days=data.duration_days or self.na,
+            severity=data.severity_1to10 or self.na,
+        )
+        trimmed: Dict[str, int] = {}
+        if budget_tokens > 0:
+            costs = {name: [_cost(item) + self._sep_cost for item in items] for name, items in sections.items()}
+            total = self._static_cost + _cost(profile) + sum(sum(c) for c in costs.values()) + 1
+            for name, keep in TRIM_ORDER:
+                items, item_costs = sections[name], costs[name]
+                while total > budget_tokens and len(items) > keep:
+                    items.pop()
+                    total -= item_costs.pop()
+                    trimmed[name] = trimmed.get(name, 0) + 1
+                if total <= budget_tokens:
+                    break
+
+        labels = self.labels
+        parts = [
+            self.prefix,
+            labels["symptoms"], ", ".join(sections["symptoms"]), "\n",
+            profile,
+            labels["conditions"], SEP.join(sections["conditions"]), "\n",
+            labels["advice"], SEP.join(sections["advice"]), "\n",
+            labels["questions"], SEP.join(sections["questions"]), "\n",
+            self.suffix,
+        ]
+        text = "".join(parts)
+        return RenderedPrompt(text, len(self.prefix), estimate_tokens(text), self.prefix_tokens, budget_tokens, trimmed)
+
+
+_COMPILED: Dict[str, PromptTemplate] = {}
+
+
+def get_template(lang: str) -> PromptTemplate:
+    # Languages without a template use English
+    lang = lang if lang in TEMPLATES else "en"
+    template = _COMPILED.get(lang)
+    if template is None:
+        template = _COMPILED[lang] = PromptTemplate(TEMPLATES[lang])
+    return template
+
+
+def render_prompt(data: SymptomInput, triage: TriageResult, lang: str = "ru", budget_tokens: Optional[int] = None) -> RenderedPrompt:
+    return get_template(lang).render(data, triage, prompt_budget() if budget_tokens is None else budget_tokens)
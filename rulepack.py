@@ -0,0 +1,364 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from lazy import optional_module
+from matcher import FrozenAhoCorasick
+from triage import (
+    EMERGENCY_KEYWORDS,
+    SYMPTOM_RULES,
+    SYMPTOM_SYNONYMS_RU_EN,
+    CompiledRules,
+    _IdSpec,
+    install_rules,
+)
+
+
+# Rule packs: triage rules kept outside the code.
+#
+# Source format (JSON or YAML):
+#   {"rules": {"<keyword>": {"conditions": {"<name>": weight}, "actions": [...],
+#              "questions": [...], "red_flags": [...]}},
+#    "synonyms": {"<ru phrase>": "<en keyword>"},
+#    "emergency_keywords": ["chest pain", ...]}
+#
+# ``compile_rule_pack`` turns a source into a binary artifact holding the
+# interned strings, the rule x condition weights and both automata as flat
+# arrays. ``load_rule_pack`` maps it read-only, so loading costs a header parse
+# and worker processes share the pages. Strings and specs are decoded lazily.
+
+PathLike = Union[str, Path]
+
+MAGIC = b"MDRULES1"
+FORMAT_VERSION = 1
+_ALIGN = 8
+_AUTOMATON_ARRAYS = ("edge_ptr", "edge_chr", "edge_nxt", "fail", "out_ptr", "out", "own_ptr", "own")
+
+
+def parse_rule_source(data: Dict) -> Tuple[Dict[str, Dict], Dict[str, str], List[str]]:
+    if not isinstance(data, dict) or not isinstance(data.get("rules"), dict):
+        raise ValueError("rule pack must be an object with a 'rules' mapping")
+    rules: Dict[str, Dict] = {}
+    for keyword, spec in data["rules"].items():
+        if not isinstance(spec, dict) or not isinstance(spec.get("conditions"), dict):
+            raise ValueError(f"rule '{keyword}': 'conditions' must be a mapping of condition -> weight")
+        for cond, w in spec["conditions"].items():
+            if not isinstance(w, int) or isinstance(w, bool):
+                raise ValueError(f"rule '{keyword}': weight of '{cond}' must be an integer")
+        for field in ("actions", "questions", "red_flags"):
+            if not isinstance(spec.get(field, []), list):
+                raise ValueError(f"rule '{keyword}': '{field}' must be a list")
+        rules[str(keyword)] = spec
+    synonyms = data.get("synonyms") or {}
+    if not isinstance(synonyms, dict):
+        raise ValueError("'synonyms' must be a mapping of phrase -> keyword")
+    emergency = data.get("emergency_keywords") or []
+    if not isinstance(emergency, list):
+        raise ValueError("'emergency_keywords' must be a list")
+    return rules, {str(k): str(v) for k, v in synonyms.items()}, [str(x) for x in emergency]
+
+
+def read_rule_source(path: PathLike) -> Tuple[Dict[str, Dict], Dict[str, str], List[str]]:
+    p = Path(path)
+    text = p.read_text(encoding="utf-8")
+    if p.suffix.lower() in (".yaml", ".yml"):
+        yaml = optional_module("yaml")
+        if yaml is None:
+            raise RuntimeError("PyYAML is required for YAML rule packs: pip install pyyaml")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    return parse_rule_source(data)
+
+
+def export_builtin_rules(path: PathLike) -> Path:
+    # Writes the rules bundled in triage.py as a JSON source pack
+    p = Path(path)
+    data = {
+        "rules": SYMPTOM_RULES,
+        "synonyms": SYMPTOM_SYNONYMS_RU_EN,
+        "emergency_keywords": sorted(EMERGENCY_KEYWORDS),
+    }
+    p.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    return p
+
+
+def _csr(rows: Iterable[Iterable[int]], typecode: str = "I") -> Tuple[array, array]:
+    ptr, values = array("I", [0]), array(typecode)
+    for row in rows:
+        values.extend(row)
+        ptr.append(len(values))
+    return ptr, values
+
+
+def pack_rules(rules: CompiledRules) -> bytes:
+    if array("I").itemsize != 4 or array("i").itemsize != 4:
+        raise RuntimeError("rule packs need 4-byte array('I')/array('i')")
+    # String table: the vocab first (its ids are used as-is), then every other
+    # string the pack refers to.
+    strings: Dict[str, int] = {s: i for i, s in enumerate(rules.vocab)}
+
+    def sid(s: str) -> int:
+        return strings.setdefault(s, len(strings))
+
+    arrays: Dict[str, array] = {
+        "keywords": array("I", (sid(k) for k in rules.keywords)),
+        "syn_keys": array("I", (sid(k) for k in rules.synonym_keys)),
+        "syn_targets": array("I", (sid(t) for t in rules.synonym_targets)),
+        "emergency": array("I", (sid(e) for e in sorted(rules.emergency))),
+    }
+    specs = rules.id_specs
+    arrays["cond_ptr"], arrays["cond_ids"] = _csr([c for c, _ in spec.conditions] for spec in specs)
+    _, arrays["cond_weights"] = _csr(([w for _, w in spec.conditions] for spec in specs), "i")
+    arrays["act_ptr"], arrays["act"] = _csr(spec.actions for spec in specs)
+    arrays["q_ptr"], arrays["q"] = _csr(spec.questions for spec in specs)
+    arrays["rf_ptr"], arrays["rf"] = _csr(spec.red_flags for spec in specs)
+    for prefix, matcher in (("kw_", rules._keyword_matcher), ("syn_", rules._synonym_matcher)):
+        for name, values in matcher.to_arrays().items():
+            arrays[prefix + name] = values
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    arrays["str_off"] = offsets
+    arrays["str_blob"] = array("B", b"".join(encoded))
+
+    layout: Dict[str, List] = {}
+    chunks: List[bytes] = []
+    pos = 0
+    for name, values in arrays.items():
+        raw = values.tobytes()
+        layout[name] = [values.typecode, pos, len(values)]
+        pad = -len(raw) % _ALIGN
+        chunks.append(raw + b"\0" * pad)
+        pos += len(raw) + pad
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "vocab_size": len(rules.vocab),
+        "strings": len(strings),
+        "arrays": layout,
+    }).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\0" * (-len(prefix) % _ALIGN)
+    return prefix + b"".join(chunks)
+
+
+class _PackedStrings(Sequence):
+    # Strings of the pack's table, decoded from the mapped blob on first access
+    def __init__(self, offsets: Sequence[int], blob: memoryview, count: int):
+        self._offsets = offsets
+        self._blob = blob
+        self._cache: List[Optional[str]] = [None] * count
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        s = self._cache[i]
+        if s is None:
+            s = self._cache[i] = str(self._blob[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+        return s
+
+
+class _StringRefs(Sequence):
+    def __init__(self, strings: _PackedStrings, ids: Sequence[int]):
+        self._strings = strings
+        self._ids = ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        return self._strings[self._ids[i]]
+
+
+class _PackedSpecs(Sequence):
+    # Per-rule _IdSpec built from the CSR arrays on first access
+    def __init__(self, a: Dict[str, memoryview]):
+        self._a = a
+        self._cache: List[Optional[_IdSpec]] = [None] * (len(a["cond_ptr"]) - 1)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _row(self, name: str, i: int) -> Tuple[int, ...]:
+        ptr = self._a[name + "_ptr"]
+        return tuple(self._a[name][ptr[i]:ptr[i + 1]])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        spec = self._cache[i]
+        if spec is None:
+            a = self._a
+            lo, hi = a["cond_ptr"][i], a["cond_ptr"][i + 1]
+            spec = self._cache[i] = _IdSpec(
+                conditions=tuple(zip(a["cond_ids"][lo:hi], a["cond_weights"][lo:hi])),
+                actions=self._row("act", i),
+                questions=self._row("q", i),
+                red_flags=self._row("rf", i),
+            )
+        return spec
+
+
+def is_compiled_pack(path: PathLike) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load_compiled_pack(path: PathLike) -> CompiledRules:
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a compiled rule pack")
+    (header_len,) = struct.unpack_from("<I", mm, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(mm[start:start + header_len].decode("utf-8"))
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported rule pack version {header.get('version')}, recompile it")
+    if header.get("byteorder") != sys.byteorder:
+        raise ValueError(f"{path} was compiled on a {header.get('byteorder')}-endian machine, recompile it")
+    base = start + header_len
+    base += -base % _ALIGN
+    view = memoryview(mm)
+    a: Dict[str, memoryview] = {}
+    for name, (typecode, offset, count) in header["arrays"].items():
+        itemsize = array(typecode).itemsize
+        chunk = view[base + offset:base + offset + count * itemsize]
+        a[name] = chunk if typecode == "B" else chunk.cast(typecode)
+
+    strings = _PackedStrings(a["str_off"], a["str_blob"], header["strings"])
+    return CompiledRules.from_components(
+        keywords=_StringRefs(strings, a["keywords"]),
+        synonym_keys=_StringRefs(strings, a["syn_keys"]),
+        synonym_targets=_StringRefs(strings, a["syn_targets"]),
+        emergency=frozenset(_StringRefs(strings, a["emergency"])),
+        # Vocab ids are the first ``vocab_size`` entries of the string table
+        vocab=_StringRefs(strings, range(header["vocab_size"])),
+        id_specs=_PackedSpecs(a),
+        keyword_matcher=FrozenAhoCorasick({k: a["kw_" + k] for k in _AUTOMATON_ARRAYS}),
+        synonym_matcher=FrozenAhoCorasick({k: a["syn_" + k] for k in _AUTOMATON_ARRAYS}),
+    )
+
+
+def compile_rule_pack(source: PathLike, dest: Optional[PathLike] = None) -> Path:
+    # Source -> binary artifact. The file is written next to ``dest`` and
+    # renamed over it, so readers never see a partial pack and processes that
+    # still map the old one keep using it until they reload.
+    src = Path(source)
+    out = Path(dest) if dest is not None else src.with_suffix(".rulepack")
+    data = pack_rules(CompiledRules(*read_rule_source(src)))
+    fd, tmp = tempfile.mkstemp(dir=str(out.parent), prefix=out.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, out)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return out
+
+
+def load_rule_pack(path: PathLike) -> CompiledRules:
+    # Compiled packs are mapped; JSON/YAML sources are compiled in memory
+    if is_compiled_pack(path):
+        return load_compiled_pack(path)
+    return CompiledRules(*read_rule_source(path))
+
+
+class RulePackWatcher:
+    # Polls a rule pack (source or compiled) and installs it process-wide
+    # whenever its mtime changes. A pack that fails to load is reported in
+    # ``last_error`` and the current rules stay in place.
+    def __init__(
+        self,
+        path: PathLike,
+        interval_s: float = 2.0,
+        on_reload: Optional[Callable[[CompiledRules], None]] = None,
+    ):
+        self.path = Path(path)
+        self.interval_s = interval_s
+        self.on_reload = on_reload
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._mtime: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            self.last_error = str(e)
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            rules = load_rule_pack(self.path)
+        except Exception as e:
+            self.last_error = f"{self.path}: {e}"
+            return False
+        install_rules(rules)
+        self.reloads += 1
+        self.last_error = None
+        if self.on_reload is not None:
+            self.on_reload(rules)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.check()
+
+    def start(self) -> "RulePackWatcher":
+        self.check()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="rulepack-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, compile and inspect triage rule packs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("export", help="write the built-in rules as a JSON source pack")
+    p.add_argument("dest")
+    p = sub.add_parser("compile", help="compile a JSON/YAML pack into a binary artifact")
+    p.add_argument("source")
+    p.add_argument("-o", "--output", help="defaults to <source>.rulepack")
+    p = sub.add_parser("info", help="summarize a source or compiled pack")
+    p.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(export_builtin_rules(args.dest))
+    elif args.command == "compile":
+        out = compile_rule_pack(args.source, args.output)
+        print(f"{out} ({out.stat().st_size} bytes)")
+    else:
+        rules = load_rule_pack(args.path)
+        kind = "compiled" if is_compiled_pack(args.path) else "source"
+        print(f"{args.path}: {kind} pack, {len(rules.keywords)} rules, {len(rules.synonym_keys)} synonyms, "
+              f"{len(rules.emergency)} emergency keywords, {len(rules.vocab)} interned phrases")
+
+
+if __name__ == "__main__":
+    main()
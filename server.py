@@ -0,0 +1,480 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Literal, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field, ValidationError
+
+from advice_cache import get_advice_cache
+from audit import audit, get_audit_log
+from faq import search_faq
+from hedging import hedged_advice, target_stats, targets_from_env
+from llm import batcher_stats, batching_enabled, generate_advice
+import metrics
+from models import LAZY, SymptomInput, TriageResult
+from rulepack import RulePackWatcher
+from triage import triage_batch, triage_symptoms
+from urgent import fast_path_mode, is_urgent, max_background, urgent_guidance
+from warmup import WORKER_STEPS, preload, preload_enabled
+
+
+# Headless JSON API over triage, FAQ search and LLM advice, independent of the
+# Streamlit UI. Triage requests are micro-batched into triage_batch calls on a
+# worker pool; requests beyond --max-inflight are rejected with 503 so a load
+# balancer can retry elsewhere. /advice for emergency and high-risk intakes
+# answers at once with precomputed guidance (see urgent.py). Every request is
+# recorded in the audit log when AUDIT_LOG_DIR is set (see audit.py).
+
+
+class AdviceRequest(BaseModel):
+    model_config = LAZY
+
+    input: SymptomInput
+    triage: Optional[TriageResult] = None
+    provider: str = Field(default_factory=lambda: os.getenv("LLM_PROVIDER", "OpenAI"))
+    openai_model: str = Field(default_factory=lambda: os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+    ollama_model: str = Field(default_factory=lambda: os.getenv("OLLAMA_MODEL", "llama3:8b-instruct"))
+    temperature: float = Field(default_factory=lambda: float(os.getenv("AI_TEMPERATURE", "0.2")))
+    lang: str = "en"
+    # Race a second target after the hedge delay (see hedging.py)
+    hedge: bool = Field(default_factory=lambda: os.getenv("LLM_HEDGE", "").strip().lower() in ("1", "true", "yes", "on"))
+    # Coalesce with concurrent requests into one LLM batch (see llm.AdviceBatcher)
+    batch: bool = Field(default_factory=batching_enabled)
+    # Emergency/high-risk intakes: "background" answers with guidance and warms the
+    # advice cache, "skip" never calls the LLM, "off" waits for the LLM as usual
+    fast_path: Literal["background", "skip", "off"] = Field(default_factory=fast_path_mode)
+
+
+class ServiceConfig:
+    def __init__(
+        self,
+        workers: int = os.cpu_count() or 2,
+        executor: str = "thread",
+        max_inflight: int = 256,
+        batch_size: int = 64,
+        batch_wait_ms: float = 5.0,
+        request_timeout_s: float = 60.0,
+        rules_path: Optional[str] = None,
+        rules_reload_s: float = 2.0,
+        preload: bool = False,
+    ):
+        self.workers = workers
+        self.executor = executor
+        self.max_inflight = max_inflight
+        self.batch_size = batch_size
+        self.batch_wait_ms = batch_wait_ms
+        self.request_timeout_s = request_timeout_s
+        self.rules_path = rules_path
+        self.rules_reload_s = rules_reload_s
+        # Load rules, FAQ indexes, validators and the LLM client before serving (see warmup.py)
+        self.preload = preload
+
+
+_RULES_WATCHERS: Dict[int, RulePackWatcher] = {}
+
+
+def _watch_rules(path: str, interval_s: float) -> RulePackWatcher:
+    # One watcher per process (also run as the process-pool initializer), so
+    # every worker maps the compiled pack and swaps it in when it changes.
+    # Keyed by pid: a forked worker inherits the dict but not the thread.
+    pid = os.getpid()
+    if pid not in _RULES_WATCHERS:
+        _RULES_WATCHERS[pid] = RulePackWatcher(path, interval_s).start()
+    return _RULES_WATCHERS[pid]
+
+
+def _init_worker(rules_path: Optional[str], rules_reload_s: float, preload_steps: Tuple[str, ...]) -> None:
+    # Process-pool initializer
+    if rules_path:
+        _watch_rules(rules_path, rules_reload_s)
+    if preload_steps:
+        preload(preload_steps)
+
+
+def _triage_payloads(payloads: List[Dict]) -> List[Dict]:
+    # Runs inside the worker pool; plain dicts keep process-pool pickling cheap
+    inputs = [SymptomInput.model_validate(p) for p in payloads]
+    return [r.model_dump(mode="json") for r in triage_batch(inputs)]
+
+
+class TriageBatcher:
+    # Collects single triage requests for up to ``batch_wait_ms`` (or until
+    # ``batch_size`` are queued) and scores them with one triage_batch call.
+    def __init__(self, executor: Executor, batch_size: int, batch_wait_ms: float):
+        self.executor = executor
+        self.batch_size = batch_size
+        self.batch_wait_s = batch_wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[Dict, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="triage-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, payload: Dict) -> Future:
+        fut: Future = Future()
+        self._queue.put((payload, fut))
+        return fut
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait_s
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            payloads = [p for p, _ in batch]
+            futures = [f for _, f in batch]
+            try:
+                job = self.executor.submit(_triage_payloads, payloads)
+            except Exception as e:
+                for f in futures:
+                    f.set_exception(e)
+                continue
+            job.add_done_callback(lambda j, fs=futures: self._resolve(j, fs))
+
+    @staticmethod
+    def _resolve(job: Future, futures: List[Future]) -> None:
+        exc = job.exception()
+        if exc is not None:
+            for f in futures:
+                f.set_exception(exc)
+            return
+        for f, result in zip(futures, job.result()):
+            f.set_result(result)
+
+
+class TriageService:
+    def __init__(self, config: ServiceConfig):
+        self.config = config
+        self.rules_watcher: Optional[RulePackWatcher] = None
+        if config.rules_path:
+            self.rules_watcher = _watch_rules(config.rules_path, config.rules_reload_s)
+        if config.executor == "process":
+            self.executor: Executor = ProcessPoolExecutor(
+                max_workers=config.workers,
+                initializer=_init_worker,
+                initargs=(config.rules_path, config.rules_reload_s, WORKER_STEPS if config.preload else ()),
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=config.workers, thread_name_prefix="triage")
+        io_workers = max(4, config.workers * 4)
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="llm")
+        self.batcher = TriageBatcher(self.executor, config.batch_size, config.batch_wait_ms)
+        self.slots = threading.BoundedSemaphore(config.max_inflight)
+        # Fast-path LLM calls nobody waits for; beyond this many (and never more
+        # than half the LLM threads) they are dropped
+        self.background = threading.BoundedSemaphore(max(1, min(max_background(), io_workers // 2)))
+        self.rejected = 0
+        self.served = 0
+        self._lock = threading.Lock()
+        self.preload_timings: Dict[str, float] = {}
+        if config.preload:
+            self.preload_timings = preload()
+            if config.executor == "process":
+                # Pool workers start on first submit; start (and warm) them now
+                for job in [self.executor.submit(int) for _ in range(config.workers)]:
+                    job.result()
+
+    def triage(self, payload: Dict) -> Dict:
+        started = time.perf_counter()
+        SymptomInput.model_validate(payload)
+        result = self.batcher.submit(payload).result(timeout=self.config.request_timeout_s)
+        audit("triage", payload, result, timings={"total": time.perf_counter() - started})
+        return result
+
+    def triage_many(self, payloads: List[Dict]) -> List[Dict]:
+        started = time.perf_counter()
+        for p in payloads:
+            SymptomInput.model_validate(p)
+        results = self.executor.submit(_triage_payloads, payloads).result(timeout=self.config.request_timeout_s)
+        # Each record carries the latency of the whole batch
+        timings = {"total": time.perf_counter() - started}
+        for p, r in zip(payloads, results):
+            audit("triage_batch", p, r, timings=timings)
+        return results
+
+    def faq(self, query: str, limit: int, lang: str) -> List[Dict]:
+        return [it.model_dump() for it in search_faq(query, limit=limit, lang=lang)]
+
+    def advice(self, payload: Dict) -> Dict:
+        started = time.perf_counter()
+        req = AdviceRequest.model_validate(payload)
+        timings: Dict[str, float] = {}
+        tr = req.triage
+        if tr is None:
+            tr = triage_symptoms(req.input)
+            timings["triage"] = time.perf_counter() - started
+        model = req.openai_model if req.provider == "OpenAI" else req.ollama_model
+        llm_started = time.perf_counter()
+        # Filled with the prompt size; stays empty on a cache hit
+        prompt: Dict = {}
+        urgent = req.fast_path != "off" and is_urgent(tr)
+        if urgent and (req.fast_path == "skip" or not self.background.acquire(blocking=False)):
+            if req.fast_path == "background":
+                metrics.incr("urgent.background_dropped")
+            job = None
+        else:
+            try:
+                job = self._submit_advice(req, tr, prompt)
+            except BaseException:
+                # e.g. the executor is shutting down; give the background slot back
+                if urgent:
+                    self.background.release()
+                raise
+        if urgent:
+            # The job (if any) finishes on its own and leaves its answer in the advice cache
+            if job is not None:
+                job.add_done_callback(lambda _: self.background.release())
+            guidance = urgent_guidance(tr, req.lang)
+            timings["total"] = time.perf_counter() - started
+            audit("advice", req.input, tr, provider=req.provider, model=model, lang=req.lang, fast_path=req.fast_path, timings=timings)
+            return {"advice": None, "guidance": guidance, "fast_path": req.fast_path, "triage": tr.model_dump(mode="json"), "prompt": {}}
+        advice = job.result(timeout=self.config.request_timeout_s)
+        timings["llm"] = time.perf_counter() - llm_started
+        timings["total"] = time.perf_counter() - started
+        audit("advice", req.input, tr, provider=req.provider, model=model, lang=req.lang, timings=timings)
+        return {"advice": advice, "triage": tr.model_dump(mode="json"), "prompt": prompt}
+
+    def _submit_advice(self, req: AdviceRequest, tr: TriageResult, prompt: Dict) -> Future:
+        if req.hedge:
+            targets = targets_from_env(req.provider, req.openai_model, req.ollama_model, req.temperature)
+            return self.io_executor.submit(hedged_advice, req.input, tr, targets, lang=req.lang, cache=get_advice_cache(), report=prompt)
+        return self.io_executor.submit(
+            generate_advice,
+            req.input,
+            tr,
+            provider=req.provider,
+            openai_model=req.openai_model,
+            ollama_model=req.ollama_model,
+            temperature=req.temperature,
+            lang=req.lang,
+            cache=get_advice_cache(),
+            batch=req.batch,
+            report=prompt,
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {"served": self.served, "rejected": self.rejected, "max_inflight": self.config.max_inflight}
+        llm_targets = target_stats()
+        if llm_targets:
+            stats["llm_targets"] = llm_targets
+        llm_batching = batcher_stats()
+        if llm_batching is not None:
+            stats["llm_batching"] = llm_batching
+        audit_log = get_audit_log()
+        if audit_log is not None:
+            stats["audit"] = audit_log.stats()
+        if self.preload_timings:
+            stats["preload_ms"] = {step: round(s * 1000.0, 1) for step, s in self.preload_timings.items()}
+        if self.rules_watcher is not None:
+            stats["rules"] = {
+                "path": str(self.rules_watcher.path),
+                "reloads": self.rules_watcher.reloads,
+                "error": self.rules_watcher.last_error,
+            }
+        return stats
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
+
+
+class TriageRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, the body can
+    # wait for the client's delayed ACK (~40 ms) on keep-alive connections
+    disable_nagle_algorithm = True
+    service: TriageService
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_body(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8", headers)
+
+    def _send_body(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _content_length(self) -> Optional[int]:
+        # None for a malformed or negative header
+        value = (self.headers.get("Content-Length") or "0").strip()
+        return int(value) if value.isascii() and value.isdigit() else None
+
+    def _body(self):
+        # _dispatch has already rejected a bad Content-Length
+        return json.loads(self.rfile.read(self._content_length()) or b"null")
+
+    def _dispatch(self, method: str) -> None:
+        svc = self.service
+        url = urlparse(self.path)
+        length = self._content_length()
+        if length is None:
+            # The body cannot be skipped without its length, so the connection is closed
+            self.close_connection = True
+            self._send(400, {"error": "invalid Content-Length header"}, {"Connection": "close"})
+            return
+        if method == "GET" and url.path == "/healthz":
+            self._send(200, dict(svc.stats(), status="ok"))
+            return
+        if method == "GET" and url.path == "/metrics":
+            # Stages timed in this process; process-pool workers keep their own
+            if parse_qs(url.query).get("format", [""])[0] == "json":
+                self._send(200, metrics.snapshot())
+            else:
+                self._send_body(200, metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+            return
+        if not svc.slots.acquire(blocking=False):
+            with svc._lock:
+                svc.rejected += 1
+            # Drain the body so the keep-alive connection stays usable
+            self.rfile.read(length)
+            self._send(503, {"error": "server busy"}, {"Retry-After": "1"})
+            return
+        try:
+            status, payload = self._route(method, url)
+            with svc._lock:
+                svc.served += 1
+        except ValidationError as e:
+            status, payload = 422, {"error": "invalid request", "details": json.loads(e.json())}
+        except json.JSONDecodeError as e:
+            status, payload = 400, {"error": f"invalid JSON: {e}"}
+        except TimeoutError:
+            status, payload = 504, {"error": "timed out"}
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+        finally:
+            svc.slots.release()
+        self._send(status, payload)
+
+    def _route(self, method: str, url) -> Tuple[int, object]:
+        svc = self.service
+        if method == "POST" and url.path == "/triage":
+            return 200, svc.triage(self._body())
+        if method == "POST" and url.path == "/triage/batch":
+            payloads = self._body()
+            if not isinstance(payloads, list):
+                return 400, {"error": "expected a JSON array of SymptomInput objects"}
+            return 200, svc.triage_many(payloads)
+        if method == "GET" and url.path == "/faq":
+            qs = parse_qs(url.query)
+            query = qs.get("q", [""])[0]
+            try:
+                limit = int(qs.get("limit", ["10"])[0])
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                return 400, {"error": "limit must be a positive integer"}
+            lang = qs.get("lang", ["en"])[0]
+            return 200, svc.faq(query, limit, lang)
+        if method == "POST" and url.path == "/advice":
+            return 200, svc.advice(self._body())
+        return 404, {"error": f"no route for {method} {url.path}"}
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+class TriageHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, handler, reuse_port: bool = False):
+        self.reuse_port = reuse_port
+        super().__init__(address, handler)
+
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+def make_server(host: str, port: int, config: ServiceConfig, reuse_port: bool = False) -> TriageHTTPServer:
+    service = TriageService(config)
+    handler = type("BoundTriageRequestHandler", (TriageRequestHandler,), {"service": service})
+    return TriageHTTPServer((host, port), handler, reuse_port=reuse_port)
+
+
+def serve(host: str, port: int, config: ServiceConfig, reuse_port: bool = False) -> None:
+    server = make_server(host, port, config, reuse_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.RequestHandlerClass.service.shutdown()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="HTTP API for triage, FAQ search and LLM advice")
+    parser.add_argument("--host", default=os.getenv("TRIAGE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("TRIAGE_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("TRIAGE_WORKERS", str(os.cpu_count() or 2))), help="triage worker pool size")
+    parser.add_argument("--executor", choices=["thread", "process"], default=os.getenv("TRIAGE_EXECUTOR", "thread"))
+    parser.add_argument("--max-inflight", type=int, default=int(os.getenv("TRIAGE_MAX_INFLIGHT", "256")), help="requests beyond this get 503")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("TRIAGE_BATCH_SIZE", "64")))
+    parser.add_argument("--batch-wait-ms", type=float, default=float(os.getenv("TRIAGE_BATCH_WAIT_MS", "5")))
+    parser.add_argument("--rules", default=os.getenv("TRIAGE_RULES_PATH"), help="rule pack (JSON/YAML source or compiled .rulepack), reloaded on change")
+    parser.add_argument("--rules-reload-s", type=float, default=float(os.getenv("TRIAGE_RULES_RELOAD_S", "2")), help="rule pack poll interval")
+    parser.add_argument("--metrics", action="store_true", default=os.getenv("METRICS_ENABLED", "").strip().lower() in ("1", "true", "yes", "on"), help="collect per-stage timings for GET /metrics (also METRICS_ENABLED=1)")
+    parser.add_argument("--preload", action="store_true", default=preload_enabled(), help="load rules, FAQ indexes, validators and the LLM client before serving (also TRIAGE_PRELOAD=1)")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("TRIAGE_PROCESSES", "1")), help="server processes sharing the port (SO_REUSEPORT)")
+    args = parser.parse_args()
+    metrics.enable(args.metrics)
+
+    config = ServiceConfig(
+        workers=args.workers,
+        executor=args.executor,
+        max_inflight=args.max_inflight,
+        batch_size=args.batch_size,
+        batch_wait_ms=args.batch_wait_ms,
+        rules_path=args.rules,
+        rules_reload_s=args.rules_reload_s,
+        preload=args.preload,
+    )
+    print(f"triage API on http://{args.host}:{args.port} ({args.processes} process(es), {args.workers} {args.executor} workers each)")
+    if args.processes <= 1:
+        serve(args.host, args.port, config)
+        return
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise SystemExit("--processes > 1 needs SO_REUSEPORT (Linux/BSD); run several instances behind a load balancer instead")
+    import multiprocessing
+
+    procs = [
+        multiprocessing.Process(target=serve, args=(args.host, args.port, config, True))
+        for _ in range(args.processes)
+    ]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    # Slow stub Ollama endpoint; LLM clients are created against it and
+    # dropped afterwards (async clients are bound to the loop that used them)
+    import llm
+    from stub_llm_server import server_url, start_stub_server
+
+    server, cfg = start_stub_server(latency_s=0.5)
+    monkeypatch.setenv("OLLAMA_BASE_URL", server_url(server))
+    llm.reset_clients()
+    yield cfg
+    llm.reset_clients()
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,52 @@
+from itertools import permutations
+
+import pytest
+
+import advice_cache
+from advice_cache import AdviceCache, SemanticAdviceCache, make_advice_key
+from models import SymptomInput
+from triage import SYMPTOM_RULES, triage_symptoms
+
+RED_FLAG_SYMPTOMS = [name for name, rule in SYMPTOM_RULES.items() if rule.get("red_flags")]
+
+
+def key(symptoms, age=30):
+    data = SymptomInput(age=age, symptoms=symptoms, severity_1to10=5, duration_days=2)
+    return make_advice_key(data, triage_symptoms(data), "Ollama", "stub", 0.2, "en")
+
+
+def lenient_cache():
+    # A threshold this low would match almost anything in the same partition
+    return AdviceCache(semantic=SemanticAdviceCache(threshold=0.01))
+
+
+def test_semantic_tier_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("ADVICE_SEMANTIC_THRESHOLD", raising=False)
+    monkeypatch.setattr(advice_cache, "_DEFAULT", None)
+    assert advice_cache.get_advice_cache().semantic is None
+    monkeypatch.setattr(advice_cache, "_DEFAULT", None)
+    monkeypatch.setenv("ADVICE_SEMANTIC_THRESHOLD", "0.9")
+    assert advice_cache.get_advice_cache().semantic is not None
+
+
+def test_near_duplicate_intakes_share_advice():
+    cache = AdviceCache(semantic=SemanticAdviceCache(threshold=0.9))
+    cache.put(key(["fever", "cough"], age=31), "advice")
+    assert cache.get(key(["cough", "fever"], age=30)) == "advice"
+
+
+@pytest.mark.parametrize("extra", RED_FLAG_SYMPTOMS)
+def test_an_extra_red_flag_symptom_never_shares_advice(extra):
+    base = [name for name in RED_FLAG_SYMPTOMS if name != extra][:4] + ["tired"]
+    cache = lenient_cache()
+    cache.put(key(base), "advice without it")
+    assert cache.get(key(base + [extra])) is None
+    cache.put(key(base + [extra]), "advice with it")
+    assert cache.get(key(base)) == "advice without it"
+
+
+@pytest.mark.parametrize("stored, asked", list(permutations(RED_FLAG_SYMPTOMS, 2)))
+def test_a_different_red_flag_symptom_never_shares_advice(stored, asked):
+    cache = lenient_cache()
+    cache.put(key(["tired", "weak", stored]), "advice")
+    assert cache.get(key(["tired", "weak", asked])) is None
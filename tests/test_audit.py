@@ -0,0 +1,57 @@
+import audit
+from models import SymptomInput
+from triage import triage_symptoms
+
+
+def records(directory):
+    return list(audit.iter_records(audit.scan(directory)))
+
+
+def test_roundtrip(tmp_path):
+    log = audit.AuditLog(tmp_path, batch_size=100, flush_s=60)
+    data = SymptomInput(age=70, sex="female", symptoms=["fever", "кашель"], duration_days=3, severity_1to10=6, notes="на варфарине")
+    tr = triage_symptoms(data)
+    log.record("advice", data, tr, provider="Ollama", model="m", lang="ru", timings={"total": 0.5, "llm": 0.4})
+    assert log.flush(5)
+    log.close()
+    (rec,) = records(tmp_path)
+    assert rec["input"] == data.model_dump(mode="json")
+    assert rec["risk_level"] == tr.risk_level
+    assert [c["condition"] for c in rec["conditions"]] == [h.condition for h in tr.possible_conditions]
+    assert rec["latency_ms"] == {"total": 500.0, "llm": 400.0}
+
+
+def test_bad_record_keeps_the_rest_of_the_batch(tmp_path):
+    # HTTP requests are logged as plain dicts; nothing bounds duration_days
+    log = audit.AuditLog(tmp_path, batch_size=100, flush_s=60)
+    for days in (1, 2, 10**10, 10**30, 4, 5):
+        log.record("triage", {"symptoms": ["fever"], "duration_days": days}, {"risk_level": "low", "possible_conditions": [{"condition": "Flu", "confidence": 0.5}]})
+    assert log.flush(5)
+    log.close()
+    assert (log.written, log.errors, log.blocks) == (5, 1, 1)
+    assert "OverflowError" in log.last_error
+    got = records(tmp_path)
+    assert [r["input"]["duration_days"] for r in got] == [1, 2, 10**10, 4, 5]
+    assert all([c["condition"] for c in r["conditions"]] == ["Flu"] for r in got)
+
+
+def test_partly_encoded_record_is_rolled_back(tmp_path):
+    # The bad confidence comes after symptoms and conditions were appended
+    good = (1.0, "triage", {"symptoms": ["a", "b"]}, {"possible_conditions": [{"condition": "X", "confidence": 0.25}]}, None, None, None, None, {})
+    bad = (2.0, "triage", {"symptoms": ["c"]}, {"possible_conditions": [{"condition": "Y", "confidence": "high"}]}, None, None, None, None, {})
+    errors = []
+    block = audit.encode_block([good, bad, good], lambda record, e: errors.append(record))
+    assert errors == [bad]
+    (tmp_path / "a.seg").write_bytes(block)
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "b.seg").write_bytes(audit.encode_block([good, good]))
+    assert records(tmp_path) == records(tmp_path / "b")
+
+
+def test_all_records_bad_writes_nothing(tmp_path):
+    log = audit.AuditLog(tmp_path, batch_size=100, flush_s=60)
+    log.record("triage", {"age": 10**30})
+    assert log.flush(5)
+    log.close()
+    assert (log.written, log.errors, log.blocks) == (0, 1, 0)
+    assert records(tmp_path) == []
@@ -0,0 +1,19 @@
+import faq
+
+
+def test_lexical_is_the_default(monkeypatch):
+    monkeypatch.delenv("FAQ_SEARCH_MODE", raising=False)
+    assert faq.search_mode() == "lexical"
+    monkeypatch.setenv("FAQ_SEARCH_MODE", "bogus")
+    assert faq.search_mode() == "lexical"
+    monkeypatch.setenv("FAQ_SEARCH_MODE", "Hybrid")
+    assert faq.search_mode() == "hybrid"
+
+
+def test_default_search_does_not_build_vectors(monkeypatch):
+    monkeypatch.delenv("FAQ_SEARCH_MODE", raising=False)
+    index = faq.get_faq_index("en")
+    built = []
+    monkeypatch.setattr(index, "vectors", lambda: built.append(1))
+    assert faq.search_faq("cough", lang="en")
+    assert built == []
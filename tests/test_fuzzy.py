@@ -0,0 +1,59 @@
+import pytest
+
+from fuzzy import FuzzyIndex, max_distance, osa_distance
+from models import SymptomInput
+from triage import get_compiled_rules, triage_symptoms
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return get_compiled_rules()
+
+
+@pytest.mark.parametrize("typo, expected", [
+    ("feaver", "fever"),
+    ("кашел", "cough"),
+    ("температра", "fever"),
+    ("shortnes of breth", "shortness of breath"),
+    ("headahce", "headache"),
+    ("тошнта", "nausea"),
+])
+def test_typos_are_corrected(rules, typo, expected):
+    assert rules.normalize([typo]) == [expected]
+
+
+@pytest.mark.parametrize("word", [
+    "never", "fewer", "heartache", "couch", "cash", "dash", "chess", "cheat", "threat", "живое", "живёт",
+])
+def test_real_words_are_not_turned_into_symptoms(rules, word):
+    assert rules.normalize([word]) == [word]
+
+
+@pytest.mark.parametrize("text", ["never slept", "i never slept well", "chess pain", "fewer meals"])
+def test_words_inside_free_text_are_not_corrected(rules, text):
+    assert rules.normalize([text]) == [text]
+
+
+def test_false_positive_does_not_change_triage():
+    base = triage_symptoms(SymptomInput(symptoms=["sore throat"], severity_1to10=3))
+    noisy = triage_symptoms(SymptomInput(symptoms=["sore throat", "never", "couch", "chess pain"], severity_1to10=3))
+    assert noisy == base
+    assert triage_symptoms(SymptomInput(symptoms=["chess pain"])).risk_level == "low"
+
+
+def test_exact_and_partial_matches_skip_correction(rules):
+    assert rules.normalize(["кашель"]) == ["cough"]
+    # "coughh" contains the keyword, so it is matched as typed
+    assert rules.normalize(["coughh"]) == ["coughh"]
+
+
+def test_index_limits():
+    index = FuzzyIndex(["fever", "rash", "throat", "headache"], protected={"fewer"})
+    assert index.lookup("feverr") == "fever"
+    # Under MIN_LENGTH, different first letter, protected, too many edits
+    assert index.lookup("rahs") is None
+    assert index.lookup("never") is None
+    assert index.lookup("fewer") is None
+    assert index.lookup("heartache") is None
+    assert [max_distance(n) for n in (3, 4, 5, 9, 10)] == [0, 0, 1, 1, 2]
+    assert osa_distance("pian", "pain", 2) == 1
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import hedging
+import llm
+from hedging import HedgePolicy, LLMTarget, ahedged_advice, hedged_advice
+from models import SymptomInput
+from stub_llm_server import server_url, start_stub_server
+from triage import triage_symptoms
+
+DATA = SymptomInput(age=40, symptoms=["fever", "cough"], severity_1to10=4)
+
+
+@pytest.fixture
+def stubs():
+    # Two stub Ollama endpoints; each test sets their latency and failures
+    servers = [start_stub_server(latency_s=0.02, text=f"advice from {name}") for name in ("primary", "secondary")]
+    hedging.reset_target_stats()
+    llm.reset_clients()
+    targets = [LLMTarget("Ollama", name, timeout_s=5.0, base_url=server_url(server)) for name, (server, _) in zip(("primary", "secondary"), servers)]
+    # Create the clients up front so the SDK import is not timed as latency
+    for target in targets:
+        llm.get_llm(target.provider, target.model, target.temperature, target.base_url)
+    yield [(target, cfg) for target, (_, cfg) in zip(targets, servers)]
+    hedging.reset_target_stats()
+    llm.reset_clients()
+    for server, _ in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def ask(targets, policy, use_async=False):
+    triage = triage_symptoms(DATA)
+    if use_async:
+        return asyncio.run(ahedged_advice(DATA, triage, targets, "en", policy=policy))
+    return hedged_advice(DATA, triage, targets, "en", policy=policy)
+
+
+def stats(target):
+    return hedging._health(target, HedgePolicy()).stats.snapshot()
+
+
+def breaker(target):
+    return hedging._health(target, HedgePolicy()).breaker
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_hedge_wins_over_a_slow_primary(stubs, use_async):
+    (primary, primary_cfg), (secondary, _) = stubs
+    primary_cfg.latency_s = 1.0
+    t0 = time.perf_counter()
+    advice = ask([primary, secondary], HedgePolicy(delay_s=0.1), use_async)
+    assert advice == "advice from secondary"
+    assert time.perf_counter() - t0 < 0.8
+    assert stats(secondary)["successes"] == 1
+
+
+def test_fast_primary_is_not_hedged(stubs):
+    (primary, _), (secondary, secondary_cfg) = stubs
+    assert ask([primary, secondary], HedgePolicy(delay_s=0.5)) == "advice from primary"
+    assert secondary_cfg.requests == 0
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_timeout_is_counted_once(stubs, use_async):
+    (primary, primary_cfg), _ = stubs
+    primary_cfg.latency_s = 0.6
+    primary.timeout_s = 0.2
+    advice = ask([primary], HedgePolicy(failure_threshold=1, reset_after_s=60.0), use_async)
+    assert advice.startswith("LLM error: Ollama timed out")
+    # Let the abandoned request finish: its late answer must not count again
+    # or close the breaker it opened
+    time.sleep(0.8)
+    snapshot = stats(primary)
+    assert (snapshot["timeouts"], snapshot["failures"], snapshot["successes"]) == (1, 0, 0)
+    assert breaker(primary).state == "open"
+
+
+def test_failures_are_counted_once(stubs):
+    (primary, primary_cfg), _ = stubs
+    primary_cfg.fail = True
+    for _ in range(2):
+        assert ask([primary], HedgePolicy(failure_threshold=3)).startswith("LLM error:")
+    snapshot = stats(primary)
+    assert (snapshot["failures"], snapshot["timeouts"], snapshot["successes"]) == (2, 0, 0)
+    assert breaker(primary).state == "closed"
+
+
+def test_breaker_opens_then_half_opens(stubs):
+    (primary, primary_cfg), (secondary, _) = stubs
+    policy = HedgePolicy(delay_s=5.0, failure_threshold=2, reset_after_s=0.3)
+    primary_cfg.fail = True
+    # Failures fail over to the secondary until the breaker opens
+    for _ in range(2):
+        assert ask([primary, secondary], policy) == "advice from secondary"
+    assert breaker(primary).state == "open"
+    requests = primary_cfg.requests
+    assert ask([primary, secondary], policy) == "advice from secondary"
+    assert primary_cfg.requests == requests
+
+    # Half-open: one trial request; a failure opens the breaker again
+    time.sleep(0.35)
+    assert breaker(primary).state == "half-open"
+    assert ask([primary, secondary], policy) == "advice from secondary"
+    assert primary_cfg.requests == requests + 1
+    assert breaker(primary).state == "open"
+
+    # ... and a success closes it
+    time.sleep(0.35)
+    primary_cfg.fail = False
+    assert ask([primary, secondary], policy) == "advice from primary"
+    assert breaker(primary).state == "closed"
+
+
+def half_open(target, cfg, policy):
+    # One failure opens the breaker; after reset_after_s it lets a trial through
+    cfg.fail = True
+    assert ask([target], policy).startswith("LLM error:")
+    cfg.fail = False
+    time.sleep(policy.reset_after_s + 0.05)
+    assert breaker(target).state == "half-open"
+
+
+def test_cancelled_trial_is_given_back_async(stubs):
+    (primary, primary_cfg), (secondary, _) = stubs
+    policy = HedgePolicy(delay_s=0.1, failure_threshold=1, reset_after_s=0.2)
+    half_open(primary, primary_cfg, policy)
+    # The trial goes to the slow primary, loses the hedge and is cancelled
+    primary_cfg.latency_s = 1.0
+    assert ask([primary, secondary], policy, use_async=True) == "advice from secondary"
+    primary_cfg.latency_s = 0.02
+    requests = primary_cfg.requests
+    assert ask([primary, secondary], policy, use_async=True) == "advice from primary"
+    assert primary_cfg.requests == requests + 1
+    assert breaker(primary).state == "closed"
+
+
+def test_cancelled_trial_is_given_back_sync(stubs, monkeypatch):
+    (primary, primary_cfg), (secondary, secondary_cfg) = stubs
+    policy = HedgePolicy(delay_s=0.1, failure_threshold=1, reset_after_s=0.2)
+    half_open(primary, primary_cfg, policy)
+    # One worker, and a job queued ahead of the primary's trial takes it once
+    # the secondary answers, so the trial is cancelled before it starts
+    pool = hedging.ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(hedging, "_POOL", pool)
+    release = threading.Event()
+    threading.Timer(0.05, pool.submit, (release.wait,)).start()
+    secondary_cfg.latency_s = 0.3
+    try:
+        assert ask([secondary, primary], policy) == "advice from secondary"
+    finally:
+        release.set()
+    requests = primary_cfg.requests
+    assert ask([primary, secondary], policy) == "advice from primary"
+    assert primary_cfg.requests == requests + 1
+    assert breaker(primary).state == "closed"
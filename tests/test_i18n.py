@@ -0,0 +1,18 @@
+import random
+
+import pytest
+
+from i18n import localize_compact, localize_triage
+from models import SymptomInput
+from triage import SYMPTOM_RULES, SYMPTOM_SYNONYMS_RU_EN, triage_compact, triage_symptoms
+
+
+@pytest.mark.parametrize("lang", ["ru", "en", "de"])
+def test_compact_localization_matches_the_full_result(lang):
+    # The hot paths localize the compact result; it must read the same as
+    # localizing the full TriageResult
+    rng = random.Random(3)
+    vocab = list(SYMPTOM_RULES) + list(SYMPTOM_SYNONYMS_RU_EN) + ["zzz"]
+    for _ in range(500):
+        data = SymptomInput(symptoms=rng.sample(vocab, rng.randint(0, 5)), severity_1to10=rng.choice([None, 2, 6, 9]))
+        assert localize_compact(triage_compact(data), lang) == localize_triage(triage_symptoms(data), lang)
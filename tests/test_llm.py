@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+import llm
+from advice_cache import AdviceCache
+from llm import stream_advice
+from models import SymptomInput
+from triage import triage_symptoms
+
+DATA = SymptomInput(age=40, symptoms=["fever", "cough"], severity_1to10=4)
+ADVICE = "Rest and drink fluids."
+
+
+class SlowFakeChatModel(GenericFakeChatModel):
+    # Streams the fake message with a pause before every chunk
+    delay_s: float = 0.01
+
+    def _stream(self, *args, **kwargs):
+        for chunk in super()._stream(*args, **kwargs):
+            time.sleep(self.delay_s)
+            yield chunk
+
+
+class FailingFakeChatModel(GenericFakeChatModel):
+    # Yields one chunk and then fails mid-stream
+    def _stream(self, *args, **kwargs):
+        yield ChatGenerationChunk(message=AIMessageChunk(content="Rest"))
+        raise RuntimeError("connection reset")
+
+
+def fake(cls=SlowFakeChatModel, text=ADVICE):
+    return cls(messages=iter([AIMessage(content=text)]))
+
+
+def stream(llm, cache=None):
+    return stream_advice(DATA, triage_symptoms(DATA), "Ollama", "", "fake", 0.2, "en", llm=llm, cache=cache)
+
+
+def test_stream_yields_chunks_in_order():
+    advice = stream(fake())
+    assert advice.first_token_s is None and advice.total_s is None
+    chunks = list(advice)
+    assert chunks == ["Rest", " ", "and", " ", "drink", " ", "fluids."]
+    assert advice.text == ADVICE
+    assert advice.error is None and not advice.from_cache
+    assert 0 < advice.first_token_s <= advice.total_s
+
+
+def test_stream_error_is_reported_after_the_partial_text():
+    cache = AdviceCache()
+    advice = stream(fake(FailingFakeChatModel), cache)
+    chunks = list(advice)
+    assert chunks == ["Rest", "LLM error: connection reset"]
+    assert advice.error == "LLM error: connection reset"
+    assert advice.text == "Rest" + advice.error
+    assert advice.first_token_s <= advice.total_s
+    # A failed stream is not cached
+    assert stream(fake(), cache).from_cache is False
+
+
+def test_finished_stream_is_served_from_the_cache():
+    cache = AdviceCache()
+    assert "".join(stream(fake(), cache)) == ADVICE
+    advice = stream(fake(text="something else"), cache)
+    assert advice.from_cache
+    assert list(advice) == [ADVICE]
+    assert advice.first_token_s == advice.total_s == 0.0
+
+
+def test_unavailable_provider_is_retried(monkeypatch):
+    llm.reset_clients()
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    assert llm.get_llm("OpenAI", "gpt-test", 0.2) is None
+    # Once the key is set the next call creates the client, then reuses it
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    client = llm.get_llm("OpenAI", "gpt-test", 0.2)
+    assert client is not None
+    assert llm.get_llm("OpenAI", "gpt-test", 0.2) is client
+    llm.reset_clients()
+
+
+class HangingModel:
+    # A provider whose batch call never returns until released
+    def __init__(self):
+        self.release = threading.Event()
+
+    def batch(self, prompts, config=None, return_exceptions=False):
+        self.release.wait()
+        return [AIMessage(content=ADVICE)] * len(prompts)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_stalled_batch_times_out(monkeypatch, use_async):
+    model = HangingModel()
+    monkeypatch.setenv("LLM_TIMEOUT_S", "0.2")
+    monkeypatch.setattr(llm, "_BATCHER", llm.AdviceBatcher(max_wait_s=0.01, threads=1))
+    monkeypatch.setattr(llm, "_BATCHER_PID", os.getpid())
+    monkeypatch.setattr(llm, "get_llm", lambda *args: model)
+
+    async def aget_llm(*args):
+        return model
+
+    monkeypatch.setattr(llm, "aget_llm", aget_llm)
+    args = (DATA, triage_symptoms(DATA), "Ollama", "", "fake", 0.2, "en")
+    t0 = time.perf_counter()
+    try:
+        with pytest.raises(TimeoutError):
+            if use_async:
+                asyncio.run(llm.agenerate_advice(*args, batch=True))
+            else:
+                llm.generate_advice(*args, batch=True)
+    finally:
+        model.release.set()
+    assert time.perf_counter() - t0 < 2.0
+
+
+def test_slow_client_creation_does_not_block_other_clients(monkeypatch):
+    llm.reset_clients()
+    release = threading.Event()
+    created = []
+
+    def make_llm(provider, model, temperature, base_url=None):
+        created.append(model)
+        if model == "slow":
+            release.wait(5.0)
+        return object()
+
+    monkeypatch.setattr(llm, "make_llm", make_llm)
+    fast = llm.get_llm("Ollama", "fast", 0.2)
+    slow = [threading.Thread(target=llm.get_llm, args=("Ollama", "slow", 0.2)) for _ in range(3)]
+    for thread in slow:
+        thread.start()
+    try:
+        t0 = time.perf_counter()
+        assert llm.get_llm("Ollama", "fast", 0.2) is fast
+        assert llm.get_llm("Ollama", "other", 0.2) is not None
+        assert time.perf_counter() - t0 < 0.5
+    finally:
+        release.set()
+        for thread in slow:
+            thread.join()
+    # Callers waiting for the same client share one creation
+    assert created.count("slow") == 1
+    llm.reset_clients()
@@ -0,0 +1,24 @@
+import metrics
+
+
+def test_trace_records_stages_while_metrics_are_off(monkeypatch):
+    monkeypatch.setattr(metrics, "_enabled", False)
+    metrics.reset()
+    assert metrics.span("stage") is metrics._NOOP
+    with metrics.trace() as trace:
+        with metrics.span("stage"):
+            pass
+        metrics.observe("other", 0.5)
+    assert [name for name, _ in trace.stages] == ["stage", "other"]
+    # Nothing reaches the process-wide histograms
+    assert metrics.snapshot()["stages"] == {}
+
+
+def test_metrics_switch_is_left_alone_by_traces(monkeypatch):
+    monkeypatch.setattr(metrics, "_enabled", True)
+    metrics.reset()
+    with metrics.trace():
+        metrics.observe("stage", 0.1)
+    metrics.observe("stage", 0.1)
+    assert metrics.enabled()
+    assert metrics.snapshot()["stages"]["stage"]["count"] == 2
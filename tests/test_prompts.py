@@ -0,0 +1,24 @@
+import pytest
+
+from models import SymptomInput
+from prompts import TRIM_ORDER, render_prompt
+from triage import triage_symptoms
+
+NOTES = "takes warfarin, pregnant, lives alone"
+
+
+@pytest.mark.parametrize("lang", ["ru", "en"])
+@pytest.mark.parametrize("budget", [0, 600, 150])
+def test_notes_are_never_sent(lang, budget):
+    data = SymptomInput(age=30, symptoms=["fever", "cough", "headache"], severity_1to10=5, notes=NOTES)
+    rendered = render_prompt(data, triage_symptoms(data), lang, budget)
+    assert "warfarin" not in rendered.text
+    assert "notes" not in rendered.trimmed
+    assert rendered.text == render_prompt(data.model_copy(update={"notes": None}), triage_symptoms(data), lang, budget).text
+
+
+def test_budget_trims_questions_first():
+    assert "notes" not in dict(TRIM_ORDER)
+    data = SymptomInput(age=30, symptoms=["fever", "cough", "headache"], severity_1to10=5)
+    rendered = render_prompt(data, triage_symptoms(data), "en", 150)
+    assert rendered.trimmed and next(iter(rendered.trimmed)) == "questions"
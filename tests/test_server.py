@@ -0,0 +1,100 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from models import SymptomInput
+from server import ServiceConfig, TriageService, make_server
+
+SETTINGS = dict(provider="Ollama", openai_model="", ollama_model="stub", temperature=0.2, lang="en")
+URGENT = SymptomInput(age=40, symptoms=["chest pain", "cough"], severity_1to10=9)
+
+
+@pytest.fixture(scope="module")
+def http_server():
+    srv = make_server("127.0.0.1", 0, ServiceConfig(workers=1))
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    srv.RequestHandlerClass.service.shutdown()
+
+
+def get(srv, path):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=10)
+    try:
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("limit", ["abc", "1.5", "0", "-3"])
+def test_faq_rejects_a_bad_limit(http_server, limit):
+    status, body = get(http_server, f"/faq?q=cough&limit={limit}")
+    assert status == 400
+    assert "limit" in body["error"]
+
+
+def post_raw(srv, path, body, content_length):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=10)
+    try:
+        conn.putrequest("POST", path)
+        conn.putheader("Content-Type", "application/json")
+        conn.putheader("Content-Length", content_length)
+        conn.endheaders()
+        conn.send(body)
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("content_length", ["abc", "-5", "1.5", "0x10"])
+def test_rejects_a_bad_content_length(http_server, content_length):
+    status, body = post_raw(http_server, "/triage", b'{"symptoms": ["fever"]}', content_length)
+    assert status == 400
+    assert "Content-Length" in body["error"]
+
+
+def test_valid_content_length(http_server):
+    payload = json.dumps({"symptoms": ["fever"]}).encode()
+    status, body = post_raw(http_server, "/triage", payload, str(len(payload)))
+    assert status == 200
+    assert body["risk_level"]
+
+
+def test_faq_limit(http_server):
+    status, body = get(http_server, "/faq?q=cough&limit=2")
+    assert status == 200
+    assert 0 < len(body) <= 2
+
+
+def free_slots(semaphore):
+    n = 0
+    while semaphore.acquire(blocking=False):
+        n += 1
+    for _ in range(n):
+        semaphore.release()
+    return n
+
+
+def test_background_slot_is_released_when_submit_fails(monkeypatch):
+    service = TriageService(ServiceConfig(workers=1))
+    try:
+        slots = free_slots(service.background)
+        def refuse(*args, **kwargs):
+            raise RuntimeError("cannot schedule new futures after shutdown")
+
+        monkeypatch.setattr(service.io_executor, "submit", refuse)
+        payload = dict(SETTINGS, input=URGENT.model_dump(), fast_path="background")
+        for _ in range(slots + 1):
+            with pytest.raises(RuntimeError):
+                service.advice(payload)
+        assert free_slots(service.background) == slots
+    finally:
+        monkeypatch.undo()
+        service.shutdown()
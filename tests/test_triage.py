@@ -0,0 +1,26 @@
+import pytest
+
+from models import SymptomInput
+from triage import MAX_ACTIONS, MAX_QUESTIONS, compile_rules, triage_batch, triage_symptoms
+
+# More questions and actions than a result may carry
+RULES = {
+    name: {
+        "conditions": {f"{name} condition": 1},
+        "questions": [f"{name} question {i}" for i in range(MAX_QUESTIONS + 2)],
+        "actions": [f"{name} action {i}" for i in range(MAX_ACTIONS + 2)],
+        "red_flags": [],
+    }
+    for name in ("alpha", "beta")
+}
+
+
+@pytest.mark.parametrize("symptoms", [["alpha"], ["alpha", "beta"]])
+def test_batch_caps_questions_and_actions_like_single_triage(symptoms):
+    rules = compile_rules(RULES, {})
+    data = SymptomInput(symptoms=symptoms, severity_1to10=4)
+    single = triage_symptoms(data, rules)
+    assert triage_batch([data], rules) == [single]
+    assert len(single.doctor_questions) == MAX_QUESTIONS
+    for hypothesis in single.possible_conditions:
+        assert len(hypothesis.recommended_actions) == MAX_ACTIONS
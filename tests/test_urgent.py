@@ -0,0 +1,145 @@
+import asyncio
+import time
+
+import pytest
+
+import pipeline
+from advice_cache import AdviceCache
+from models import ConditionHypothesis, SymptomInput, TriageResult
+from server import ServiceConfig, TriageService
+from triage import triage_symptoms
+from urgent import LATENCY_BUDGET_MS, urgent_guidance
+
+SETTINGS = dict(provider="Ollama", openai_model="", ollama_model="stub", temperature=0.2, lang="en")
+
+
+def emergency(i: int = 0) -> SymptomInput:
+    # Distinct ages, so no intake is answered from an earlier one's advice
+    return SymptomInput(age=20 + i, symptoms=["chest pain", "cough"], severity_1to10=9)
+
+
+def routine() -> SymptomInput:
+    return SymptomInput(age=30, symptoms=["fever", "cough"], severity_1to10=3)
+
+
+async def drain_background():
+    while pipeline._BACKGROUND:
+        await asyncio.gather(*pipeline._BACKGROUND)
+
+
+def test_guidance_only_for_urgent_levels():
+    assert urgent_guidance(triage_symptoms(routine()), "en") is None
+    text = urgent_guidance(triage_symptoms(emergency()), "en")
+    assert text.startswith("**⚠️ Possible emergency")
+    assert "Warning signs: " in text
+
+
+def test_guidance_lists_each_red_flag_once():
+    tr = TriageResult(risk_level="high", possible_conditions=[
+        ConditionHypothesis(condition="X", confidence=0.5, rationale="", red_flags=["Одышка", "Боль в груди", "Одышка"]),
+    ])
+    text = urgent_guidance(tr, "ru")
+    assert text.endswith("Тревожные признаки: Одышка; Боль в груди")
+
+
+def test_skip_answers_without_the_llm(stub_llm):
+    async def run():
+        result = await pipeline.analyze(emergency(), fast_path="skip", cache=None, **SETTINGS)
+        await drain_background()
+        return result
+
+    result = asyncio.run(run())
+    assert result.guidance and result.advice is None and result.fast_path == "skip"
+    assert stub_llm.requests == 0
+
+
+def test_background_answers_first_and_caches_the_llm_answer(stub_llm):
+    cache = AdviceCache()
+
+    async def run():
+        t0 = time.perf_counter()
+        result = await pipeline.analyze(emergency(), fast_path="background", cache=cache, **SETTINGS)
+        elapsed = time.perf_counter() - t0
+        await drain_background()
+        return result, elapsed
+
+    result, elapsed = asyncio.run(run())
+    assert result.guidance and result.advice is None and result.fast_path == "background"
+    assert elapsed < stub_llm.latency_s
+    assert stub_llm.requests == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_background_cap_drops_the_llm_call(stub_llm, monkeypatch):
+    monkeypatch.setenv("URGENT_MAX_BACKGROUND", "0")
+
+    async def run():
+        result = await pipeline.analyze(emergency(), fast_path="background", cache=None, **SETTINGS)
+        await drain_background()
+        return result
+
+    assert asyncio.run(run()).guidance
+    assert stub_llm.requests == 0
+
+
+def test_off_waits_for_the_llm(stub_llm):
+    t0 = time.perf_counter()
+    result = asyncio.run(pipeline.analyze(emergency(), fast_path="off", cache=None, **SETTINGS))
+    assert result.advice and result.guidance is None and result.fast_path is None
+    assert time.perf_counter() - t0 >= stub_llm.latency_s
+
+
+def test_routine_intakes_always_wait_for_the_llm(stub_llm):
+    result = asyncio.run(pipeline.analyze(routine(), fast_path="background", cache=None, **SETTINGS))
+    assert result.advice and result.guidance is None
+
+
+@pytest.mark.parametrize("mode", ["skip", "background"])
+def test_pipeline_latency_budget(stub_llm, mode):
+    async def run():
+        # The first call pays for imports and rule compilation
+        await pipeline.analyze(emergency(0), fast_path="skip", cache=None, **SETTINGS)
+        latencies = []
+        for i in range(1, 41):
+            t0 = time.perf_counter()
+            result = await pipeline.analyze(emergency(i), fast_path=mode, cache=None, **SETTINGS)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            assert result.guidance
+        await drain_background()
+        return latencies
+
+    latencies = sorted(asyncio.run(run()))
+    assert latencies[int(0.99 * (len(latencies) - 1))] <= LATENCY_BUDGET_MS, latencies
+
+
+@pytest.mark.parametrize("mode", ["skip", "background"])
+def test_server_latency_budget(stub_llm, mode):
+    service = TriageService(ServiceConfig(workers=1))
+    try:
+        payload = dict(SETTINGS, input=emergency(0).model_dump(), fast_path="skip")
+        service.advice(payload)
+        latencies = []
+        for i in range(1, 41):
+            payload = dict(SETTINGS, input=emergency(i).model_dump(), fast_path=mode)
+            t0 = time.perf_counter()
+            answer = service.advice(payload)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            assert answer["guidance"] and answer["advice"] is None
+        # Background calls (up to the service's cap) still reach the LLM
+        deadline = time.monotonic() + 10.0
+        while mode == "background" and not stub_llm.requests and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        service.shutdown()
+    latencies.sort()
+    assert latencies[int(0.99 * (len(latencies) - 1))] <= LATENCY_BUDGET_MS, latencies
+    assert (stub_llm.requests > 0) == (mode == "background")
+
+
+def test_server_off_waits_for_the_llm(stub_llm):
+    service = TriageService(ServiceConfig(workers=1))
+    try:
+        answer = service.advice(dict(SETTINGS, input=emergency().model_dump(), fast_path="off"))
+    finally:
+        service.shutdown()
+    assert answer["advice"] and "guidance" not in answer
@@ -1,6 +1,18 @@
-from typing import Dict, List, Tuple
-from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import chain
+import gc
+import heapq
+import os
+
 from models import SymptomInput, TriageResult, ConditionHypothesis
+from fuzzy import CACHE_SIZE as FUZZY_CACHE_SIZE, WORD_RE, FuzzyIndex
+from lazy import optional_module
+from matcher import AhoCorasick
+from metrics import incr, span
 
 
 # Simplified, rule-based symptom-to-condition mapping.
@@ -97,104 +109,772 @@ SYMPTOM_SYNONYMS_RU_EN: Dict[str, str] = {
     "рвота": "nausea",
 }
 
+# Real words one typo away from a symptom word; typo correction leaves them alone
+NEVER_CORRECT = frozenset({
+    "never", "fewer", "fiver", "couch", "cash", "dash", "cheat", "chess", "threat", "heartache",
+    "живое", "живет", "живёт", "горке",
+})
 
-def _normalize(symptoms: List[str]) -> List[str]:
-    normalized: List[str] = []
-    for raw in symptoms:
-        if not raw:
-            continue
-        s = raw.strip().lower()
-        if not s:
-            continue
-        # Точное соответствие RU синонимам
-        if s in SYMPTOM_SYNONYMS_RU_EN:
-            normalized.append(SYMPTOM_SYNONYMS_RU_EN[s])
-            continue
-        # Подстрочное соответствие RU фразам
-        matched = False
-        for ru, en in SYMPTOM_SYNONYMS_RU_EN.items():
-            if ru in s:
-                normalized.append(en)
-                matched = True
-        if matched:
-            continue
-        # Оставляем как есть (возможно уже EN)
-        normalized.append(s)
-    # Уникализируем, сохраняя порядок
-    seen = set()
-    uniq = []
-    for x in normalized:
-        if x not in seen:
-            seen.add(x)
-            uniq.append(x)
-    return uniq
-
-
-def triage_symptoms(data: SymptomInput) -> TriageResult:
-    symptoms = _normalize(data.symptoms)
-
-    condition_scores: Dict[str, int] = defaultdict(int)
-    recommended_actions: List[str] = []
-    doctor_questions: List[str] = []
-    matched_red_flags: List[str] = []
-
-    for keyword, spec in SYMPTOM_RULES.items():
-        if any(keyword in s for s in symptoms):
-            for cond, w in spec["conditions"].items():
-                condition_scores[cond] += w
-            recommended_actions.extend(spec.get("actions", []))
-            doctor_questions.extend(spec.get("questions", []))
-            matched_red_flags.extend(spec.get("red_flags", []))
-
-    # Determine risk level
-    risk_level = "low"
-    if any(k in symptoms for k in EMERGENCY_KEYWORDS):
-        risk_level = "emergency"
-    elif data.severity_1to10 and data.severity_1to10 >= 8:
-        risk_level = "high"
-    elif (data.duration_days and data.duration_days >= 7) or (data.severity_1to10 and data.severity_1to10 >= 5):
-        risk_level = "moderate"
-
-    # Build hypotheses
-    total = sum(max(1, s) for s in condition_scores.values()) or 1
-    ranked: List[Tuple[str, int]] = sorted(condition_scores.items(), key=lambda kv: kv[1], reverse=True)
-    hypotheses: List[ConditionHypothesis] = []
-    for cond, score in ranked[:8]:
-        hypotheses.append(
-            ConditionHypothesis(
-                condition=cond,
-                confidence=min(1.0, score / float(total)),
-                rationale="Совпадение ключевых симптомов по правилам",
-                red_flags=matched_red_flags[:],
-                recommended_actions=sorted(set(recommended_actions))[:6],
+
+MAX_HYPOTHESES = 8
+MAX_ACTIONS = 6
+MAX_QUESTIONS = 10
+MAX_CACHED_OUTCOMES = 65536
+RISK_LEVELS = ("low", "moderate", "high", "emergency")
+MATCH_RATIONALE = "Совпадение ключевых симптомов по правилам"
+FALLBACK_CONDITION = "Неспецифические симптомы"
+FALLBACK_CONFIDENCE = 0.2
+FALLBACK_RATIONALE = "Недостаточно совпадений по правилам"
+FALLBACK_ACTIONS = ["Наблюдение", "Гидратация", "Консультация врача при ухудшении"]
+SELF_CARE_BASE = "Это не является медицинским советом. Обратитесь к врачу при сомнениях."
+SELF_CARE_URGENT = "При тяжёлых симптомах — вызов скорой помощи/неотложная помощь."
+
+
+class CompactTriage(NamedTuple):
+    # Triage outcome as integer ids into CompiledRules.vocab; display strings are
+    # produced only at the edge (rules.expand / i18n.localize_compact).
+    risk: int
+    conditions: Tuple[int, ...]
+    confidences: Tuple[float, ...]
+    red_flags: Tuple[int, ...]
+    actions: Tuple[int, ...]
+    questions: Tuple[int, ...]
+
+
+class RuleOutcome(NamedTuple):
+    # The part of a triage result that depends only on the set of matched rules
+    conditions: Tuple[int, ...]
+    confidences: Tuple[float, ...]
+    red_flags: Tuple[int, ...]
+    actions: Tuple[int, ...]
+    questions: Tuple[int, ...]
+
+
+class _IdSpec(NamedTuple):
+    conditions: Tuple[Tuple[int, int], ...]
+    actions: Tuple[int, ...]
+    questions: Tuple[int, ...]
+    red_flags: Tuple[int, ...]
+
+
+class CompiledRules:
+    # Rule set compiled once into two automata: RU synonyms -> canonical symptom
+    # and rule keywords -> rule index. Per-call cost is linear in the input text.
+    # ``rules``/``specs``/``synonyms`` keep the source dicts; they are None when
+    # the rule set was loaded from a binary rule pack (see rulepack.py).
+    def __init__(self, rules: Dict[str, Dict], synonyms: Dict[str, str], emergency: Iterable[str]):
+        self.rules = rules
+        self.specs: List[Dict] = list(rules.values())
+        self.synonyms = synonyms
+
+        # Every condition/phrase is interned to an integer id. Ids follow the
+        # sorted order of the strings, so sorting ids sorts the phrases.
+        strings = {FALLBACK_CONDITION, SELF_CARE_BASE, SELF_CARE_URGENT, *FALLBACK_ACTIONS}
+        for spec in self.specs:
+            strings.update(spec["conditions"])
+            for field in ("actions", "questions", "red_flags"):
+                strings.update(spec.get(field, []))
+        vocab = sorted(strings)
+        ids = {x: i for i, x in enumerate(vocab)}
+        id_specs = [
+            _IdSpec(
+                conditions=tuple((ids[c], w) for c, w in spec["conditions"].items()),
+                actions=tuple(ids[x] for x in spec.get("actions", [])),
+                questions=tuple(ids[x] for x in spec.get("questions", [])),
+                red_flags=tuple(ids[x] for x in spec.get("red_flags", [])),
             )
+            for spec in self.specs
+        ]
+        keywords = list(rules)
+        self._setup(
+            keywords=keywords,
+            synonym_keys=list(synonyms),
+            synonym_targets=list(synonyms.values()),
+            emergency=frozenset(emergency),
+            vocab=vocab,
+            id_specs=id_specs,
+            keyword_matcher=AhoCorasick(keywords),
+            synonym_matcher=AhoCorasick(synonyms),
+        )
+
+    @classmethod
+    def from_components(cls, **components) -> "CompiledRules":
+        # Used by rulepack to wrap precompiled (e.g. mmap-backed) components
+        obj = cls.__new__(cls)
+        obj.rules = obj.specs = obj.synonyms = None
+        obj._setup(**components)
+        return obj
+
+    def _setup(
+        self,
+        keywords: Sequence[str],
+        synonym_keys: Sequence[str],
+        synonym_targets: Sequence[str],
+        emergency: frozenset,
+        vocab: Sequence[str],
+        id_specs: Sequence[_IdSpec],
+        keyword_matcher,
+        synonym_matcher,
+    ) -> None:
+        self.keywords = keywords
+        self.synonym_keys = synonym_keys
+        self.synonym_targets = synonym_targets
+        self.emergency = emergency
+        self.vocab = vocab
+        self.id_specs = id_specs
+        self._keyword_matcher = keyword_matcher
+        self._synonym_matcher = synonym_matcher
+        self.fallback_condition = self.vocab_id(FALLBACK_CONDITION)
+        self.fallback_actions = tuple(self.vocab_id(x) for x in FALLBACK_ACTIONS)
+        self.self_care_base = self.vocab_id(SELF_CARE_BASE)
+        self.self_care_urgent = self.vocab_id(SELF_CARE_URGENT)
+        # Per-language display tables, filled lazily by i18n.string_table
+        self.string_tables: Dict[str, Tuple[str, ...]] = {}
+        self._outcomes: Dict[Tuple[int, ...], RuleOutcome] = {}
+        self._matrix: Optional["_RuleMatrix"] = None
+        self._fuzzy: Optional[FuzzyIndex] = None
+        self._fuzzy_normalize = lru_cache(maxsize=FUZZY_CACHE_SIZE)(self._fuzzy_symptoms)
+
+    def vocab_id(self, text: str) -> int:
+        i = bisect_left(self.vocab, text)
+        if i < len(self.vocab) and self.vocab[i] == text:
+            return i
+        raise KeyError(text)
+
+    def normalize(self, symptoms: List[str]) -> List[str]:
+        normalized: List[str] = []
+        for raw in symptoms:
+            if not raw:
+                continue
+            s = raw.strip().lower()
+            if not s:
+                continue
+            # Точное соответствие RU синонимам
+            exact = self._synonym_matcher.exact(s)
+            if exact is not None:
+                normalized.append(self.synonym_targets[exact])
+                continue
+            # Подстрочное соответствие RU фразам (в порядке словаря синонимов)
+            hits = self._synonym_matcher.find(s)
+            if hits:
+                normalized.extend(self.synonym_targets[i] for i in sorted(hits))
+                continue
+            # Синонимов нет — если и ключевых слов нет, пробуем исправить опечатки
+            fixed = self._fuzzy_normalize(s)
+            if fixed:
+                normalized.extend(fixed)
+                continue
+            # Оставляем как есть (возможно уже EN)
+            normalized.append(s)
+        # Уникализируем, сохраняя порядок
+        return list(dict.fromkeys(normalized))
+
+    def fuzzy(self) -> FuzzyIndex:
+        # Built on first use from the words of all synonyms and rule keywords
+        if self._fuzzy is None:
+            with span("triage.fuzzy_index"):
+                self._fuzzy = FuzzyIndex(
+                    (w for phrase in chain(self.synonym_keys, self.keywords) for w in WORD_RE.findall(phrase)),
+                    protected=NEVER_CORRECT,
+                )
+        return self._fuzzy
+
+    def _fuzzy_symptoms(self, s: str) -> Tuple[str, ...]:
+        # Canonical symptom for a misspelt input (memoized per string), or ()
+        # when the input already matches a rule keyword or nothing is close.
+        # The corrected tag must be a whole synonym or keyword: a fixed word
+        # inside free text ("never slept") must not add a finding.
+        if self._keyword_matcher.exact(s) is not None or self._keyword_matcher.find(s):
+            return ()
+        corrected = self.fuzzy().correct(s)
+        if corrected is None:
+            return ()
+        exact = self._synonym_matcher.exact(corrected)
+        if exact is not None:
+            result: Tuple[str, ...] = (self.synonym_targets[exact],)
+        elif self._keyword_matcher.exact(corrected) is not None:
+            result = (corrected,)
+        else:
+            return ()
+        incr("triage.fuzzy_match")
+        return result
+
+    def match(self, symptoms: List[str]) -> List[int]:
+        hits = set()
+        for s in symptoms:
+            hits |= self._keyword_matcher.find(s)
+        return sorted(hits)
+
+    def is_emergency(self, symptoms: List[str]) -> bool:
+        return not self.emergency.isdisjoint(symptoms)
+
+    def outcome(self, matched: Tuple[int, ...]) -> RuleOutcome:
+        # Memoized per matched rule set, so equal intakes share the same tuples
+        cached = self._outcomes.get(matched)
+        if cached is not None:
+            return cached
+        condition_scores: Dict[int, int] = {}
+        recommended_actions = set()
+        doctor_questions = set()
+        matched_red_flags: List[int] = []
+        for idx in matched:
+            spec = self.id_specs[idx]
+            for cond, w in spec.conditions:
+                condition_scores[cond] = condition_scores.get(cond, 0) + w
+            recommended_actions.update(spec.actions)
+            doctor_questions.update(spec.questions)
+            matched_red_flags.extend(spec.red_flags)
+
+        # Ranking keeps dict insertion order for equal scores (sorted is stable)
+        total = sum(max(1, s) for s in condition_scores.values()) or 1
+        ranked = sorted(condition_scores.items(), key=lambda kv: kv[1], reverse=True)[:MAX_HYPOTHESES]
+        result = RuleOutcome(
+            conditions=tuple(c for c, _ in ranked),
+            confidences=tuple(min(1.0, score / float(total)) for _, score in ranked),
+            red_flags=tuple(matched_red_flags),
+            actions=tuple(sorted(recommended_actions)[:MAX_ACTIONS]),
+            questions=tuple(sorted(doctor_questions)[:MAX_QUESTIONS]),
         )
+        if len(self._outcomes) >= MAX_CACHED_OUTCOMES:
+            self._outcomes.clear()
+        self._outcomes[matched] = result
+        return result
 
-    if not hypotheses:
-        hypotheses.append(
+    def self_care(self, risk: int) -> Tuple[int, ...]:
+        return (self.self_care_base, self.self_care_urgent) if risk >= 2 else (self.self_care_base,)
+
+    def expand(self, ct: CompactTriage) -> TriageResult:
+        vocab = self.vocab
+        red_flags = [vocab[i] for i in ct.red_flags]
+        actions = [vocab[i] for i in ct.actions]
+        hypotheses = [
             ConditionHypothesis(
-                condition="Неспецифические симптомы",
-                confidence=0.2,
-                rationale="Недостаточно совпадений по правилам",
-                red_flags=[],
-                recommended_actions=["Наблюдение", "Гидратация", "Консультация врача при ухудшении"],
+                condition=vocab[c],
+                confidence=p,
+                rationale=MATCH_RATIONALE,
+                red_flags=red_flags,
+                recommended_actions=actions,
+            )
+            for c, p in zip(ct.conditions, ct.confidences)
+        ]
+        if not hypotheses:
+            hypotheses.append(
+                ConditionHypothesis(
+                    condition=FALLBACK_CONDITION,
+                    confidence=FALLBACK_CONFIDENCE,
+                    rationale=FALLBACK_RATIONALE,
+                    red_flags=[],
+                    recommended_actions=FALLBACK_ACTIONS,
+                )
             )
+        return TriageResult(
+            risk_level=RISK_LEVELS[ct.risk],
+            possible_conditions=hypotheses,
+            self_care_advice=[vocab[i] for i in self.self_care(ct.risk)],
+            doctor_questions=[vocab[i] for i in ct.questions],
         )
 
-    # Self-care advice baseline
-    self_care = ["Это не является медицинским советом. Обратитесь к врачу при сомнениях."]
-    if risk_level in ("high", "emergency"):
-        self_care.append("При тяжёлых симптомах — вызов скорой помощи/неотложная помощь.")
+    def matrix(self) -> "_RuleMatrix":
+        if self._matrix is None:
+            self._matrix = _RuleMatrix(self.id_specs)
+        return self._matrix
+
 
-    # Deduplicate and trim
-    doctor_questions = sorted(set(doctor_questions))[:10]
-    recommended_actions = sorted(set(recommended_actions))[:8]
+_COMPILED: Optional[CompiledRules] = None
+_RULES_VERSION = 0
 
-    return TriageResult(
-        risk_level=risk_level,
-        possible_conditions=hypotheses,
-        self_care_advice=self_care,
-        doctor_questions=doctor_questions,
+
+def compile_rules(
+    rules: Optional[Dict[str, Dict]] = None,
+    synonyms: Optional[Dict[str, str]] = None,
+    emergency: Optional[Iterable[str]] = None,
+) -> CompiledRules:
+    return CompiledRules(
+        SYMPTOM_RULES if rules is None else rules,
+        SYMPTOM_SYNONYMS_RU_EN if synonyms is None else synonyms,
+        EMERGENCY_KEYWORDS if emergency is None else emergency,
     )
 
 
+def get_compiled_rules() -> CompiledRules:
+    global _COMPILED
+    if _COMPILED is None:
+        path = os.getenv("TRIAGE_RULES_PATH")
+        if path:
+            from rulepack import load_rule_pack
+
+            _COMPILED = load_rule_pack(path)
+        else:
+            _COMPILED = compile_rules()
+    return _COMPILED
+
+
+def install_rules(rules: CompiledRules) -> Optional[CompiledRules]:
+    # Atomically swaps the process-wide rule set; calls already running keep
+    # the rule set they started with. Returns the previous one.
+    global _COMPILED, _RULES_VERSION
+    previous, _COMPILED = _COMPILED, rules
+    _RULES_VERSION += 1
+    return previous
+
+
+def rules_version() -> int:
+    # Bumped by install_rules; callers caching triage results key on it
+    return _RULES_VERSION
+
+
+def _normalize(symptoms: List[str]) -> List[str]:
+    return get_compiled_rules().normalize(symptoms)
+
+
+def _risk_code(emergency: bool, severity: Optional[int], duration: Optional[int]) -> int:
+    if emergency:
+        return 3
+    if severity and severity >= 8:
+        return 2
+    if (duration and duration >= 7) or (severity and severity >= 5):
+        return 1
+    return 0
+
+
+def triage_compact(data: SymptomInput, rules: Optional[CompiledRules] = None) -> CompactTriage:
+    rules = rules or get_compiled_rules()
+    with span("triage.normalize"):
+        symptoms = rules.normalize(data.symptoms)
+    with span("triage.match"):
+        matched = tuple(rules.match(symptoms))
+    with span("triage.hypotheses"):
+        outcome = rules.outcome(matched)
+    return CompactTriage(_risk_code(rules.is_emergency(symptoms), data.severity_1to10, data.duration_days), *outcome)
+
+
+class TriageLite:
+    # Memory-light triage result for bulk work: a risk code plus a RuleOutcome
+    # shared (by reference) with every other result that matched the same rules.
+    # Strings and the pydantic TriageResult are only built on demand.
+    __slots__ = ("risk", "outcome", "rules")
+
+    def __init__(self, risk: int, outcome: RuleOutcome, rules: CompiledRules):
+        self.risk = risk
+        self.outcome = outcome
+        self.rules = rules
+
+    @property
+    def risk_level(self) -> str:
+        return RISK_LEVELS[self.risk]
+
+    @property
+    def conditions(self) -> List[Tuple[str, float]]:
+        vocab = self.rules.vocab
+        return [(vocab[c], p) for c, p in zip(self.outcome.conditions, self.outcome.confidences)]
+
+    @property
+    def red_flags(self) -> List[str]:
+        return [self.rules.vocab[i] for i in self.outcome.red_flags]
+
+    @property
+    def recommended_actions(self) -> List[str]:
+        return [self.rules.vocab[i] for i in self.outcome.actions]
+
+    @property
+    def doctor_questions(self) -> List[str]:
+        return [self.rules.vocab[i] for i in self.outcome.questions]
+
+    def compact(self) -> CompactTriage:
+        return CompactTriage(self.risk, *self.outcome)
+
+    def to_result(self) -> TriageResult:
+        return self.rules.expand(self.compact())
+
+
+def triage_lite(data: SymptomInput, rules: Optional[CompiledRules] = None) -> TriageLite:
+    rules = rules or get_compiled_rules()
+    symptoms = rules.normalize(data.symptoms)
+    risk = _risk_code(rules.is_emergency(symptoms), data.severity_1to10, data.duration_days)
+    return TriageLite(risk, rules.outcome(tuple(rules.match(symptoms))), rules)
+
+
+def iter_triage_lite(inputs: Iterable[SymptomInput], rules: Optional[CompiledRules] = None) -> Iterator[TriageLite]:
+    rules = rules or get_compiled_rules()
+    for data in inputs:
+        yield triage_lite(data, rules)
+
+
+def triage_symptoms(data: SymptomInput, rules: Optional[CompiledRules] = None) -> TriageResult:
+    rules = rules or get_compiled_rules()
+    ct = triage_compact(data, rules)
+    with span("triage.build_result"):
+        return rules.expand(ct)
+
+
+def _count(counts: Dict[int, int], ids: Iterable[int], delta: int) -> None:
+    for i in ids:
+        n = counts.get(i, 0) + delta
+        if n:
+            counts[i] = n
+        else:
+            del counts[i]
+
+
+class IncrementalTriage:
+    # Triage state for an intake edited one symptom at a time (the tag widget
+    # in app.py). Instead of recomputing, it keeps reference counts: normalized
+    # symptom -> tags producing it, rule -> present symptoms matching it, and
+    # the running condition scores, actions and questions of the matched rules.
+    # add()/remove() touch only the rules of the changed symptom and push the
+    # new rank of each condition they change onto a heap (outdated entries are
+    # skipped when popped); compact() pops the top conditions from it and
+    # equals triage_compact() for the same symptoms, severity and duration.
+    # Bound to the rule set it was created with.
+    def __init__(
+        self,
+        rules: Optional[CompiledRules] = None,
+        severity_1to10: Optional[int] = None,
+        duration_days: Optional[int] = None,
+        symptoms: Iterable[str] = (),
+    ):
+        self.rules = rules or get_compiled_rules()
+        self.severity_1to10 = severity_1to10
+        self.duration_days = duration_days
+        # Raw tags as entered
+        self.symptoms: List[str] = []
+        self._normalized: Dict[str, Tuple[str, ...]] = {}
+        self._symptom_refs: Dict[str, int] = {}
+        self._rule_refs: Dict[int, int] = {}
+        self._emergency = 0
+        # Condition -> score, and -> {rule: position in the rule} of the matched
+        # rules listing it; the smallest (rule, position) breaks score ties like
+        # the insertion order in CompiledRules.outcome
+        self._scores: Dict[int, int] = {}
+        self._sources: Dict[int, Dict[int, int]] = {}
+        self._ranks: Dict[int, Tuple[int, int, int]] = {}
+        self._heap: List[Tuple[Tuple[int, int, int], int]] = []
+        self._total = 0
+        self._actions: Dict[int, int] = {}
+        self._questions: Dict[int, int] = {}
+        self._snapshot: Optional[CompactTriage] = None
+        for raw in symptoms:
+            self.add(raw)
+
+    def add(self, raw: str) -> None:
+        self.symptoms.append(raw)
+        for s in self._normalize(raw):
+            refs = self._symptom_refs.get(s, 0)
+            self._symptom_refs[s] = refs + 1
+            if not refs:
+                self._symptom_delta(s, 1)
+        self._snapshot = None
+
+    def remove(self, raw: str) -> None:
+        # ValueError if ``raw`` is not one of the current tags
+        self.symptoms.remove(raw)
+        for s in self._normalize(raw):
+            refs = self._symptom_refs[s] - 1
+            if refs:
+                self._symptom_refs[s] = refs
+            else:
+                del self._symptom_refs[s]
+                self._symptom_delta(s, -1)
+        self._snapshot = None
+
+    def sync(self, symptoms: Sequence[str]) -> bool:
+        # Applies only the tags added or removed since the last call; returns
+        # whether anything changed
+        if list(symptoms) == self.symptoms:
+            return False
+        current, target = Counter(self.symptoms), Counter(symptoms)
+        removed, added = current - target, target - current
+        for raw, n in removed.items():
+            for _ in range(n):
+                self.remove(raw)
+        for raw, n in added.items():
+            for _ in range(n):
+                self.add(raw)
+        self.symptoms = list(symptoms)
+        return bool(removed or added)
+
+    def set_profile(self, severity_1to10: Optional[int], duration_days: Optional[int]) -> None:
+        if (severity_1to10, duration_days) != (self.severity_1to10, self.duration_days):
+            self.severity_1to10 = severity_1to10
+            self.duration_days = duration_days
+            self._snapshot = None
+
+    def _normalize(self, raw: str) -> Tuple[str, ...]:
+        normalized = self._normalized.get(raw)
+        if normalized is None:
+            normalized = self._normalized[raw] = tuple(self.rules.normalize([raw]))
+        return normalized
+
+    def _symptom_delta(self, symptom: str, delta: int) -> None:
+        # A normalized symptom appeared (+1) or disappeared (-1)
+        if symptom in self.rules.emergency:
+            self._emergency += delta
+        for rule in self.rules.match([symptom]):
+            before = self._rule_refs.get(rule, 0)
+            after = before + delta
+            if after:
+                self._rule_refs[rule] = after
+            else:
+                del self._rule_refs[rule]
+            if not before or not after:
+                self._rule_delta(rule, delta)
+
+    def _rule_delta(self, rule: int, delta: int) -> None:
+        # A rule became matched (+1) or unmatched (-1)
+        spec = self.rules.id_specs[rule]
+        for pos, (cond, weight) in enumerate(spec.conditions):
+            old = self._scores.get(cond)
+            sources = self._sources.setdefault(cond, {})
+            if delta > 0:
+                sources[rule] = pos
+            else:
+                del sources[rule]
+            if sources:
+                new = (old or 0) + delta * weight
+                self._scores[cond] = new
+                self._total += max(1, new)
+                first, first_pos = min(sources.items())
+                rank = self._ranks[cond] = (-new, first, first_pos)
+                heapq.heappush(self._heap, (rank, cond))
+            else:
+                del self._scores[cond]
+                del self._sources[cond]
+                del self._ranks[cond]
+            if old is not None:
+                self._total -= max(1, old)
+        _count(self._actions, spec.actions, delta)
+        _count(self._questions, spec.questions, delta)
+
+    def _top(self, k: int) -> List[int]:
+        heap, ranks = self._heap, self._ranks
+        if len(heap) > 2 * len(ranks) + 64:
+            heap[:] = [(rank, cond) for cond, rank in ranks.items()]
+            heapq.heapify(heap)
+        top: List[int] = []
+        kept = []
+        while heap and len(top) < k:
+            entry = heapq.heappop(heap)
+            rank, cond = entry
+            # Outdated, or a second push of an unchanged rank
+            if ranks.get(cond) != rank or (top and top[-1] == cond):
+                continue
+            top.append(cond)
+            kept.append(entry)
+        for entry in kept:
+            heapq.heappush(heap, entry)
+        return top
+
+    def compact(self) -> CompactTriage:
+        if self._snapshot is None:
+            top = self._top(MAX_HYPOTHESES)
+            total = float(self._total or 1)
+            specs = self.rules.id_specs
+            self._snapshot = CompactTriage(
+                _risk_code(self._emergency > 0, self.severity_1to10, self.duration_days),
+                tuple(top),
+                tuple(min(1.0, self._scores[c] / total) for c in top),
+                tuple(chain.from_iterable(specs[r].red_flags for r in sorted(self._rule_refs))),
+                tuple(sorted(self._actions)[:MAX_ACTIONS]),
+                tuple(sorted(self._questions)[:MAX_QUESTIONS]),
+            )
+        return self._snapshot
+
+    def result(self) -> TriageResult:
+        return self.rules.expand(self.compact())
+
+
+class _RuleMatrix:
+    # Sparse (CSR) rule x condition weights. A pair's position in the CSR arrays
+    # is its rule-major insertion order, which breaks score ties the same way
+    # the dict in triage_symptoms does.
+    def __init__(self, id_specs: Sequence[_IdSpec]):
+        np = optional_module("numpy")
+        # Column -> vocab id of the condition
+        self.conditions: List[int] = []
+        index: Dict[int, int] = {}
+        indptr = [0]
+        cols: List[int] = []
+        weights: List[int] = []
+        for spec in id_specs:
+            for cond, w in spec.conditions:
+                if cond not in index:
+                    index[cond] = len(self.conditions)
+                    self.conditions.append(cond)
+                cols.append(index[cond])
+                weights.append(w)
+            indptr.append(len(cols))
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.int64)
+        self.lengths = np.diff(self.indptr)
+
+
+class _Group:
+    # Everything in a triage result that depends only on the matched rule set.
+    __slots__ = ("hypotheses", "red_flags", "actions", "questions")
+
+    def __init__(self, hypotheses, red_flags, actions, questions):
+        self.hypotheses: List[Tuple[str, float]] = hypotheses
+        self.red_flags: List[str] = red_flags
+        self.actions: List[str] = actions
+        self.questions: List[str] = questions
+
+
+def _score_signatures(rules: CompiledRules, signatures: List[Tuple[int, ...]]) -> List[_Group]:
+    np = optional_module("numpy")
+    m = rules.matrix()
+    n_sig, n_cond = len(signatures), len(m.conditions)
+    # Sparse signature x rule hits, expanded through the rule x condition CSR
+    hit_rows = np.repeat(np.arange(n_sig, dtype=np.int64), [len(sig) for sig in signatures])
+    hit_rules = np.fromiter(chain.from_iterable(signatures), dtype=np.int64, count=len(hit_rows))
+    widths = m.lengths[hit_rules]
+    starts = np.repeat(m.indptr[hit_rules] - np.cumsum(widths) + widths, widths)
+    pairs = starts + np.arange(int(widths.sum()), dtype=np.int64)
+    flat = np.repeat(hit_rows, widths) * n_cond + m.cols[pairs]
+
+    size = n_sig * n_cond
+    scores = np.bincount(flat, weights=m.weights[pairs], minlength=size).astype(np.int64).reshape(n_sig, n_cond)
+    present = (np.bincount(flat, minlength=size) > 0).reshape(n_sig, n_cond)
+    # Pairs are generated in (signature, rule) order, so the first occurrence
+    # of a cell carries its insertion order.
+    first = np.full(size, len(m.cols), dtype=np.int64)
+    uniq, where = np.unique(flat, return_index=True)
+    first[uniq] = pairs[where]
+    first = first.reshape(n_sig, n_cond)
+
+    ranked = np.lexsort((first, -scores, ~present), axis=-1)[:, :MAX_HYPOTHESES]
+    top_scores = np.take_along_axis(scores, ranked, axis=-1)
+    total = np.where(present, np.maximum(1, scores), 0).sum(axis=-1)
+    total[total == 0] = 1
+    confidence = np.minimum(1.0, top_scores / total[:, None].astype(np.float64))
+    counts = np.minimum(present.sum(axis=-1), MAX_HYPOTHESES)
+
+    groups: List[_Group] = []
+    conditions = m.conditions
+    vocab = rules.vocab
+    for u, sig in enumerate(signatures):
+        k = int(counts[u])
+        conds = ranked[u, :k].tolist()
+        confs = confidence[u, :k].tolist()
+        specs = [rules.id_specs[i] for i in sig]
+        # Vocab ids sort like their strings, so sorting ids sorts the phrases
+        groups.append(
+            _Group(
+                hypotheses=[(vocab[conditions[c]], p) for c, p in zip(conds, confs)],
+                red_flags=[vocab[x] for spec in specs for x in spec.red_flags],
+                actions=[vocab[x] for x in sorted({x for spec in specs for x in spec.actions})],
+                questions=[vocab[x] for x in sorted({x for spec in specs for x in spec.questions})[:MAX_QUESTIONS]],
+            )
+        )
+    return groups
+
+
+@contextmanager
+def _gc_paused():
+    # Result materialization allocates only acyclic containers; pausing the
+    # cyclic collector avoids repeated generation scans over the growing output.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _triage_chunk(chunk: Sequence[SymptomInput], rules: CompiledRules) -> List[TriageResult]:
+    np = optional_module("numpy")
+    n = len(chunk)
+    sig_index: Dict[Tuple[int, ...], int] = {}
+    signatures: List[Tuple[int, ...]] = []
+    row_sig = np.empty(n, dtype=np.int64)
+    emergency = np.zeros(n, dtype=bool)
+    with span("triage.batch_match"):
+        for i, data in enumerate(chunk):
+            symptoms = rules.normalize(data.symptoms)
+            sig = tuple(rules.match(symptoms))
+            sid = sig_index.get(sig)
+            if sid is None:
+                sid = sig_index[sig] = len(signatures)
+                signatures.append(sig)
+            row_sig[i] = sid
+            emergency[i] = rules.is_emergency(symptoms)
+
+    severity = np.fromiter((d.severity_1to10 or 0 for d in chunk), dtype=np.int64, count=n)
+    duration = np.fromiter((d.duration_days or 0 for d in chunk), dtype=np.int64, count=n)
+    risk = np.select([emergency, severity >= 8, (duration >= 7) | (severity >= 5)], [3, 2, 1], default=0)
+
+    with span("triage.hypotheses"):
+        groups = _score_signatures(rules, signatures)
+    # Records sharing a (rule set, risk level) pair produce the same payload;
+    # pydantic-core validation then gives each record its own objects.
+    payloads: Dict[Tuple[int, int], Dict] = {}
+    results: List[TriageResult] = []
+    with _gc_paused(), span("triage.build_result"):
+        for key in zip(row_sig.tolist(), risk.tolist()):
+            payload = payloads.get(key)
+            if payload is None:
+                payload = payloads[key] = _payload(groups[key[0]], key[1])
+            results.append(TriageResult.model_validate(payload))
+    return results
+
+
+def _payload(g: _Group, risk_code: int) -> Dict:
+    actions = g.actions[:MAX_ACTIONS]
+    if g.hypotheses:
+        hypotheses = [
+            {
+                "condition": cond,
+                "confidence": conf,
+                "rationale": MATCH_RATIONALE,
+                "red_flags": g.red_flags,
+                "recommended_actions": actions,
+            }
+            for cond, conf in g.hypotheses
+        ]
+    else:
+        hypotheses = [
+            {
+                "condition": FALLBACK_CONDITION,
+                "confidence": FALLBACK_CONFIDENCE,
+                "rationale": FALLBACK_RATIONALE,
+                "red_flags": [],
+                "recommended_actions": FALLBACK_ACTIONS,
+            }
+        ]
+    return {
+        "risk_level": RISK_LEVELS[risk_code],
+        "possible_conditions": hypotheses,
+        "self_care_advice": [SELF_CARE_BASE, SELF_CARE_URGENT] if risk_code >= 2 else [SELF_CARE_BASE],
+        "doctor_questions": g.questions,
+    }
+
+
+def iter_triage_batch(
+    inputs: Iterable[SymptomInput],
+    rules: Optional[CompiledRules] = None,
+    chunk_size: int = 4096,
+) -> Iterator[TriageResult]:
+    rules = rules or get_compiled_rules()
+    # numpy is imported on the first batch, not with this module
+    if optional_module("numpy") is None:
+        for data in inputs:
+            yield triage_symptoms(data, rules)
+        return
+    chunk: List[SymptomInput] = []
+    for data in inputs:
+        chunk.append(data)
+        if len(chunk) >= chunk_size:
+            yield from _triage_chunk(chunk, rules)
+            chunk = []
+    if chunk:
+        yield from _triage_chunk(chunk, rules)
+
+
+def triage_batch(
+    inputs: Iterable[SymptomInput],
+    rules: Optional[CompiledRules] = None,
+    chunk_size: int = 4096,
+) -> List[TriageResult]:
+    with _gc_paused():
+        return list(iter_triage_batch(inputs, rules, chunk_size))
@@ -0,0 +1,104 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from i18n import translate_list
+from metrics import incr
+from models import TriageResult
+
+
+# Red-flag fast path. Emergency and high-risk intakes get fixed, localized
+# guidance rendered straight from the triage result; the LLM call then runs in
+# the background (its answer lands in the advice cache and is shown when ready)
+# or is skipped. All text is formatted once at import, so a fast-path answer
+# costs a dict lookup plus the top condition's red flags.
+#
+#   URGENT_FAST_PATH=background  guidance now, LLM afterwards (default)
+#   URGENT_FAST_PATH=skip        guidance only
+#   URGENT_FAST_PATH=off         same flow as every other intake
+#
+# Background calls are capped (URGENT_MAX_BACKGROUND); beyond the cap they are
+# dropped, so a burst of red-flag intakes cannot starve regular advice requests.
+
+FAST_PATH_MODES = ("background", "skip", "off")
+URGENT_LEVELS = ("emergency", "high")
+# Triage to rendered guidance, checked by tests/test_urgent.py and
+# benchmarks/bench_urgent_fast_path.py
+LATENCY_BUDGET_MS = 50.0
+
+GUIDANCE: Dict[str, Dict[str, Tuple[str, Tuple[str, ...]]]] = {
+    "ru": {
+        "emergency": (
+            "⚠️ Возможно неотложное состояние — обратитесь за помощью сейчас",
+            (
+                "Позвоните в скорую помощь (112 или 103) или попросите кого-нибудь отвезти вас в ближайшее приёмное отделение.",
+                "Не садитесь за руль сами и не ждите, пока симптомы пройдут.",
+                "Прекратите любую нагрузку, сядьте или лягте, ослабьте тесную одежду.",
+                "Держите телефон при себе, откройте входную дверь и по возможности оставайтесь рядом с кем-то.",
+                "Следуйте указаниям диспетчера скорой помощи.",
+            ),
+        ),
+        "high": (
+            "Обратитесь к врачу сегодня",
+            (
+                "Свяжитесь с врачом или неотложной помощью сегодня, не откладывайте до планового приёма.",
+                "Вызывайте скорую (112 или 103), если появится затруднение дыхания, боль в груди, обморок или спутанность сознания.",
+                "Избегайте нагрузок, следите за температурой и изменением симптомов.",
+            ),
+        ),
+    },
+    "en": {
+        "emergency": (
+            "⚠️ Possible emergency — get help now",
+            (
+                "Call your local emergency number (911, 112 or 999) or have someone take you to the nearest emergency department.",
+                "Do not drive yourself and do not wait for the symptoms to pass.",
+                "Stop any physical activity, sit or lie down and loosen tight clothing.",
+                "Keep your phone with you, unlock the front door and, if possible, stay with someone.",
+                "Follow the emergency dispatcher's instructions.",
+            ),
+        ),
+        "high": (
+            "See a doctor today",
+            (
+                "Contact a doctor or urgent care today rather than waiting for a routine appointment.",
+                "Call emergency services if breathing becomes difficult, chest pain appears, or you faint or feel confused.",
+                "Avoid exertion and keep track of your temperature and how the symptoms change.",
+            ),
+        ),
+    },
+}
+
+WARNING_SIGNS = {"ru": "Тревожные признаки: ", "en": "Warning signs: "}
+
+_RENDERED: Dict[Tuple[str, str], str] = {
+    (lang, level): f"**{heading}**\n\n" + "\n".join(f"- {step}" for step in steps)
+    for lang, levels in GUIDANCE.items()
+    for level, (heading, steps) in levels.items()
+}
+
+
+def fast_path_mode() -> str:
+    mode = os.getenv("URGENT_FAST_PATH", "background").strip().lower()
+    return mode if mode in FAST_PATH_MODES else "background"
+
+
+def max_background() -> int:
+    return int(os.getenv("URGENT_MAX_BACKGROUND", "32"))
+
+
+def is_urgent(triage: TriageResult) -> bool:
+    return triage.risk_level in URGENT_LEVELS
+
+
+def urgent_guidance(triage: TriageResult, lang: str = "ru") -> Optional[str]:
+    # Markdown guidance for an urgent result, None for anything else
+    text = _RENDERED.get((lang if lang in GUIDANCE else "en", triage.risk_level))
+    if text is None:
+        return None
+    incr("urgent.fast_path")
+    flags: List[str] = triage.possible_conditions[0].red_flags if triage.possible_conditions else []
+    if flags:
+        # Rules can repeat a flag, and translation can merge two
+        shown = dict.fromkeys(translate_list(flags, lang))
+        text += "\n\n" + WARNING_SIGNS.get(lang, WARNING_SIGNS["en"]) + "; ".join(shown)
+    return text
@@ -0,0 +1,122 @@
+import argparse
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from dotenv import load_dotenv
+
+from metrics import span
+
+
+# Preload mode. Modules defer their heavy work to first use (provider SDKs,
+# numpy, Pydantic validators, compiled rules, FAQ indexes), which keeps
+# imports and container cold starts cheap but moves that cost onto the first
+# request. Worker processes that should answer their first request at full
+# speed call preload() when they start instead:
+#
+#   python warmup.py                     # run every step and print its time
+#   python warmup.py --steps rules,faq   # only some steps
+#
+# server.py --preload (or TRIAGE_PRELOAD=1) runs it in the server and its
+# process-pool workers, the Streamlit app in a background thread with
+# TRIAGE_PRELOAD=1, and bulk_triage.py workers always preload what they use.
+
+STEPS = ("models", "rules", "i18n", "faq", "llm")
+# What a triage-only worker (process pool, bulk scoring) needs
+WORKER_STEPS = ("models", "rules")
+
+
+def _models() -> None:
+    from models import AnalysisResult, ConditionHypothesis, FAQItem, SymptomInput, TriageResult
+
+    for model in (SymptomInput, ConditionHypothesis, TriageResult, FAQItem, AnalysisResult):
+        model.model_rebuild()
+
+
+def _rules() -> None:
+    from lazy import optional_module
+    from triage import get_compiled_rules
+
+    rules = get_compiled_rules()
+    rules.fuzzy()
+    if optional_module("numpy") is not None:
+        rules.matrix()
+
+
+def _i18n() -> None:
+    from i18n import RISK_TABLES, string_table
+    from triage import get_compiled_rules
+
+    rules = get_compiled_rules()
+    for lang in RISK_TABLES:
+        string_table(rules, lang)
+
+
+def _faq() -> None:
+    from faq import get_faq_index, search_mode
+
+    for lang in ("ru", "en"):
+        index = get_faq_index(lang)
+        if index is not None and search_mode() != "lexical":
+            index.vectors()
+
+
+def _llm() -> None:
+    # Imports the configured provider's SDK and creates its client
+    from llm import chat_class, warm_up
+
+    provider = os.getenv("LLM_PROVIDER", "OpenAI")
+    chat_class(provider)
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini") if provider == "OpenAI" else os.getenv("OLLAMA_MODEL", "llama3:8b-instruct")
+    warm_up(provider, model, float(os.getenv("AI_TEMPERATURE", "0.2")))
+
+
+_STEP_FUNCS: Dict[str, Callable[[], None]] = {"models": _models, "rules": _rules, "i18n": _i18n, "faq": _faq, "llm": _llm}
+
+
+def preload(steps: Iterable[str] = STEPS) -> Dict[str, float]:
+    # Runs the given steps in order; returns seconds per step
+    timings: Dict[str, float] = {}
+    for step in steps:
+        started = time.perf_counter()
+        with span(f"warmup.{step}"):
+            _STEP_FUNCS[step]()
+        timings[step] = time.perf_counter() - started
+    return timings
+
+
+def preload_in_background(steps: Iterable[str] = STEPS) -> threading.Thread:
+    # For interactive front ends: the first page renders while this runs
+    thread = threading.Thread(target=preload, args=(tuple(steps),), name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def preload_enabled() -> bool:
+    return os.getenv("TRIAGE_PRELOAD", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def parse_steps(value: Optional[str]) -> Iterable[str]:
+    if not value:
+        return STEPS
+    steps = [s.strip() for s in value.split(",") if s.strip()]
+    unknown = [s for s in steps if s not in _STEP_FUNCS]
+    if unknown:
+        raise SystemExit(f"unknown preload step(s): {', '.join(unknown)} (choose from {', '.join(STEPS)})")
+    return steps
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Preload rules, FAQ indexes, validators and the LLM client, and time each step")
+    parser.add_argument("--steps", help=f"comma-separated subset of {','.join(STEPS)}")
+    args = parser.parse_args()
+    timings = preload(parse_steps(args.steps))
+    for step, seconds in timings.items():
+        print(f"{step:<8} {seconds * 1000:8.1f} ms")
+    print(f"{'total':<8} {sum(timings.values()) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()